@@ -1,18 +1,115 @@
 from __future__ import annotations
 
-from typing import Any, Mapping
+import gzip
+import hashlib
+import itertools
+import json
+import mimetypes
+import os
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import IO, Any, Iterator, Mapping, Optional
 
-from flask import Flask, jsonify, render_template, request
+from flask import (
+    Flask,
+    Response,
+    abort,
+    g,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+    url_for,
+)
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.wsgi import get_input_stream
 
-from gentacalc.engine import calculate_plan
-from gentacalc.models import DosingPlan
-from gentacalc.parser import ValidationError, parse_patient
+from assets import DIST_DIR, ENCODINGS, load_manifest
+
+from gentacalc.alerts import ALERT_FLAGS, alert_keys
+from gentacalc.engine import PlanCache, calculate_plan
+from gentacalc.metrics import Registry
+from gentacalc.models import DosingPlan, PatientInput
+from gentacalc.parser import ValidationError, parse_patient, parse_patients
+from gentacalc.serialization import dumps_plan, plan_array_members
 
 app = Flask(__name__)
+app.config.update(
+    STREAM_CHUNK_ROWS=256,
+    STREAM_MAX_LINE_BYTES=16 * 1024,
+    # Bodies above this get a 413, in the ASGI app too; ``0`` disables it.
+    MAX_CONTENT_LENGTH=int(os.environ.get("GENTACALC_MAX_BODY_BYTES", str(1024 * 1024)))
+    or None,
+    SERVER_TIMING=os.environ.get("GENTACALC_SERVER_TIMING", "") not in ("", "0"),
+)
+
+# Opt-in memo of plan cores, one per worker process.
+_plan_cache_size = int(os.environ.get("GENTACALC_PLAN_CACHE_SIZE", "0"))
+plan_cache = (
+    PlanCache(
+        _plan_cache_size,
+        ttl=float(os.environ["GENTACALC_PLAN_CACHE_TTL"])
+        if os.environ.get("GENTACALC_PLAN_CACHE_TTL")
+        else None,
+    )
+    if _plan_cache_size > 0
+    else None
+)
+
+
+# Shared across gunicorn workers when GENTACALC_METRICS_DIR is set.
+metrics = Registry(os.environ.get("GENTACALC_METRICS_DIR") or None)
+REQUESTS = metrics.counter(
+    "gentacalc_http_requests_total", "HTTP requests by route and status.", ("endpoint", "status")
+)
+LATENCY = metrics.histogram(
+    "gentacalc_http_request_duration_seconds",
+    "Time until the response object is returned (streamed bodies excluded).",
+    ("endpoint",),
+)
+VALIDATION_ERRORS = metrics.counter(
+    "gentacalc_validation_errors_total", "Rejected patient payloads by field.", ("field",)
+)
+PLANS = metrics.counter("gentacalc_plans_total", "Computed plans by GFR band.", ("gfr_band",))
+PLAN_ALERTS = metrics.counter(
+    "gentacalc_plan_alerts_total", "Alerts attached to computed plans.", ("alert",)
+)
+
+
+def _record_validation_error(exc: ValidationError) -> None:
+    VALIDATION_ERRORS.inc(exc.field or "payload")
+
+
+@app.before_request
+def _start_timer() -> None:
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request(response: Response) -> Response:
+    started = g.get("request_started")
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        LATENCY.observe(time.perf_counter() - started, endpoint)
+        REQUESTS.inc(endpoint, response.status_code)
+    return response
+
+
+@app.errorhandler(RequestEntityTooLarge)
+def _body_too_large(error: RequestEntityTooLarge):
+    return jsonify({"error": "Request Entity Too Large"}), 413
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    return Response(metrics.exposition(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 def _serialize_plan(plan: DosingPlan) -> dict[str, Any]:
     context = plan.context
+    first, second, third = plan.schedule
+    first_time, second_time, third_time = plan.schedule_isoformat
     return {
         "plan": {
             "first_dose_mg": plan.first_dose_mg,
@@ -21,6 +118,12 @@ def _serialize_plan(plan: DosingPlan) -> dict[str, Any]:
             "instructions": list(plan.instructions),
             "alerts": list(plan.alerts),
             "monitoring": plan.monitoring,
+            "monitoring_time": plan.monitoring_isoformat,
+            "schedule": [
+                {"label": first.label, "time": first_time},
+                {"label": second.label, "time": second_time},
+                {"label": third.label, "time": third_time},
+            ],
         },
         "context": {
             "bmi": context.bmi,
@@ -37,9 +140,73 @@ def _serialize_plan(plan: DosingPlan) -> dict[str, Any]:
     }
 
 
+ASSET_MANIFEST = load_manifest()
+_ASSET_FILES = frozenset(ASSET_MANIFEST.values())
+# Fingerprinted names change with their content, so clients may keep them forever.
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@app.context_processor
+def _asset_helpers() -> dict[str, Any]:
+    return {"asset_url": lambda name: url_for("asset", filename=ASSET_MANIFEST[name])}
+
+
+def _accepted_encodings() -> list[str]:
+    return [encoding for encoding in ENCODINGS if encoding in request.accept_encodings]
+
+
+@lru_cache(maxsize=None)
+def _asset_bytes(filename: str, encoding: Optional[str]) -> Optional[bytes]:
+    path = DIST_DIR / (filename + (ENCODINGS[encoding] if encoding else ""))
+    return path.read_bytes() if path.is_file() else None
+
+
+@app.route("/assets/<filename>", methods=["GET"])
+def asset(filename: str):
+    if filename not in _ASSET_FILES:
+        abort(404)
+    for encoding in [*_accepted_encodings(), None]:
+        data = _asset_bytes(filename, encoding)
+        if data is not None:
+            break
+    response = Response(data, mimetype=mimetypes.guess_type(filename)[0])
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = IMMUTABLE
+    return response
+
+
+def _render_shell() -> tuple[bytes, bytes, str]:
+    html = render_template("index.html").encode("utf-8")
+    return html, gzip.compress(html, mtime=0), hashlib.sha256(html).hexdigest()[:16]
+
+
+_shell_cache: Optional[tuple[bytes, bytes, str]] = None
+
+
 @app.route("/", methods=["GET"])
 def index():
-    return render_template("index.html")
+    """The page shell, rendered once per process and revalidated by ETag."""
+    global _shell_cache
+    if _shell_cache is None or app.debug:
+        _shell_cache = _render_shell()
+    html, compressed, etag = _shell_cache
+
+    if "gzip" in _accepted_encodings():
+        response = Response(compressed, mimetype="text/html")
+        response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag + "-gzip")
+    else:
+        response = Response(html, mimetype="text/html")
+        response.set_etag(etag)
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = "no-cache"
+    return response.make_conditional(request)
+
+
+def _json_response(body: str) -> Response:
+    return Response(body + "\n", mimetype="application/json")
 
 
 def _extract_payload() -> Mapping[str, Any]:
@@ -51,14 +218,174 @@ def _extract_payload() -> Mapping[str, Any]:
 
 @app.route("/api/dose", methods=["POST"])
 def api_dose():
+    if app.config["SERVER_TIMING"]:
+        return _timed_api_dose()
     payload = _extract_payload()
     try:
         patient = parse_patient(payload)
     except ValidationError as exc:
+        _record_validation_error(exc)
         return jsonify({"error": str(exc)}), 400
 
-    plan = calculate_plan(patient)
-    return jsonify(_serialize_plan(plan))
+    plan = calculate_plan(patient, cache=plan_cache)
+    _record_plan(plan)
+    return _json_response(dumps_plan(plan))
+
+
+def _record_plan(plan: DosingPlan) -> None:
+    band = plan.context.gfr_band
+    PLANS.inc("none" if band is None else band)
+    for key in alert_keys(plan.alerts):
+        PLAN_ALERTS.inc(key)
+
+
+def _server_timing(timings: Mapping[str, float]) -> str:
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())
+
+
+def _timed_api_dose() -> Response:
+    """``api_dose`` with a ``Server-Timing`` header (durations in ms)."""
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+    payload = _extract_payload()
+    try:
+        patient = parse_patient(payload)
+    except ValidationError as exc:
+        timings["parse"] = time.perf_counter() - started
+        _record_validation_error(exc)
+        response = jsonify({"error": str(exc)})
+        response.status_code = 400
+        response.headers["Server-Timing"] = _server_timing(timings)
+        return response
+    parsed = time.perf_counter()
+
+    stages: dict[str, float] = {}
+    plan = calculate_plan(patient, cache=plan_cache, timings=stages)
+    computed = time.perf_counter()
+    _record_plan(plan)
+    response = _json_response(dumps_plan(plan))
+    finished = time.perf_counter()
+
+    timings["parse"] = parsed - started
+    timings["compute"] = computed - parsed
+    timings["serialize"] = finished - computed
+    timings.update(stages)
+    response.headers["Server-Timing"] = _server_timing(timings)
+    return response
+
+
+def _evaluate_payloads(payloads: list[Any]) -> list[str]:
+    """Return the JSON object members (without braces) for each payload."""
+    results: list[str] = ["" for _ in payloads]
+    valid_indices: list[int] = []
+    patients: list[PatientInput] = []
+    for index, parsed in enumerate(parse_patients(payloads)):
+        if isinstance(parsed, ValidationError):
+            _record_validation_error(parsed)
+            results[index] = _error_members(str(parsed))
+            continue
+        patients.append(parsed)
+        valid_indices.append(index)
+
+    if patients:
+        # NumPy is only needed by the batch paths; keep it out of worker start-up.
+        from gentacalc.batch import calculate_plans_for
+
+        plans = calculate_plans_for(patients)
+        _record_plan_array(plans)
+        rows = plan_array_members(plans)
+        for index, row in zip(valid_indices, rows):
+            results[index] = row
+    return results
+
+
+def _record_plan_array(plans: Any) -> None:
+    for band, count in Counter(plans["gfr_band"].tolist()).items():
+        PLANS.inc(band or "none", amount=count)
+    for mask, count in Counter(plans["alert_mask"].tolist()).items():
+        for bit, key in enumerate(ALERT_FLAGS):
+            if mask & (1 << bit):
+                PLAN_ALERTS.inc(key, amount=count)
+
+
+def _error_members(message: str) -> str:
+    return '"error":' + json.dumps(message)
+
+
+@app.route("/api/dose/batch", methods=["POST"])
+def api_dose_batch():
+    payloads = request.get_json(silent=True)
+    if not isinstance(payloads, list):
+        return jsonify({"error": "Forventet en liste med pasienter"}), 400
+    return _json_response(_batch_body(payloads))
+
+
+def _batch_body(payloads: list[Any]) -> str:
+    rows = _evaluate_payloads(payloads)
+    return '{"results":[' + ",".join("{" + row + "}" for row in rows) + "]}"
+
+
+def _iter_ndjson(stream: IO[bytes], max_line_bytes: int) -> Iterator[Any]:
+    """Yield one decoded JSON value per input line, reading lazily."""
+    while True:
+        line = stream.readline(max_line_bytes + 1)
+        if not line:
+            return
+        if len(line) > max_line_bytes and not line.endswith(b"\n"):
+            # Discard the remainder of the oversized line.
+            while line and not line.endswith(b"\n"):
+                line = stream.readline(max_line_bytes)
+            yield ValidationError("Linjen er for lang")
+            continue
+        if not line.strip():
+            continue
+        yield _decode_line(line)
+
+
+def _decode_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return ValidationError("Ugyldig JSON")
+
+
+def _plan_lines(chunk: list[Any], first_row: int) -> list[str]:
+    """NDJSON output lines for one chunk of decoded input lines."""
+    payloads = [None if isinstance(row, ValidationError) else row for row in chunk]
+    lines = []
+    for number, (row, members) in enumerate(zip(chunk, _evaluate_payloads(payloads)), first_row):
+        if isinstance(row, ValidationError):
+            members = _error_members(str(row))
+        lines.append("{" + members + ',"row":' + str(number) + "}\n")
+    return lines
+
+
+def _stream_plans(stream: IO[bytes]) -> Iterator[str]:
+    chunk_rows = app.config["STREAM_CHUNK_ROWS"]
+    rows = _iter_ndjson(stream, app.config["STREAM_MAX_LINE_BYTES"])
+    number = 1
+    while True:
+        chunk = list(itertools.islice(rows, chunk_rows))
+        if not chunk:
+            return
+        yield from _plan_lines(chunk, number)
+        number += len(chunk)
+
+
+@app.route("/api/dose/stream", methods=["POST"])
+def api_dose_stream():
+    """NDJSON in, NDJSON out.
+
+    Input lines are read only as output is consumed, ``STREAM_CHUNK_ROWS`` at
+    a time, so memory use does not depend on the size of the upload.
+    """
+    # Exempt from ``MAX_CONTENT_LENGTH``; ``STREAM_MAX_LINE_BYTES`` bounds
+    # each line instead.
+    stream = get_input_stream(request.environ, max_content_length=None)
+    return Response(
+        stream_with_context(_stream_plans(stream)),
+        mimetype="application/x-ndjson",
+    )
 
 
 if __name__ == "__main__":
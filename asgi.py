@@ -0,0 +1,339 @@
+"""ASGI entrypoint for deployments with many slow, long-lived clients.
+
+``/api/dose``, ``/api/dose/batch`` and ``/api/dose/stream`` are served
+directly on the event loop: request bodies are received asynchronously and
+only the engine work runs in a thread pool, so a tablet trickling its
+upload over weak Wi-Fi costs a coroutine rather than a whole worker. All
+other paths (the UI, ``/metrics``) are handed to the Flask app.
+
+Run it under gunicorn with uvicorn workers so ``gunicorn.conf.py`` still
+applies, e.g. ``gunicorn -k uvicorn_worker.UvicornWorker asgi:application``
+(rather than ``uvicorn --workers``; see the README).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+from werkzeug.formparser import parse_form_data
+
+from app import (
+    LATENCY,
+    REQUESTS,
+    _batch_body,
+    _decode_line,
+    _error_members,
+    _plan_lines,
+    _record_plan,
+    _record_validation_error,
+    app as flask_app,
+    plan_cache,
+)
+from gentacalc.engine import calculate_plan
+from gentacalc.parser import ValidationError, parse_patient
+from gentacalc.serialization import dumps_plan
+
+Scope = dict[str, Any]
+Receive = Callable[[], Awaitable[dict[str, Any]]]
+Send = Callable[[dict[str, Any]], Awaitable[None]]
+
+executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("GENTACALC_ASGI_THREADS", "4")),
+    thread_name_prefix="gentacalc-engine",
+)
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+# Same body as the Flask app's 413 handler.
+TOO_LARGE = '{"error":"Request Entity Too Large"}\n'
+
+
+async def _run(func: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def _read_body(receive: Receive) -> bytes:
+    # Same limit as the Flask app (``GENTACALC_MAX_BODY_BYTES``).
+    limit = flask_app.config["MAX_CONTENT_LENGTH"]
+    parts: list[bytes] = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionResetError("client disconnected")
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if limit is not None and size > limit:
+            raise BodyTooLarge
+        parts.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(parts)
+
+
+async def _send_response(
+    send: Send, status: int, body: str, content_type: str = "application/json"
+) -> None:
+    data = body.encode("utf-8")
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode("latin-1")),
+                (b"content-length", str(len(data)).encode("latin-1")),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": data})
+
+
+def _header(scope: Scope, name: bytes) -> str:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return ""
+
+
+FORM_MIMETYPES = ("application/x-www-form-urlencoded", "multipart/form-data")
+
+
+def _is_json(mimetype: str) -> bool:
+    # Same test as werkzeug's ``Request.is_json``.
+    return mimetype == "application/json" or (
+        mimetype.startswith("application/") and mimetype.endswith("+json")
+    )
+
+
+def _dose_payload(scope: Scope, body: bytes) -> Any:
+    # Mirrors app._extract_payload: a JSON object, otherwise form fields.
+    mimetype = _header(scope, b"content-type").split(";", 1)[0].strip().lower()
+    if _is_json(mimetype):
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            return data
+    if mimetype in FORM_MIMETYPES:
+        # werkzeug parses the form exactly as ``request.form`` does, including
+        # multipart bodies and undecodable bytes.
+        return parse_form_data(_wsgi_environ(scope, body))[1]
+    return {}
+
+
+def _dose(payload: Any) -> tuple[int, str]:
+    try:
+        patient = parse_patient(payload)
+    except ValidationError as exc:
+        _record_validation_error(exc)
+        return 400, "{" + _error_members(str(exc)) + "}\n"
+    plan = calculate_plan(patient, cache=plan_cache)
+    _record_plan(plan)
+    return 200, dumps_plan(plan) + "\n"
+
+
+async def api_dose(scope: Scope, receive: Receive, send: Send) -> int:
+    body = await _read_body(receive)
+    status, text = await _run(_dose, _dose_payload(scope, body))
+    await _send_response(send, status, text)
+    return status
+
+
+async def api_dose_batch(scope: Scope, receive: Receive, send: Send) -> int:
+    body = await _read_body(receive)
+    try:
+        payloads = json.loads(body)
+    except ValueError:
+        payloads = None
+    if not isinstance(payloads, list):
+        await _send_response(send, 400, '{"error":"Forventet en liste med pasienter"}\n')
+        return 400
+    await _send_response(send, 200, await _run(_batch_body, payloads) + "\n")
+    return 200
+
+
+async def _ndjson_rows(receive: Receive, max_line_bytes: int) -> AsyncIterator[Any]:
+    """Async counterpart of ``app._iter_ndjson`` over ASGI body messages."""
+    pending = b""
+    skipping = False
+    more = True
+    while more:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        # ``pending`` only carries an incomplete line over from the last message.
+        pending += message.get("body", b"")
+        more = message.get("more_body", False)
+        start = 0
+        while True:
+            newline = pending.find(b"\n", start)
+            if newline < 0:
+                break
+            line = pending[start : newline + 1]
+            start = newline + 1
+            if skipping:
+                skipping = False
+                continue
+            if len(line) > max_line_bytes + 1:
+                yield ValidationError("Linjen er for lang")
+            elif line.strip():
+                yield _decode_line(line)
+        pending = pending[start:]
+        if len(pending) > max_line_bytes:
+            if not skipping:
+                yield ValidationError("Linjen er for lang")
+            skipping = True
+            pending = b""
+    if pending.strip() and not skipping:
+        yield _decode_line(pending)
+
+
+async def api_dose_stream(scope: Scope, receive: Receive, send: Send) -> int:
+    chunk_rows = flask_app.config["STREAM_CHUNK_ROWS"]
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")],
+        }
+    )
+    number = 1
+    chunk: list[Any] = []
+    rows = _ndjson_rows(receive, flask_app.config["STREAM_MAX_LINE_BYTES"])
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_rows:
+            lines = await _run(_plan_lines, chunk, number)
+            await send({"type": "http.response.body", "body": "".join(lines).encode(), "more_body": True})
+            number += len(chunk)
+            chunk = []
+    if chunk:
+        lines = await _run(_plan_lines, chunk, number)
+        await send({"type": "http.response.body", "body": "".join(lines).encode(), "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+    return 200
+
+
+ROUTES: dict[str, Callable[[Scope, Receive, Send], Awaitable[int]]] = {
+    "/api/dose": api_dose,
+    "/api/dose/batch": api_dose_batch,
+    "/api/dose/stream": api_dose_stream,
+}
+
+
+def _wsgi_environ(scope: Scope, body: bytes) -> dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": scope["path"],
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        # The body has been read in full, so it is terminated even when it
+        # arrived chunked without a Content-Length.
+        "wsgi.input_terminated": True,
+    }
+    for key, value in scope["headers"]:
+        name = key.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+        else:
+            environ["HTTP_" + name] = (
+                environ["HTTP_" + name] + "," + value if "HTTP_" + name in environ else value
+            )
+    return environ
+
+
+def _call_wsgi(environ: dict[str, Any]) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+    started: dict[str, Any] = {}
+
+    def start_response(status: str, headers: list[tuple[str, str]], exc_info: Any = None) -> None:
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = [
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers
+        ]
+
+    result = flask_app.wsgi_app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return started["status"], started["headers"], body
+
+
+async def _flask(scope: Scope, receive: Receive, send: Send) -> None:
+    try:
+        body = await _read_body(receive)
+    except BodyTooLarge:
+        await _send_response(send, 413, TOO_LARGE)
+        return
+    except ConnectionResetError:
+        return
+    status, headers, data = await _run(_call_wsgi, _wsgi_environ(scope, body))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": data})
+
+
+async def _lifespan(receive: Receive, send: Send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=True)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope: Scope, receive: Receive, send: Send) -> None:
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    handler = ROUTES.get(scope["path"])
+    if handler is None:
+        # The Flask app records its own request metrics.
+        await _flask(scope, receive, send)
+        return
+
+    started = time.perf_counter()
+    # Stays 500 if the handler raises; the server then sends the error response.
+    status = 500
+    try:
+        if scope["method"] != "POST":
+            status = 405
+            await _send_response(send, status, '{"error":"Method Not Allowed"}\n')
+        else:
+            try:
+                status = await handler(scope, receive, send)
+            except BodyTooLarge:
+                status = 413
+                await _send_response(send, status, TOO_LARGE)
+            except ConnectionResetError:
+                status = 499
+    finally:
+        LATENCY.observe(time.perf_counter() - started, scope["path"])
+        REQUESTS.inc(scope["path"], status)
@@ -0,0 +1,81 @@
+"""Fingerprint and precompress the UI's static assets.
+
+Sources live in ``static/src``. ``python assets.py`` writes
+``static/dist/<name>.<hash>.<ext>`` plus ``.gz`` and ``.br`` variants and a
+``manifest.json`` that maps each source name to its fingerprinted file. The
+output is committed, so a deploy needs no build step. Rebuild after editing a
+source file; ``tests/test_assets.py`` fails while the build is stale.
+
+Usage:
+    python assets.py
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+SOURCE_DIR = PROJECT_ROOT / "static" / "src"
+DIST_DIR = PROJECT_ROOT / "static" / "dist"
+MANIFEST_NAME = "manifest.json"
+SOURCES = ("app.css", "app.js")
+
+# Served as Content-Encoding values, in order of preference.
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def fingerprinted_name(name: str, data: bytes) -> str:
+    stem, _, extension = name.rpartition(".")
+    return f"{stem}.{fingerprint(data)}.{extension}"
+
+
+def compress(data: bytes) -> dict[str, bytes]:
+    # mtime=0 keeps the gzip output identical between builds.
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:  # optional: only gzip variants are written without it
+        return variants
+    variants["br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+def build(source_dir: Path = SOURCE_DIR, dist_dir: Path = DIST_DIR) -> dict[str, str]:
+    dist_dir.mkdir(parents=True, exist_ok=True)
+    manifest: dict[str, str] = {}
+    for name in SOURCES:
+        data = (source_dir / name).read_bytes()
+        target = fingerprinted_name(name, data)
+        (dist_dir / target).write_bytes(data)
+        for encoding, payload in compress(data).items():
+            (dist_dir / (target + ENCODINGS[encoding])).write_bytes(payload)
+        manifest[name] = target
+
+    # Drop files from earlier builds.
+    keep = {MANIFEST_NAME}
+    for target in manifest.values():
+        keep.update([target] + [target + suffix for suffix in ENCODINGS.values()])
+    for path in dist_dir.iterdir():
+        if path.name not in keep:
+            path.unlink()
+
+    (dist_dir / MANIFEST_NAME).write_text(
+        json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8"
+    )
+    return manifest
+
+
+def load_manifest(dist_dir: Path = DIST_DIR) -> dict[str, str]:
+    return json.loads((dist_dir / MANIFEST_NAME).read_text(encoding="utf-8"))
+
+
+if __name__ == "__main__":
+    for name, target in build().items():
+        print(f"{name} -> static/dist/{target}")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Measure cold import time with ``-X importtime`` and check it against a budget.
+
+Each module is imported in a fresh interpreter ``--runs`` times; the median
+cumulative time is compared with ``benchmarks/import_budget.json``. The
+script also fails when a module drags in a dependency it must not load
+(e.g. Flask for library users).
+
+Usage:
+    python benchmarks/bench_import.py            # check
+    python benchmarks/bench_import.py --update   # rewrite the budget
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BUDGET_PATH = Path(__file__).resolve().parent / "import_budget.json"
+
+# Headroom applied when ``--update`` records new budgets.
+UPDATE_FACTOR = 1.5
+
+
+def measure(module: str, forbidden: list[str]) -> tuple[float, list[str]]:
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {forbidden!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:") :].split("|"))
+        if name == module:
+            cumulative_us = int(cumulative)
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative_us / 1000, loaded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Import-time budget check.")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--update", action="store_true", help="Record new budgets.")
+    args = parser.parse_args()
+
+    budget = json.loads(BUDGET_PATH.read_text(encoding="utf-8"))
+    failures = []
+    for module, spec in budget.items():
+        samples = []
+        loaded: list[str] = []
+        for _ in range(args.runs):
+            elapsed, loaded = measure(module, spec.get("forbidden", []))
+            samples.append(elapsed)
+        median = statistics.median(samples)
+        limit = spec["budget_ms"]
+        status = "ok" if median <= limit else "OVER"
+        print(f"{module:<20} {median:8.1f} ms  budget {limit:8.1f} ms  {status}")
+        if loaded:
+            print(f"  unexpected imports: {', '.join(loaded)}")
+            failures.append(module)
+        if median > limit:
+            failures.append(module)
+        if args.update:
+            spec["budget_ms"] = round(median * UPDATE_FACTOR, 1)
+
+    if args.update:
+        BUDGET_PATH.write_text(json.dumps(budget, indent=2) + "\n", encoding="utf-8")
+        print(f"Updated {BUDGET_PATH}")
+    elif failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
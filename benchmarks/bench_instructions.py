@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Benchmark instruction normalization over a recorded comparison corpus.
+
+Every Excel and Python instruction in ``--input`` (JSONL or the legacy JSON
+document) is collected in file order and normalized ``--repeat`` times, the
+way the analyzers see them on a long run. Three variants are timed:
+
+* ``general``: the step-by-step parser with no memo, as before;
+* ``template``: the single anchored pattern, falling back to ``general``;
+* ``cached``: ``parse_instruction`` as shipped (template + bounded memo).
+
+Before timing, the template path is checked against the general parser for
+every distinct string; the script exits non-zero on any difference.
+
+Usage:
+    python benchmarks/bench_instructions.py
+    python benchmarks/bench_instructions.py --input runs/shard3.jsonl --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from corpus import PROJECT_ROOT
+from scripts.comparison_results import default_results_path, iter_records
+from scripts.instructions import (
+    _parse_general,
+    _parse_template,
+    cache_clear,
+    cache_info,
+    parse_instruction,
+)
+
+
+def load_corpus(path: Path) -> list[str]:
+    texts: list[str] = []
+    for record in iter_records(path):
+        excel = record.get("excel") or {}
+        texts.extend(excel.get(f"instruction{index}") for index in (1, 2, 3))
+        plan = (record.get("python") or {}).get("plan") or {}
+        texts.extend(plan.get("instructions") or ())
+    return [str(text).strip() for text in texts if text is not None and str(text).strip()]
+
+
+# The uncached variants build the same result dict as ``parse_instruction``.
+def _general(raw: str) -> Any:
+    action, date, clock, text = _parse_general(raw)
+    return {"raw": raw, "action": action, "date": date, "time": clock, "text": text}
+
+
+def _template(raw: str) -> Any:
+    fields = _parse_template(raw)
+    action, date, clock, text = fields if fields is not None else _parse_general(raw)
+    return {"raw": raw, "action": action, "date": date, "time": clock, "text": text}
+
+
+def _time(func: Callable[[str], Any], texts: list[str], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=PROJECT_ROOT / default_results_path(),
+        help="Comparison records to take instructions from.",
+    )
+    parser.add_argument("--repeat", type=int, default=10, help="Passes over the corpus.")
+    parser.add_argument("--output", type=Path, help="Optional path to write JSON results.")
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        raise SystemExit(f"Comparison file not found: {args.input}")
+    texts = load_corpus(args.input)
+    if not texts:
+        raise SystemExit(f"No instructions in {args.input}")
+    unique = sorted(set(texts))
+
+    differences = [raw for raw in unique if _template(raw) != _general(raw)]
+    if differences:
+        for raw in differences[:10]:
+            print(f"Template parse differs for {raw!r}: {_template(raw)} vs {_general(raw)}")
+        raise SystemExit(1)
+    matched = sum(1 for raw in unique if _parse_template(raw) is not None)
+
+    cache_clear()
+    results: dict[str, Any] = {
+        "input": str(args.input),
+        "instructions": len(texts) * args.repeat,
+        "unique": len(unique),
+        "template_matched": matched,
+        "seconds": {
+            "general": _time(_general, texts, args.repeat),
+            "template": _time(_template, texts, args.repeat),
+            "cached": _time(parse_instruction, texts, args.repeat),
+        },
+    }
+    info = cache_info()
+    results["cache"] = {"hits": info.hits, "misses": info.misses, "maxsize": info.maxsize}
+
+    total = results["instructions"]
+    print(
+        f"{total} instructions ({len(unique)} distinct, "
+        f"{matched} matched by the template pattern)"
+    )
+    baseline = results["seconds"]["general"]
+    for name, seconds in results["seconds"].items():
+        print(
+            f"  {name:<9} {seconds * 1e6 / total:7.2f} us/instruction"
+            f"  {total / seconds / 1e6:6.2f} M/s  x{baseline / seconds:5.1f}"
+        )
+    print(f"  cache: {info.hits} hits, {info.misses} misses (maxsize {info.maxsize})")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Report bytes per cached plan for dict-backed vs slotted dataclasses.
+
+Usage:
+    python benchmarks/bench_memory.py --plans 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import sys
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable
+
+from corpus import patients
+from gentacalc.engine import calculate_core, render_plan
+from gentacalc.models import CalculationContext, DosingPlan, PlanCore
+
+
+def _dict_backed(cls: type) -> type:
+    """Same fields as ``cls`` but without ``__slots__`` (the previous layout)."""
+    return dataclasses.make_dataclass(
+        f"Dict{cls.__name__}",
+        [(field.name, field.type, field) for field in dataclasses.fields(cls)],
+        frozen=True,
+    )
+
+
+def _bytes_per_item(build: Callable[[Any], Any], sources: list[Any]) -> float:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        held = [build(source) for source in sources]
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    # The list holding the results is the same in both layouts.
+    return (after - before - sys.getsizeof(held)) / len(sources)
+
+
+def _copier(plan_cls: type, context_cls: type) -> Callable[[Any], Any]:
+    def copy(source: Any) -> Any:
+        context = context_cls(
+            **{f.name: getattr(source.context, f.name) for f in dataclasses.fields(context_cls)}
+        )
+        values = {
+            f.name: getattr(source, f.name)
+            for f in dataclasses.fields(plan_cls)
+            if f.init and f.name != "context"
+        }
+        return plan_cls(context=context, **values)
+
+    return copy
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=100000)
+    args = parser.parse_args()
+
+    cores = [calculate_core(patient) for patient in patients(args.plans)]
+    plans = [render_plan(core, datetime(2025, 8, 24, 9, 0)) for core in cores]
+
+    rows = [
+        ("PlanCore", cores, PlanCore),
+        ("DosingPlan", plans, DosingPlan),
+    ]
+    for label, sources, cls in rows:
+        dict_bytes = _bytes_per_item(_copier(_dict_backed(cls), _dict_backed(CalculationContext)), sources)
+        slot_bytes = _bytes_per_item(_copier(cls, CalculationContext), sources)
+        print(
+            f"{label:<10} dict-backed {dict_bytes:7.1f} B/plan  slotted {slot_bytes:7.1f} B/plan  "
+            f"({100 * (1 - slot_bytes / dict_bytes):.0f}% smaller)"
+        )
+    print("(strings and tuples shared between plans are not counted)")
+
+
+if __name__ == "__main__":
+    main()
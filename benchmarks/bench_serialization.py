@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Compare generic dict + json.dumps encoding with gentacalc.serialization.
+
+Usage:
+    python benchmarks/bench_serialization.py --plans 20000 --batch-size 1000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Callable
+
+from corpus import patients
+from app import _serialize_plan
+from gentacalc.batch import calculate_plans_for, plans_from_array
+from gentacalc.engine import calculate_plan
+from gentacalc.serialization import dumps_plan, plan_array_members
+
+
+def _per_call_us(func: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    plans = [calculate_plan(patient) for patient in patients(args.plans)]
+
+    def generic() -> None:
+        for plan in plans:
+            json.dumps(_serialize_plan(plan), sort_keys=True, separators=(",", ":"))
+
+    def fast() -> None:
+        for plan in plans:
+            dumps_plan(plan)
+
+    generic_us = _per_call_us(generic, args.repeat) / len(plans)
+    fast_us = _per_call_us(fast, args.repeat) / len(plans)
+    print(f"single response  generic {generic_us:7.2f} us  fast {fast_us:7.2f} us  ({generic_us / fast_us:.1f}x)")
+
+    array = calculate_plans_for(patients(args.batch_size, seed=7))
+    rows = plans_from_array(array)
+
+    def generic_batch() -> None:
+        json.dumps(
+            {"results": [_serialize_plan(plan) for plan in rows]},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+
+    def fast_batch() -> None:
+        '{"results":[' + ",".join("{" + row + "}" for row in plan_array_members(array)) + "]}"
+
+    generic_ms = _per_call_us(generic_batch, args.repeat) / 1000
+    fast_ms = _per_call_us(fast_batch, args.repeat) / 1000
+    print(
+        f"batch of {args.batch_size:<6}  generic {generic_ms:7.2f} ms  fast {fast_ms:7.2f} ms  "
+        f"({generic_ms / fast_ms:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
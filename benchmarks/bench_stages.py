@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Time every engine stage separately and compare with a stored baseline.
+
+Each stage runs over the same seeded ward mix (every GFR band, obese and
+non-obese patients, with and without height) with its inputs precomputed, so
+a regression shows up in the stage that caused it rather than only in the
+end-to-end number. The best of ``--repeat`` passes is reported per call and
+compared with ``benchmarks/stage_baseline.json``; the script exits non-zero
+when a stage is more than ``--tolerance`` slower than its baseline.
+
+Baselines are machine-specific: re-record with ``--update`` on the machine
+that runs the check, in the same commit as any change to a stage's code. On
+a noisy host, record the slowest of a few runs so the check does not flake.
+
+Usage:
+    python benchmarks/bench_stages.py
+    python benchmarks/bench_stages.py --output stage_results.json
+    python benchmarks/bench_stages.py --update
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from corpus import payload_for, ward_patients
+from app import _serialize_plan
+from gentacalc.alerts import collect_alerts
+from gentacalc.anthropometrics import compute_weight_metrics
+from gentacalc.dosing import compute_doses
+from gentacalc.engine import calculate_plan
+from gentacalc.parser import parse_patient
+from gentacalc.renal import compute_renal_metrics
+
+BASELINE_PATH = Path(__file__).resolve().parent / "stage_baseline.json"
+NOW = datetime(2025, 8, 24, 9, 0)
+
+
+def _stages(count: int, seed: int) -> dict[str, Callable[[], Any]]:
+    patients = ward_patients(count, seed)
+    payloads = [
+        payload_for(patient, as_strings=index % 2 == 0)
+        for index, patient in enumerate(patients)
+    ]
+    weights = [compute_weight_metrics(patient) for patient in patients]
+    renals = [
+        compute_renal_metrics(patient, weight) for patient, weight in zip(patients, weights)
+    ]
+    plans = [calculate_plan(patient, now=NOW) for patient in patients]
+
+    bands = {renal.gfr_band for renal in renals}
+    if bands != {1, 2, 3}:
+        raise SystemExit(f"Input mix only covers GFR bands {sorted(bands)}")
+    if not any(weight.bmi is not None and weight.bmi > 30 for weight in weights):
+        raise SystemExit("Input mix has no patient with BMI > 30")
+
+    triples = list(zip(patients, weights, renals))
+    return {
+        "parse_patient": lambda: [parse_patient(payload) for payload in payloads],
+        "compute_weight_metrics": lambda: [
+            compute_weight_metrics(patient) for patient in patients
+        ],
+        "compute_renal_metrics": lambda: [
+            compute_renal_metrics(patient, weight) for patient, weight, _ in triples
+        ],
+        "compute_doses": lambda: [
+            compute_doses(patient, weight, renal, now=NOW)
+            for patient, weight, renal in triples
+        ],
+        "collect_alerts": lambda: [
+            collect_alerts(patient, weight, renal) for patient, weight, renal in triples
+        ],
+        "calculate_plan": lambda: [calculate_plan(patient, now=NOW) for patient in patients],
+        "_serialize_plan": lambda: [_serialize_plan(plan) for plan in plans],
+    }
+
+
+def _per_call_us(func: Callable[[], Any], count: int, repeat: int) -> float:
+    # Like ``timeit``, keep the collector out of the timed passes: whether a
+    # collection lands inside a pass otherwise decides the result.
+    best = float("inf")
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return best / count * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Per-stage engine micro-benchmarks.")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown as a fraction of the baseline (default: 0.25).",
+    )
+    parser.add_argument("--output", type=Path, help="Write the results as JSON.")
+    parser.add_argument("--update", action="store_true", help="Record a new baseline.")
+    args = parser.parse_args()
+
+    stages = _stages(args.patients, args.seed)
+    baseline = (
+        json.loads(BASELINE_PATH.read_text(encoding="utf-8")) if BASELINE_PATH.exists() else {}
+    )
+    expected = baseline.get("stages_us", {})
+
+    results = {}
+    failures = []
+    for name, func in stages.items():
+        func()  # warm caches (alert texts, lru_caches) before timing
+        elapsed = _per_call_us(func, args.patients, args.repeat)
+        results[name] = round(elapsed, 3)
+        reference = expected.get(name)
+        if reference is None:
+            print(f"{name:<24} {elapsed:9.2f} us  (no baseline)")
+            continue
+        change = elapsed / reference - 1
+        status = "ok" if change <= args.tolerance else "SLOWER"
+        print(f"{name:<24} {elapsed:9.2f} us  baseline {reference:9.2f} us  {change:+7.1%}  {status}")
+        if change > args.tolerance:
+            failures.append(name)
+
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "patients": args.patients,
+        "seed": args.seed,
+        "stages_us": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    if args.update:
+        BASELINE_PATH.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"Updated {BASELINE_PATH}")
+    elif failures:
+        print(f"Slower than baseline: {', '.join(failures)}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Deterministic input mixes shared by the benchmark scripts."""
+
+from __future__ import annotations
+
+import random
+import sys
+from pathlib import Path
+from typing import Any
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gentacalc.models import PatientInput
+
+
+def patients(count: int, seed: int = 2024) -> list[PatientInput]:
+    """Patients drawn uniformly from the ranges ``parse_patient`` accepts."""
+    rng = random.Random(seed)
+    return [
+        PatientInput(
+            sex=rng.choice(["female", "male"]),
+            age_years=float(rng.randint(16, 110)),
+            weight_kg=float(rng.randint(35, 250)),
+            height_cm=rng.choice([None, float(rng.randint(130, 210))]),
+            creatinine_umol_l=float(rng.randint(30, 1000)),
+            mg_per_kg=float(rng.randint(3, 7)),
+            first_dose_hour=rng.randint(1, 24),
+        )
+        for _ in range(count)
+    ]
+
+
+def ward_patients(count: int, seed: int = 2024) -> list[PatientInput]:
+    """A clinically weighted mix: mostly normal renal function, some obese and
+    some impaired patients, so every GFR band and the BMI > 30 path appear."""
+    rng = random.Random(seed)
+    result = []
+    for index in range(count):
+        sex = rng.choice(["female", "male"])
+        height = rng.choice([None] + [float(rng.randint(150, 195))] * 9)
+        profile = index % 4
+        if profile == 0:  # obese, BMI > 30
+            weight = float(rng.randint(100, 180))
+        else:
+            weight = float(rng.randint(50, 95))
+        creatinine = float(
+            rng.choice(
+                [rng.randint(40, 90), rng.randint(90, 160), rng.randint(160, 600)]
+            )
+        )
+        result.append(
+            PatientInput(
+                sex=sex,
+                age_years=float(rng.randint(18, 95)),
+                weight_kg=weight,
+                height_cm=height,
+                creatinine_umol_l=creatinine,
+                mg_per_kg=float(rng.choice([5, 6, 7])),
+                first_dose_hour=rng.randint(1, 23),
+            )
+        )
+    return result
+
+
+def payload_for(patient: PatientInput, *, as_strings: bool = False) -> dict[str, Any]:
+    """The ``/api/dose`` payload that parses to ``patient``."""
+    values = {
+        "sex": patient.sex,
+        "age": patient.age_years,
+        "weight": patient.weight_kg,
+        "height": patient.height_cm,
+        "creatinine": patient.creatinine_umol_l,
+        "mg_per_kg": patient.mg_per_kg,
+        "first_dose_hour": patient.first_dose_hour,
+    }
+    if as_strings:
+        return {key: "" if value is None else str(value) for key, value in values.items()}
+    return values
+
+
+def dose_payloads(
+    count: int, seed: int = 2024, invalid_fraction: float = 0.1
+) -> list[dict[str, Any]]:
+    """Form-style ``/api/dose`` payloads with some typical user mistakes mixed in."""
+    rng = random.Random(seed)
+    mistakes = [
+        lambda payload: payload.pop("weight"),
+        lambda payload: payload.update(age="15"),
+        lambda payload: payload.update(creatinine="abc"),
+        lambda payload: payload.update(sex="x"),
+        lambda payload: payload.update(first_dose_hour="25"),
+    ]
+    result = []
+    for patient in ward_patients(count, seed):
+        payload = payload_for(patient, as_strings=True)
+        if rng.random() < invalid_fraction:
+            rng.choice(mistakes)(payload)
+        result.append(payload)
+    return result
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+"""Replay recorded ``/api/dose`` payloads against ``wsgi:application``.
+
+Targets:
+    inprocess  Flask test client, one per worker thread (no network, no server).
+    gunicorn   Starts ``gunicorn wsgi:application`` on a free local port.
+    asgi       Starts ``asgi:application`` under gunicorn with uvicorn workers.
+    url        An already running server given with ``--url``.
+
+Payloads are read from a JSONL file (one JSON object per line, as recorded
+from the access log) or generated from ``benchmarks/corpus.py``. Without
+``--rate`` each of ``--concurrency`` workers sends requests back to back
+(closed loop). With ``--rate`` requests are scheduled at fixed intervals and
+latency is measured from the scheduled start, so time spent queueing behind
+a slow server is counted instead of hidden.
+
+Latencies are reported separately for plans (200) and validation failures
+(400); anything else counts as an error. ``--slow-clients`` keeps that many
+extra connections busy uploading a body one byte at a time, like tablets on
+weak Wi-Fi; for servers started by the script the resident memory of the
+server processes is reported as well.
+
+Usage:
+    python benchmarks/load_test.py --requests 5000 --concurrency 8
+    python benchmarks/load_test.py --target gunicorn --workers 4 --rate 400
+    python benchmarks/load_test.py --target asgi --workers 2 --slow-clients 8
+    python benchmarks/load_test.py --payloads recorded.jsonl --output load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import itertools
+import json
+import math
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+from urllib.parse import urlsplit
+
+from corpus import PROJECT_ROOT, dose_payloads
+
+OUTCOMES = ("plan", "validation", "error")
+
+Sender = Callable[[bytes], int]
+
+
+def load_payloads(path: Path) -> list[Any]:
+    with path.open(encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def _outcome(status: int) -> str:
+    if status == 200:
+        return "plan"
+    if status == 400:
+        return "validation"
+    return "error"
+
+
+def _inprocess_sender() -> Sender:
+    from wsgi import application
+
+    client = application.test_client()
+
+    def send(body: bytes) -> int:
+        response = client.post("/api/dose", data=body, content_type="application/json")
+        response.close()
+        return response.status_code
+
+    return send
+
+
+def _http_sender(url: str, timeout: float) -> Sender:
+    parts = urlsplit(url)
+    path = (parts.path.rstrip("/") or "") + "/api/dose"
+    headers = {"Content-Type": "application/json"}
+    connection: Optional[http.client.HTTPConnection] = None
+
+    def send(body: bytes) -> int:
+        nonlocal connection
+        for attempt in range(2):
+            if connection is None:
+                connection = http.client.HTTPConnection(
+                    parts.hostname, parts.port or 80, timeout=timeout
+                )
+            try:
+                connection.request("POST", path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.will_close:
+                    connection.close()
+                    connection = None
+                return response.status
+            except TimeoutError:
+                connection.close()
+                connection = None
+                raise
+            except (ConnectionError, http.client.HTTPException):
+                # Sync workers close idle keep-alive connections; retry once.
+                connection.close()
+                connection = None
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+    return send
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _server_command(target: str, workers: int, port: int, extra: list[str]) -> list[str]:
+    if target == "asgi":
+        extra = ["--worker-class", "uvicorn_worker.UvicornWorker", *extra]
+    return [
+        sys.executable, "-m", "gunicorn",
+        "--workers", str(workers),
+        "--bind", f"127.0.0.1:{port}",
+        "--log-level", "warning",
+        *extra,
+        "asgi:application" if target == "asgi" else "wsgi:application",
+    ]
+
+
+def start_server(target: str, workers: int, extra: list[str]) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    process = subprocess.Popen(_server_command(target, workers, port, extra), cwd=PROJECT_ROOT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{target} exited during start-up")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise SystemExit(f"{target} did not start listening within 30 s")
+
+
+def process_tree_rss_mb(pid: int) -> float:
+    """Resident memory of ``pid`` and its descendants (Linux only)."""
+    total_kb = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            status = Path(f"/proc/{current}/status").read_text()
+            for task in Path(f"/proc/{current}/task").iterdir():
+                pending.extend(int(child) for child in (task / "children").read_text().split())
+        except OSError:
+            continue
+        for line in status.splitlines():
+            if line.startswith("VmRSS:"):
+                total_kb += int(line.split()[1])
+    return total_kb / 1024
+
+
+def start_slow_clients(url: str, count: int, interval: float) -> threading.Event:
+    """Open ``count`` connections that upload a dose request one byte per ``interval``."""
+    parts = urlsplit(url)
+    body = json.dumps(dose_payloads(1)[0]).encode("utf-8")
+    head = (
+        f"POST {parts.path.rstrip('/')}/api/dose HTTP/1.1\r\n"
+        f"Host: {parts.hostname}\r\n"
+        "Content-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n"
+    ).encode("latin-1")
+    stop = threading.Event()
+
+    def trickle() -> None:
+        while not stop.is_set():
+            try:
+                with socket.create_connection((parts.hostname, parts.port or 80)) as sock:
+                    sock.sendall(head)
+                    for index in range(len(body)):
+                        if stop.wait(interval):
+                            return
+                        sock.sendall(body[index : index + 1])
+                    sock.recv(65536)
+            except OSError:
+                if stop.wait(interval):
+                    return
+
+    for _ in range(count):
+        threading.Thread(target=trickle, daemon=True).start()
+    return stop
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run(
+    make_sender: Callable[[], Sender],
+    bodies: list[bytes],
+    requests: int,
+    concurrency: int,
+    rate: Optional[float],
+    warmup: int = 0,
+) -> dict[str, Any]:
+    send = make_sender()
+    for body in itertools.islice(itertools.cycle(bodies), warmup):
+        send(body)
+
+    schedule: Iterator[tuple[int, bytes]] = enumerate(
+        itertools.islice(itertools.cycle(bodies), requests)
+    )
+    schedule_lock = threading.Lock()
+    latencies: dict[str, list[float]] = {outcome: [] for outcome in OUTCOMES}
+    results_lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    started = 0.0
+
+    def worker() -> None:
+        send = make_sender()
+        local: dict[str, list[float]] = {outcome: [] for outcome in OUTCOMES}
+        start_barrier.wait()
+        while True:
+            with schedule_lock:
+                item = next(schedule, None)
+            if item is None:
+                break
+            index, body = item
+            if rate is None:
+                begin = time.perf_counter()
+            else:
+                begin = started + index / rate
+                delay = begin - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            try:
+                outcome = _outcome(send(body))
+            except OSError:
+                outcome = "error"
+            local[outcome].append(time.perf_counter() - begin)
+        with results_lock:
+            for outcome, values in local.items():
+                latencies[outcome].extend(values)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    report: dict[str, Any] = {
+        "requests": requests,
+        "concurrency": concurrency,
+        "rate": rate,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+    }
+    for outcome in OUTCOMES:
+        values = sorted(latencies[outcome])
+        report[outcome] = {
+            "count": len(values),
+            **{
+                f"p{int(fraction * 100)}_ms": round(percentile(values, fraction) * 1000, 3)
+                for fraction in (0.5, 0.95, 0.99)
+            },
+            "max_ms": round(values[-1] * 1000, 3) if values else float("nan"),
+        }
+    return report
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print(
+        f"{report['requests']} requests in {report['elapsed_s']:.2f} s "
+        f"-> {report['throughput_rps']:.0f} req/s "
+        f"(concurrency {report['concurrency']}, rate {report['rate'] or 'unbounded'})"
+    )
+    if "server_rss_mb" in report:
+        print(f"  server resident memory {report['server_rss_mb']:.1f} MB")
+    for outcome in OUTCOMES:
+        stats = report[outcome]
+        if not stats["count"]:
+            continue
+        print(
+            f"  {outcome:<10} {stats['count']:>7}  p50 {stats['p50_ms']:8.2f} ms  "
+            f"p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms  "
+            f"max {stats['max_ms']:8.2f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load-test /api/dose.")
+    parser.add_argument(
+        "--target", choices=("inprocess", "gunicorn", "asgi", "url"), default="inprocess"
+    )
+    parser.add_argument("--url", help="Base URL when --target url.")
+    parser.add_argument("--workers", type=int, default=2, help="Server worker processes.")
+    parser.add_argument(
+        "--server-arg",
+        action="append",
+        default=[],
+        help="Extra argument passed to gunicorn (repeatable), e.g. --server-arg=--threads=4.",
+    )
+    parser.add_argument("--payloads", type=Path, help="JSONL file of recorded payloads.")
+    parser.add_argument("--generate", type=int, default=2000, help="Payloads to generate otherwise.")
+    parser.add_argument("--invalid-fraction", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, help="Target requests per second (open loop).")
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument(
+        "--request-timeout", type=float, default=5.0, help="Seconds before a request counts as an error."
+    )
+    parser.add_argument("--slow-clients", type=int, default=0)
+    parser.add_argument(
+        "--slow-interval", type=float, default=0.5, help="Seconds between slow-client bytes."
+    )
+    parser.add_argument("--output", type=Path, help="Write the report as JSON.")
+    args = parser.parse_args()
+
+    payloads = (
+        load_payloads(args.payloads)
+        if args.payloads
+        else dose_payloads(args.generate, args.seed, args.invalid_fraction)
+    )
+    bodies = [json.dumps(payload).encode("utf-8") for payload in payloads]
+
+    process = None
+    if args.target == "inprocess":
+        if args.slow_clients:
+            parser.error("--slow-clients needs a network target")
+        make_sender = _inprocess_sender
+    else:
+        if args.target in ("gunicorn", "asgi"):
+            process, url = start_server(args.target, args.workers, args.server_arg)
+        elif args.url:
+            url = args.url
+        else:
+            parser.error("--target url requires --url")
+        make_sender = lambda: _http_sender(url, args.request_timeout)  # noqa: E731
+
+    stop_slow = None
+    if args.slow_clients:
+        stop_slow = start_slow_clients(url, args.slow_clients, args.slow_interval)
+    try:
+        report = run(make_sender, bodies, args.requests, args.concurrency, args.rate, args.warmup)
+        if process is not None:
+            report["server_rss_mb"] = round(process_tree_rss_mb(process.pid), 1)
+    finally:
+        if stop_slow is not None:
+            stop_slow.set()
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    report["target"] = args.target
+    report["slow_clients"] = args.slow_clients
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
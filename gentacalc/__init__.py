@@ -1,3 +1,23 @@
 """Gentamicin dosing engine."""
 
-from .models import PatientInput, DosingPlan, CalculationContext  # noqa: F401
+# Re-exports are resolved lazily so ``import gentacalc`` stays cheap.
+_EXPORTS = {
+    "PatientInput": "models",
+    "DosingPlan": "models",
+    "ScheduledDose": "models",
+    "CalculationContext": "models",
+    "PlanCore": "models",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str) -> object:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
@@ -1,45 +1,116 @@
 from __future__ import annotations
 
-import json
-from pathlib import Path
-from typing import Tuple
+import os
+from functools import lru_cache
+from typing import Any, Tuple
 
 from .models import PatientInput
 from .anthropometrics import WeightMetrics
 from .renal import RenalMetrics
 
 
-DATA_PATH = Path(__file__).resolve().parent / "data" / "alert_texts.json"
-ALERT_TEXTS = json.loads(DATA_PATH.read_text(encoding="utf-8"))
+# ``DATA_PATH`` is a ``pathlib.Path`` built on first access (see
+# ``__getattr__``) so that importing the engine does not import pathlib.
+_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "alert_texts.json")
 
+# Bit positions used when alerts are stored as a compact mask (batch engine).
+# The order matches the order in which ``collect_alerts`` emits them.
+ALERT_FLAGS: Tuple[str, ...] = (
+    "creatinine_floor",
+    "bmi_over_35",
+    "bmi_30_35",
+    "dose_over_600",
+)
 
+
+@lru_cache(maxsize=None)
+def _alert_texts() -> dict[str, list[str]]:
+    # Read on first use so importing the engine stays cheap.
+    import json
+
+    with open(_DATA_FILE, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def __getattr__(name: str) -> Any:
+    if name == "ALERT_TEXTS":
+        return _alert_texts()
+    if name == "DATA_PATH":
+        from pathlib import Path
+
+        return Path(_DATA_FILE).resolve()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@lru_cache(maxsize=None)
 def _compose(key: str) -> Tuple[str, ...]:
-    lines = ALERT_TEXTS.get(key, [])
+    lines = _alert_texts().get(key, [])
     if not lines:
         return ()
     text = "\n".join(lines)
     return (text,)
 
 
-def collect_alerts(
+def _alert_keys(
     patient: PatientInput,
     weight: WeightMetrics,
     renal: RenalMetrics,
-) -> Tuple[str, ...]:
-    alerts: list[str] = []
+) -> list[str]:
+    keys: list[str] = []
     bmi = weight.bmi
 
     if patient.creatinine_umol_l < 60:
-        alerts.extend(_compose("creatinine_floor"))
+        keys.append("creatinine_floor")
 
     if bmi is not None:
         if bmi > 35 and (renal.chosen_gfr or 0) >= 40:
-            alerts.extend(_compose("bmi_over_35"))
+            keys.append("bmi_over_35")
         elif 30 <= bmi < 35:
-            alerts.extend(_compose("bmi_30_35"))
+            keys.append("bmi_30_35")
 
     raw_first_dose = patient.mg_per_kg * weight.dosing_weight
     if raw_first_dose > 600:
-        alerts.extend(_compose("dose_over_600"))
+        keys.append("dose_over_600")
+
+    return keys
+
 
+def collect_alerts(
+    patient: PatientInput,
+    weight: WeightMetrics,
+    renal: RenalMetrics,
+) -> Tuple[str, ...]:
+    alerts: list[str] = []
+    for key in _alert_keys(patient, weight, renal):
+        alerts.extend(_compose(key))
     return tuple(alerts)
+
+
+def alert_mask(
+    patient: PatientInput,
+    weight: WeightMetrics,
+    renal: RenalMetrics,
+) -> int:
+    mask = 0
+    for key in _alert_keys(patient, weight, renal):
+        mask |= 1 << ALERT_FLAGS.index(key)
+    return mask
+
+
+def alerts_from_mask(mask: int) -> Tuple[str, ...]:
+    alerts: list[str] = []
+    for bit, key in enumerate(ALERT_FLAGS):
+        if mask & (1 << bit):
+            alerts.extend(_compose(key))
+    return tuple(alerts)
+
+
+@lru_cache(maxsize=None)
+def _keys_by_text() -> dict[str, str]:
+    return {text: key for key in ALERT_FLAGS for text in _compose(key)}
+
+
+def alert_keys(alerts: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Map alert texts from a plan back to their ``ALERT_FLAGS`` keys."""
+    keys = _keys_by_text()
+    return tuple(keys[text] for text in alerts if text in keys)
@@ -6,7 +6,7 @@ from typing import Optional
 from .models import PatientInput
 
 
-@dataclass
+@dataclass(slots=True)
 class WeightMetrics:
     bmi: Optional[float]
     ideal_body_weight: Optional[float]
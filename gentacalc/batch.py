@@ -0,0 +1,364 @@
+"""Vectorised counterpart of :func:`gentacalc.engine.calculate_plan`.
+
+Every column is evaluated with the same floating point operations, in the
+same order, as the scalar modules so that the results are identical value
+for value. Optional values are stored as ``NaN`` in float columns and
+``gfr_band`` uses ``0`` for "no band".
+
+The per-stage helpers (``weight_columns``, ``renal_columns``,
+``dose_columns`` and ``alert_columns``) broadcast over arrays of any shape,
+so callers such as the dose table and ``scripts/verify_invariants.py`` can
+evaluate one stage over the product of its own inputs.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Callable, Optional, Sequence
+
+import numpy as np
+
+from .alerts import ALERT_FLAGS, alerts_from_mask
+from .dosing import (
+    format_instructions,
+    format_monitoring,
+    offset_time,
+    schedule_offsets,
+    schedule_times,
+)
+from .engine import _monitoring_offset
+from .models import CalculationContext, DosingPlan, PatientInput
+
+
+PLAN_DTYPE = np.dtype(
+    [
+        ("bmi", "f8"),
+        ("ideal_body_weight", "f8"),
+        ("adjusted_body_weight", "f8"),
+        ("dosing_weight", "f8"),
+        ("cockcroft_gault", "f8"),
+        ("cockcroft_gault_female", "f8"),
+        ("cockcroft_gault_bmi_29_9", "f8"),
+        ("chosen_gfr", "f8"),
+        ("gfr_from_surrogate", "?"),
+        ("creatinine_used", "f8"),
+        ("gfr_band", "i1"),
+        ("first_dose_mg", "f8"),
+        ("second_dose_mg", "f8"),
+        ("third_dose_mg", "f8"),
+        ("alert_mask", "u1"),
+        ("instruction1", "O"),
+        ("instruction2", "O"),
+        ("instruction3", "O"),
+        ("monitoring", "O"),
+        ("schedule", "O"),
+        ("monitoring_time", "O"),
+    ]
+)
+
+MALE_LABELS = ("male", "mann", "m")
+_ALERT_BITS = {key: 1 << bit for bit, key in enumerate(ALERT_FLAGS)}
+
+
+def _map_unique(func: Callable[[Any], Any], values: np.ndarray, dtype: Any) -> np.ndarray:
+    """Evaluate ``func`` once per distinct value and scatter the results back."""
+    uniques, inverse = np.unique(values, return_inverse=True)
+    mapped = np.array([func(value) for value in uniques.tolist()], dtype=dtype)
+    return mapped[inverse.reshape(values.shape)]
+
+
+def _square(values: np.ndarray) -> np.ndarray:
+    # ``x ** 2`` on a Python float goes through libm ``pow`` which does not
+    # always round like ``x * x``; reuse it so results stay bit-identical.
+    return _map_unique(lambda value: value**2, values, np.float64)
+
+
+def _round_to_multiple(values: np.ndarray, multiple: int) -> np.ndarray:
+    quotient = values / multiple
+    lower = np.floor(quotient)
+    upper = np.ceil(quotient)
+    chosen = np.where(quotient - lower < upper - quotient, lower, upper)
+    return chosen * multiple
+
+
+def _is_male(sex: Any) -> np.ndarray:
+    labels = np.asarray(sex)
+    if labels.dtype == bool:
+        return labels
+    return _map_unique(
+        lambda value: str(value or "").strip().lower() in MALE_LABELS,
+        labels.astype(object),
+        bool,
+    )
+
+
+def _as_float(values: Any) -> np.ndarray:
+    return np.asarray(
+        [np.nan if value is None else value for value in values]
+        if isinstance(values, (list, tuple))
+        else values,
+        dtype=np.float64,
+    )
+
+
+def weight_columns(
+    is_male: np.ndarray, weight: np.ndarray, height: np.ndarray
+) -> dict[str, np.ndarray]:
+    """Vectorised :func:`gentacalc.anthropometrics.compute_weight_metrics`."""
+    has_height = height > 0
+    height_squared = _square(np.where(has_height, height / 100, np.nan))
+    bmi = np.where(has_height, weight / height_squared, np.nan)
+    ibw = np.where(has_height, np.where(is_male, 50.0, 45.5) + 0.9 * (height - 152), np.nan)
+    adjusted = ibw + 0.4 * (weight - ibw)
+    overweight = has_height & (ibw * 1.25 <= weight)
+    return {
+        "has_height": has_height,
+        "bmi": bmi,
+        "ideal_body_weight": ibw,
+        "adjusted_body_weight": adjusted,
+        "dosing_weight": np.where(overweight, np.maximum(adjusted, ibw * 1.249), weight),
+    }
+
+
+def renal_columns(
+    is_male: np.ndarray,
+    age: np.ndarray,
+    weight: np.ndarray,
+    height: np.ndarray,
+    creatinine: np.ndarray,
+    weights: dict[str, np.ndarray],
+) -> dict[str, np.ndarray]:
+    """Vectorised :func:`gentacalc.renal.compute_renal_metrics`."""
+    creatinine_used = np.maximum(creatinine, 60.0)
+    adjusted = weights["adjusted_body_weight"]
+    obese = weights["has_height"] & (weights["bmi"] > 30)
+    cockcroft_weight = np.where(obese & (adjusted != 0), adjusted, weight)
+    cockcroft_raw = ((140 - age) * cockcroft_weight) / (0.814 * creatinine_used)
+    cockcroft_male = np.floor(cockcroft_raw)
+    cockcroft_female = np.floor(cockcroft_raw * 0.85)
+    patient_cg = np.where(is_male, cockcroft_male, cockcroft_female)
+
+    has_surrogate = (height != 0) & ~np.isnan(height)
+    surrogate = (
+        (140 - age) * 29.9 * _square(np.where(has_surrogate, height / 100, np.nan))
+    ) / (0.814 * creatinine_used) * np.where(is_male, 1.0, 0.85)
+    # The scalar ``max(patient_cg, surrogate)`` returns the float surrogate
+    # only when it is strictly larger; otherwise the int Cockcroft-Gault.
+    from_surrogate = obese & (surrogate > patient_cg)
+    chosen_gfr = np.where(from_surrogate, surrogate, patient_cg)
+    return {
+        "creatinine_used": creatinine_used,
+        "cockcroft_gault": cockcroft_male,
+        "cockcroft_gault_female": cockcroft_female,
+        "cockcroft_gault_bmi_29_9": np.where(has_surrogate, surrogate, np.nan),
+        "chosen_gfr": chosen_gfr,
+        "gfr_from_surrogate": from_surrogate,
+        "gfr_band": np.where(chosen_gfr > 59, 3, np.where(chosen_gfr >= 40, 2, 1)),
+    }
+
+
+def dose_columns(
+    gfr_band: np.ndarray, first_raw: np.ndarray, hour: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorised :func:`gentacalc.dosing.compute_dose_amounts` (``NaN`` = no dose)."""
+    first_final = np.where(first_raw > 600, 600.0, _round_to_multiple(first_raw, 40))
+
+    hours_offset = np.where(hour < 12, hour + 12, hour - 12)
+    reduction_factor = np.minimum(np.where(hours_offset <= 3, 0.0, hours_offset * 0.04167), 1)
+    within_window = hours_offset <= 19
+    second_base = np.minimum(600, first_raw)
+    second_raw = np.where(
+        (gfr_band == 3) & within_window, second_base * (1 - reduction_factor), first_final
+    )
+    second_final = np.where(second_raw > 600, 600.0, _round_to_multiple(second_raw, 40))
+
+    gives_doses = gfr_band >= 2
+    return (
+        np.where(gives_doses, first_final, np.nan),
+        np.where(gives_doses, second_final, np.nan),
+        np.where(gfr_band == 3, first_final, np.nan),
+    )
+
+
+def alert_columns(
+    creatinine: np.ndarray,
+    weights: dict[str, np.ndarray],
+    renal: dict[str, np.ndarray],
+    first_raw: np.ndarray,
+) -> np.ndarray:
+    """Vectorised :func:`gentacalc.alerts.alert_mask`."""
+    has_height = weights["has_height"]
+    bmi = weights["bmi"]
+    mask = np.where(creatinine < 60, _ALERT_BITS["creatinine_floor"], 0)
+    mask |= np.where(
+        has_height & (bmi > 35) & (renal["chosen_gfr"] >= 40), _ALERT_BITS["bmi_over_35"], 0
+    )
+    mask |= np.where(
+        has_height & (bmi >= 30) & (bmi < 35), _ALERT_BITS["bmi_30_35"], 0
+    )
+    mask |= np.where(first_raw > 600, _ALERT_BITS["dose_over_600"], 0)
+    return mask
+
+
+def calculate_plans(
+    sex: Any,
+    age: Any,
+    weight: Any,
+    height: Any,
+    creatinine: Any,
+    mg_per_kg: Any,
+    first_dose_hour: Any,
+    *,
+    now: Optional[datetime] = None,
+) -> np.ndarray:
+    """Compute plans for column arrays of patients.
+
+    ``sex`` may hold labels (as accepted by the scalar engine) or booleans
+    meaning "male". Missing heights are given as ``None`` or ``NaN``.
+    Returns a structured array with :data:`PLAN_DTYPE`.
+    """
+    is_male = _is_male(sex)
+    age = _as_float(age)
+    weight = _as_float(weight)
+    height = _as_float(height)
+    creatinine = _as_float(creatinine)
+    mg_per_kg = _as_float(mg_per_kg)
+    hour = np.asarray(first_dose_hour).astype(np.int64)
+
+    if np.any(age < 16):
+        raise ValueError("Kalkulatoren støtter ikke pasienter under 16 år.")
+
+    out = np.empty(age.shape, dtype=PLAN_DTYPE)
+
+    weights = weight_columns(is_male, weight, height)
+    renal = renal_columns(is_male, age, weight, height, creatinine, weights)
+    gfr_band = renal["gfr_band"]
+
+    first_raw = mg_per_kg * weights["dosing_weight"]
+    out["first_dose_mg"], out["second_dose_mg"], out["third_dose_mg"] = dose_columns(
+        gfr_band, first_raw, hour
+    )
+
+    mask = alert_columns(creatinine, weights, renal, first_raw)
+
+    for name in ("bmi", "ideal_body_weight", "adjusted_body_weight", "dosing_weight"):
+        out[name] = weights[name]
+    for name in (
+        "cockcroft_gault",
+        "cockcroft_gault_female",
+        "cockcroft_gault_bmi_29_9",
+        "chosen_gfr",
+        "gfr_from_surrogate",
+        "creatinine_used",
+        "gfr_band",
+    ):
+        out[name] = renal[name]
+    out["alert_mask"] = mask
+
+    # The schedule, instructions and monitoring only depend on band, hour and
+    # the reference time, so each distinct combination is rendered once.
+    reference_time = now or datetime.now()
+    schedule_key = gfr_band * 32 + hour
+
+    def render(key: int) -> tuple[Any, ...]:
+        band, first_hour = divmod(key, 32)
+        schedule = schedule_times(schedule_offsets(band, first_hour), reference_time)
+        monitoring = offset_time(reference_time, _monitoring_offset(band, first_hour))
+        instructions = format_instructions(band, schedule)
+        return (*instructions, format_monitoring(monitoring), schedule, monitoring)
+
+    uniques, inverse = np.unique(schedule_key, return_inverse=True)
+    rendered = np.empty((len(uniques), 6), dtype=object)
+    for index, key in enumerate(uniques.tolist()):
+        rendered[index] = render(key)
+    rendered = rendered[inverse.reshape(schedule_key.shape)]
+    out["instruction1"] = rendered[..., 0]
+    out["instruction2"] = rendered[..., 1]
+    out["instruction3"] = rendered[..., 2]
+    out["monitoring"] = rendered[..., 3]
+    out["schedule"] = rendered[..., 4]
+    out["monitoring_time"] = rendered[..., 5]
+    return out
+
+
+def calculate_plans_for(
+    patients: Sequence[PatientInput], *, now: Optional[datetime] = None
+) -> np.ndarray:
+    """Convenience wrapper taking :class:`PatientInput` rows."""
+    return calculate_plans(
+        [patient.sex for patient in patients],
+        [patient.age_years for patient in patients],
+        [patient.weight_kg for patient in patients],
+        [patient.height_cm for patient in patients],
+        [patient.creatinine_umol_l for patient in patients],
+        [patient.mg_per_kg for patient in patients],
+        [patient.first_dose_hour for patient in patients],
+        now=now,
+    )
+
+
+def _optional_float(value: float) -> Optional[float]:
+    return None if np.isnan(value) else value
+
+
+def _optional_int(value: float) -> Optional[int]:
+    return None if np.isnan(value) else int(value)
+
+
+def _creatinine_used(value: float, alert_mask: int) -> float:
+    # The scalar ``max(creatinine, 60)`` returns the int 60 when it clamps,
+    # which is exactly when the creatinine floor alert is raised.
+    return 60 if alert_mask & _ALERT_BITS["creatinine_floor"] else value
+
+
+def plans_from_array(plans: np.ndarray) -> list[DosingPlan]:
+    """Convert rows produced by :func:`calculate_plans` to ``DosingPlan`` objects."""
+    result: list[DosingPlan] = []
+    for row in plans.tolist():
+        (
+            bmi,
+            ibw,
+            adjusted,
+            dosing_weight,
+            cockcroft_male,
+            cockcroft_female,
+            surrogate,
+            chosen_gfr,
+            from_surrogate,
+            creatinine_used,
+            gfr_band,
+            first_dose,
+            second_dose,
+            third_dose,
+            alert_mask,
+            _instruction1,
+            _instruction2,
+            _instruction3,
+            _monitoring,
+            schedule,
+            monitoring_time,
+        ) = row
+        context = CalculationContext(
+            bmi=_optional_float(bmi),
+            ideal_body_weight=_optional_float(ibw),
+            adjusted_body_weight=_optional_float(adjusted),
+            dosing_weight=dosing_weight,
+            cockcroft_gault=_optional_int(cockcroft_male),
+            cockcroft_gault_female=_optional_int(cockcroft_female),
+            cockcroft_gault_bmi_29_9=_optional_float(surrogate),
+            chosen_gfr=chosen_gfr if from_surrogate else int(chosen_gfr),
+            creatinine_used=_creatinine_used(creatinine_used, alert_mask),
+            gfr_band=gfr_band or None,
+        )
+        result.append(
+            DosingPlan(
+                first_dose_mg=_optional_int(first_dose),
+                second_dose_mg=_optional_int(second_dose),
+                third_dose_mg=_optional_int(third_dose),
+                schedule=schedule,
+                alerts=alerts_from_mask(alert_mask),
+                context=context,
+                monitoring_time=monitoring_time,
+            )
+        )
+    return result
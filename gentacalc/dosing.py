@@ -1,25 +1,53 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional
 
 import math
 
-from .models import PatientInput
+from .models import PatientInput, ScheduledDose
 from .anthropometrics import WeightMetrics
 from .renal import RenalMetrics
 
 
-@dataclass
+@dataclass(slots=True)
+class DoseAmounts:
+    first_dose_mg: Optional[int]
+    second_dose_mg: Optional[int]
+    third_dose_mg: Optional[int]
+
+
+# Dose times as whole hours after midnight of the reference day; ``None``
+# marks a dose that is not given.
+Schedule = tuple[Optional[int], Optional[int], Optional[int]]
+
+DOSE_LABELS = ("first", "second", "third")
+
+
+@dataclass(slots=True)
 class DoseResult:
+    """Doses and their schedule; ``instructions`` are formatted on first access."""
+
     first_dose_mg: Optional[float]
     second_dose_mg: Optional[float]
     third_dose_mg: Optional[float]
-    instructions: tuple[str, str, str]
+    gfr_band: Optional[int]
+    schedule: tuple[ScheduledDose, ScheduledDose, ScheduledDose]
+    _instructions: Optional[tuple[str, str, str]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def instructions(self) -> tuple[str, str, str]:
+        if self._instructions is None:
+            self._instructions = format_instructions(self.gfr_band, self.schedule)
+        return self._instructions
 
 
 CAUTION_TEXT = " Gentamicin anbefales ikke ved GFR <40.  "
+MONITORING_PREFIX = "Vurder videre bruk: "
 
 
 def _round_to_multiple(value: float, multiple: int) -> int:
@@ -39,23 +67,14 @@ def _format_datetime(dt: datetime) -> str:
     return dt.strftime("%d.%m %H:%M")
 
 
-def compute_doses(
+def compute_dose_amounts(
     patient: PatientInput,
     weight: WeightMetrics,
     renal: RenalMetrics,
-    *,
-    now: Optional[datetime] = None,
-) -> DoseResult:
-    current_time = now or datetime.now()
+) -> DoseAmounts:
     gfr_band = renal.gfr_band
-
     if not gfr_band or gfr_band == 1:
-        return DoseResult(
-            first_dose_mg=None,
-            second_dose_mg=None,
-            third_dose_mg=None,
-            instructions=(CAUTION_TEXT, CAUTION_TEXT, CAUTION_TEXT),
-        )
+        return DoseAmounts(first_dose_mg=None, second_dose_mg=None, third_dose_mg=None)
 
     first_raw = patient.mg_per_kg * weight.dosing_weight
     first_final = 600 if first_raw > 600 else _round_to_multiple(first_raw, 40)
@@ -94,41 +113,94 @@ def compute_doses(
             600 if first_raw > 600 else _round_to_multiple(third_raw, 40)
         )
 
-    base_date = current_time.replace(hour=0, minute=0, second=0, microsecond=0)
-    first_datetime = base_date + timedelta(hours=patient.first_dose_hour)
+    return DoseAmounts(
+        first_dose_mg=int(first_final),
+        second_dose_mg=None if second_final is None else int(second_final),
+        third_dose_mg=None if third_final is None else int(third_final),
+    )
+
 
+def schedule_offsets(gfr_band: Optional[int], first_dose_hour: int) -> Schedule:
+    if not gfr_band or gfr_band == 1:
+        return (None, None, None)
     if gfr_band == 3:
-        first_instruction = (
-            f" Gis umiddelbart  -   {_format_datetime(current_time.replace(hour=patient.first_dose_hour, minute=0))}"
-        )
-        if patient.first_dose_hour > 7:
-            second_instruction = (
-                f" Gis {_format_datetime((current_time + timedelta(days=1)).replace(hour=12, minute=0))}"
-            )
-            third_instruction = (
-                f" Gis {_format_datetime((current_time + timedelta(days=2)).replace(hour=12, minute=0))}"
-            )
-        else:
-            second_instruction = (
-                f" Gis {_format_datetime(current_time.replace(hour=12, minute=0))}"
-            )
-            third_instruction = (
-                f" Gis {_format_datetime((current_time + timedelta(days=1)).replace(hour=12, minute=0))}"
-            )
-    else:
-        first_instruction = (
-            f" Gis umiddelbart  -  {_format_datetime(current_time.replace(hour=patient.first_dose_hour, minute=0))}"
-        )
-        second_time = first_datetime + timedelta(hours=36)
-        second_instruction = (
-            " Gis 36 timer etter dose 1  -  "
-            f"{_format_datetime(second_time)}"
+        if first_dose_hour > 7:
+            return (first_dose_hour, 36, 60)
+        return (first_dose_hour, 12, 36)
+    return (first_dose_hour, first_dose_hour + 36, None)
+
+
+def offset_time(reference: datetime, offset: Optional[int]) -> Optional[datetime]:
+    """``offset`` hours after midnight of ``reference``'s day."""
+    if offset is None:
+        return None
+    midnight = reference.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + timedelta(hours=offset)
+
+
+def schedule_times(
+    schedule: Schedule, reference: datetime
+) -> tuple[ScheduledDose, ScheduledDose, ScheduledDose]:
+    return _placed_schedule(
+        schedule, reference.replace(hour=0, minute=0, second=0, microsecond=0)
+    )
+
+
+# Plans rendered for the same day share a handful of schedules, and so the
+# same ScheduledDose values.
+@lru_cache(maxsize=512)
+def _placed_schedule(
+    schedule: Schedule, midnight: datetime
+) -> tuple[ScheduledDose, ScheduledDose, ScheduledDose]:
+    first, second, third = (
+        ScheduledDose(label, None if offset is None else midnight + timedelta(hours=offset))
+        for label, offset in zip(DOSE_LABELS, schedule)
+    )
+    return (first, second, third)
+
+
+# Plans rendered for the same day share a handful of schedules.
+@lru_cache(maxsize=512)
+def format_instructions(
+    gfr_band: Optional[int], schedule: tuple[ScheduledDose, ...]
+) -> tuple[str, str, str]:
+    if not gfr_band or gfr_band == 1:
+        return (CAUTION_TEXT, CAUTION_TEXT, CAUTION_TEXT)
+
+    first, second, third = (
+        None if dose.time is None else _format_datetime(dose.time) for dose in schedule
+    )
+    if gfr_band == 3:
+        return (
+            f" Gis umiddelbart  -   {first}",
+            f" Gis {second}",
+            f" Gis {third}",
         )
-        third_instruction = " Tredje dose Gentamicin skal ikke gis"
+    return (
+        f" Gis umiddelbart  -  {first}",
+        f" Gis 36 timer etter dose 1  -  {second}",
+        " Tredje dose Gentamicin skal ikke gis",
+    )
 
+
+@lru_cache(maxsize=512)
+def format_monitoring(time: Optional[datetime]) -> Optional[str]:
+    return None if time is None else MONITORING_PREFIX + _format_datetime(time)
+
+
+def compute_doses(
+    patient: PatientInput,
+    weight: WeightMetrics,
+    renal: RenalMetrics,
+    *,
+    now: Optional[datetime] = None,
+) -> DoseResult:
+    amounts = compute_dose_amounts(patient, weight, renal)
+    schedule = schedule_offsets(renal.gfr_band, patient.first_dose_hour)
     return DoseResult(
-        first_dose_mg=int(first_final),
-        second_dose_mg=None if second_final is None else int(second_final),
-        third_dose_mg=None if third_final is None else int(third_final),
-        instructions=(first_instruction, second_instruction, third_instruction),
+        first_dose_mg=amounts.first_dose_mg,
+        second_dose_mg=amounts.second_dose_mg,
+        third_dose_mg=amounts.third_dose_mg,
+        gfr_band=renal.gfr_band,
+        schedule=schedule_times(schedule, now or datetime.now()),
     )
@@ -1,22 +1,30 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import Optional
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Optional
 
 from .alerts import collect_alerts
-from .anthropometrics import compute_weight_metrics
-from .dosing import compute_doses
-from .models import CalculationContext, DosingPlan, PatientInput
-from .renal import compute_renal_metrics
+from .anthropometrics import WeightMetrics, compute_weight_metrics
+from .dosing import (
+    DoseAmounts,
+    Schedule,
+    compute_dose_amounts,
+    offset_time,
+    schedule_offsets,
+    schedule_times,
+)
+from .models import CalculationContext, DosingPlan, PatientInput, PlanCore
+from .renal import RenalMetrics, compute_renal_metrics
 
 
-def _format_dt(dt: datetime) -> str:
-    return dt.strftime("%d.%m %H:%M")
+# Keys recorded by ``calculate_core`` when timing is requested.
+STAGES = ("weight", "renal", "dose", "alert", "monitoring")
 
 
-def _monitoring_recommendation(
-    reference: datetime, gfr_band: Optional[int], first_hour: int
-) -> Optional[str]:
+def _monitoring_offset(gfr_band: Optional[int], first_hour: int) -> Optional[int]:
     if gfr_band is None:
         return None
 
@@ -27,20 +35,72 @@ def _monitoring_recommendation(
     else:
         return None
 
-    target = (reference + timedelta(days=days)).replace(hour=8, minute=0, second=0, microsecond=0)
-    return f"Vurder videre bruk: {_format_dt(target)}"
+    return days * 24 + 8
 
 
-def calculate_plan(patient: PatientInput, *, now: Optional[datetime] = None) -> DosingPlan:
+def calculate_core(
+    patient: PatientInput, timings: Optional[dict[str, float]] = None
+) -> PlanCore:
+    """Compute everything about a plan that does not depend on the clock.
+
+    If ``timings`` is given, the seconds spent in each stage are added to it
+    under ``STAGES`` keys; otherwise the clock is never read.
+    """
     if patient.age_years < 16:
         raise ValueError("Kalkulatoren støtter ikke pasienter under 16 år.")
+    if timings is not None:
+        return _timed_core(patient, timings)
+
     weight = compute_weight_metrics(patient)
     renal = compute_renal_metrics(patient, weight)
-    reference_time = now or datetime.now()
-    doses = compute_doses(patient, weight, renal, now=reference_time)
+    return _build_core(
+        patient,
+        weight,
+        renal,
+        compute_dose_amounts(patient, weight, renal),
+        schedule_offsets(renal.gfr_band, patient.first_dose_hour),
+        collect_alerts(patient, weight, renal),
+        _monitoring_offset(renal.gfr_band, patient.first_dose_hour),
+    )
+
+
+def _timed_core(patient: PatientInput, timings: dict[str, float]) -> PlanCore:
+    started = time.perf_counter()
+    weight = compute_weight_metrics(patient)
+    weighed = time.perf_counter()
+    renal = compute_renal_metrics(patient, weight)
+    renal_done = time.perf_counter()
+    doses = compute_dose_amounts(patient, weight, renal)
+    schedule = schedule_offsets(renal.gfr_band, patient.first_dose_hour)
+    dosed = time.perf_counter()
     alerts = collect_alerts(patient, weight, renal)
-    monitoring = _monitoring_recommendation(reference_time, renal.gfr_band, patient.first_dose_hour)
+    alerted = time.perf_counter()
+    monitoring = _monitoring_offset(renal.gfr_band, patient.first_dose_hour)
+    finished = time.perf_counter()
+
+    for stage, elapsed in zip(
+        STAGES,
+        (
+            weighed - started,
+            renal_done - weighed,
+            dosed - renal_done,
+            alerted - dosed,
+            finished - alerted,
+        ),
+    ):
+        timings[stage] = timings.get(stage, 0.0) + elapsed
+    return _build_core(patient, weight, renal, doses, schedule, alerts, monitoring)
+
 
+def _build_core(
+    patient: PatientInput,
+    weight: WeightMetrics,
+    renal: RenalMetrics,
+    doses: DoseAmounts,
+    schedule: Schedule,
+    alerts: tuple[str, ...],
+    monitoring: Optional[int],
+) -> PlanCore:
     context = CalculationContext(
         bmi=weight.bmi,
         ideal_body_weight=weight.ideal_body_weight,
@@ -54,12 +114,149 @@ def calculate_plan(patient: PatientInput, *, now: Optional[datetime] = None) ->
         gfr_band=renal.gfr_band,
     )
 
-    return DosingPlan(
+    return PlanCore(
         first_dose_mg=doses.first_dose_mg,
         second_dose_mg=doses.second_dose_mg,
         third_dose_mg=doses.third_dose_mg,
-        instructions=doses.instructions,
         alerts=alerts,
         context=context,
-        monitoring=monitoring,
+        schedule_hours=schedule,
+        monitoring_hours=monitoring,
+    )
+
+
+def render_plan(core: PlanCore, reference: datetime) -> DosingPlan:
+    """Place the schedule on ``reference``'s day.
+
+    The instruction strings are only formatted when the plan's
+    ``instructions`` or ``monitoring`` are read.
+    """
+    return DosingPlan(
+        first_dose_mg=core.first_dose_mg,
+        second_dose_mg=core.second_dose_mg,
+        third_dose_mg=core.third_dose_mg,
+        schedule=schedule_times(core.schedule_hours, reference),
+        alerts=core.alerts,
+        context=core.context,
+        monitoring_time=offset_time(reference, core.monitoring_hours),
     )
+
+
+def _normalize(patient: PatientInput) -> PatientInput:
+    # Only used as the cache key; plans are computed from the caller's input.
+    return PatientInput(
+        sex=(patient.sex or "").strip().lower(),
+        age_years=float(patient.age_years),
+        weight_kg=float(patient.weight_kg),
+        height_cm=None if patient.height_cm is None else float(patient.height_cm),
+        creatinine_umol_l=float(patient.creatinine_umol_l),
+        mg_per_kg=float(patient.mg_per_kg),
+        first_dose_hour=int(patient.first_dose_hour),
+    )
+
+
+class PlanCache:
+    """Bounded, thread-safe memo of :func:`calculate_core` results.
+
+    Only the time-independent ``PlanCore`` is stored; the schedule is placed
+    on the caller's reference day on every lookup, so a cached entry can never
+    leak a schedule from another day. ``policy`` is ``"lru"``
+    (hits refresh an entry) or ``"fifo"``; ``ttl`` is in seconds.
+    """
+
+    POLICIES = ("lru", "fifo")
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        *,
+        ttl: Optional[float] = None,
+        policy: str = "lru",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown eviction policy: {policy!r}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.policy = policy
+        self._clock = clock
+        self._entries: OrderedDict[PatientInput, tuple[float, PlanCore]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_core(self, patient: PatientInput) -> PlanCore:
+        key = _normalize(patient)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, core = entry
+                if self.ttl is None or now - stored_at < self.ttl:
+                    self.hits += 1
+                    if self.policy == "lru":
+                        self._entries.move_to_end(key)
+                    return core
+                del self._entries[key]
+                self.evictions += 1
+            self.misses += 1
+
+        # Computed outside the lock; concurrent misses for the same key just
+        # store the same value twice.
+        core = calculate_core(patient)
+        with self._lock:
+            self._entries[key] = (now, core)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return core
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+def calculate_plan(
+    patient: PatientInput,
+    *,
+    now: Optional[datetime] = None,
+    cache: Optional[PlanCache] = None,
+    timings: Optional[dict[str, float]] = None,
+) -> DosingPlan:
+    """Compute and render a plan.
+
+    ``timings`` is filled as for :func:`calculate_core`. With a ``cache`` the
+    stages are not broken down; the lookup is recorded as ``"cache"``.
+    """
+    if timings is None:
+        core = calculate_core(patient) if cache is None else cache.get_core(patient)
+        return render_plan(core, now or datetime.now())
+
+    if cache is None:
+        core = calculate_core(patient, timings)
+    else:
+        started = time.perf_counter()
+        core = cache.get_core(patient)
+        timings["cache"] = timings.get("cache", 0.0) + time.perf_counter() - started
+    started = time.perf_counter()
+    plan = render_plan(core, now or datetime.now())
+    timings["render"] = timings.get("render", 0.0) + time.perf_counter() - started
+    return plan
@@ -0,0 +1,303 @@
+"""Precomputed dose table over the validated input grid.
+
+Build the table once with ``python -m gentacalc.lookup build`` and open it with
+:meth:`DoseTable.open`. The arrays are memory-mapped read-only, so every
+gunicorn worker shares a single copy through the page cache.
+
+Renal bands are stored as two creatinine limits per (sex, age, weight,
+height): ``chosen_gfr`` never increases with creatinine, so the highest
+creatinine still giving band 3 and band 2 fully describe the band. Doses only
+depend on sex, weight, height, mg/kg and (for band 3) the first dose hour.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import struct
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Optional
+
+import numpy as np
+
+from .alerts import ALERT_FLAGS, alert_mask
+from .anthropometrics import compute_weight_metrics
+from .batch import MALE_LABELS, dose_columns, renal_columns, weight_columns
+from .dosing import compute_dose_amounts
+from .models import PatientInput
+from .renal import compute_renal_metrics
+
+
+MAGIC = b"GCDT"
+VERSION = 1
+ALIGNMENT = 64
+DEFAULT_PATH = Path(__file__).resolve().parent / "data" / "dose_table.bin"
+
+_BIT = {key: 1 << bit for bit, key in enumerate(ALERT_FLAGS)}
+
+
+@dataclass(frozen=True)
+class Grid:
+    """Inclusive integer ranges (and the mg/kg values) covered by a table."""
+
+    ages: tuple[int, int] = (16, 110)
+    weights: tuple[int, int] = (35, 250)
+    heights: tuple[int, int] = (130, 210)
+    creatinine: tuple[int, int] = (30, 1000)
+    mg_per_kg: tuple[float, ...] = (3.0, 3.5, 4.0, 4.5, 5.0, 5.5, 6.0, 6.5, 7.0)
+    hours: tuple[int, int] = (1, 24)
+
+    @staticmethod
+    def _values(bounds: tuple[int, int]) -> np.ndarray:
+        return np.arange(bounds[0], bounds[1] + 1)
+
+
+@dataclass(frozen=True, slots=True)
+class TableEntry:
+    first_dose_mg: Optional[int]
+    second_dose_mg: Optional[int]
+    third_dose_mg: Optional[int]
+    gfr_band: int
+    alert_mask: int
+
+
+def _band_limits(grid: Grid) -> np.ndarray:
+    weights = Grid._values(grid.weights).astype(np.float64)
+    heights = np.concatenate(([np.nan], Grid._values(grid.heights).astype(np.float64)))
+    weight_col = np.repeat(weights, len(heights))
+    height_col = np.tile(heights, len(weights))
+    low, high = grid.creatinine
+    ages = Grid._values(grid.ages)
+
+    limits = np.empty((2, len(ages), len(weights), len(heights), 2), dtype=np.uint16)
+    for sex_index in (0, 1):
+        is_male = np.full(weight_col.shape, bool(sex_index))
+        weight_metrics = weight_columns(is_male, weight_col, height_col)
+        for age_index, age in enumerate(ages.tolist()):
+            age_col = np.full(weight_col.shape, float(age))
+            for slot, band in enumerate((3, 2)):
+                # Largest creatinine in [low, high] that still reaches ``band``;
+                # ``low - 1`` when none does.
+                lo = np.full(weight_col.shape, low - 1)
+                hi = np.full(weight_col.shape, high)
+                while np.any(lo < hi):
+                    mid = (lo + hi + 1) // 2
+                    reached = renal_columns(
+                        is_male, age_col, weight_col, height_col, mid.astype(np.float64), weight_metrics
+                    )["gfr_band"] >= band
+                    lo = np.where(reached, mid, lo)
+                    hi = np.where(reached, hi, mid - 1)
+                limits[sex_index, age_index, ..., slot] = lo.reshape(len(weights), len(heights))
+    return limits
+
+
+def _dose_arrays(grid: Grid) -> dict[str, np.ndarray]:
+    weights = Grid._values(grid.weights).astype(np.float64)
+    heights = np.concatenate(([np.nan], Grid._values(grid.heights).astype(np.float64)))
+    weight_col = np.repeat(weights, len(heights))
+    height_col = np.tile(heights, len(weights))
+    hours = Grid._values(grid.hours)
+    shape = (2, len(weights), len(heights), len(grid.mg_per_kg))
+
+    first = np.empty(shape, dtype=np.uint16)
+    second = np.empty(shape + (len(hours),), dtype=np.uint16)
+    over_600 = np.empty(shape, dtype=np.uint8)
+    bmi_flags = np.zeros((len(weights), len(heights)), dtype=np.uint8)
+    for sex_index in (0, 1):
+        is_male = np.full(weight_col.shape, bool(sex_index))
+        weight_metrics = weight_columns(is_male, weight_col, height_col)
+        dosing_weight = weight_metrics["dosing_weight"]
+        band_3 = np.full((len(weight_col), len(hours)), 3)
+        for mg_index, mg_per_kg in enumerate(grid.mg_per_kg):
+            first_raw = mg_per_kg * dosing_weight
+            first_dose, second_dose, _ = dose_columns(
+                band_3, first_raw[:, None], hours[None, :]
+            )
+            first[sex_index, ..., mg_index] = first_dose[:, 0].reshape(shape[1:3])
+            second[sex_index, ..., mg_index, :] = second_dose.reshape(shape[1:3] + (len(hours),))
+            over_600[sex_index, ..., mg_index] = (first_raw > 600).reshape(shape[1:3])
+
+        bmi = weight_metrics["bmi"]
+        with np.errstate(invalid="ignore"):
+            flags = np.where(bmi > 35, _BIT["bmi_over_35"], 0) | np.where(
+                (bmi >= 30) & (bmi < 35), _BIT["bmi_30_35"], 0
+            )
+        bmi_flags[...] = flags.reshape(shape[1:3])
+
+    return {
+        "first_dose": first,
+        "second_dose_band_3": second,
+        "dose_over_600": over_600,
+        "bmi_flags": bmi_flags,
+    }
+
+
+def build_table(path: Path = DEFAULT_PATH, grid: Grid = Grid()) -> Path:
+    arrays = {"band_limits": _band_limits(grid), **_dose_arrays(grid)}
+
+    descriptors: dict[str, dict[str, Any]] = {}
+    offset = 0
+    for name, array in arrays.items():
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        descriptors[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += array.nbytes
+    header = json.dumps({"grid": asdict(grid), "arrays": descriptors}).encode("utf-8")
+    prefix = MAGIC + struct.pack("<II", VERSION, len(header)) + header
+    data_start = -(-len(prefix) // ALIGNMENT) * ALIGNMENT
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as handle:
+        handle.write(prefix.ljust(data_start, b"\0"))
+        for name, array in arrays.items():
+            handle.seek(data_start + descriptors[name]["offset"])
+            handle.write(np.ascontiguousarray(array).tobytes())
+    return path
+
+
+def _grid_index(value: Any, bounds: tuple[int, int]) -> Optional[int]:
+    number = float(value)
+    if not number.is_integer() or not bounds[0] <= number <= bounds[1]:
+        return None
+    return int(number) - bounds[0]
+
+
+def _compute_entry(patient: PatientInput) -> TableEntry:
+    if patient.age_years < 16:
+        raise ValueError("Kalkulatoren støtter ikke pasienter under 16 år.")
+    weight = compute_weight_metrics(patient)
+    renal = compute_renal_metrics(patient, weight)
+    doses = compute_dose_amounts(patient, weight, renal)
+    return TableEntry(
+        first_dose_mg=doses.first_dose_mg,
+        second_dose_mg=doses.second_dose_mg,
+        third_dose_mg=doses.third_dose_mg,
+        gfr_band=renal.gfr_band or 0,
+        alert_mask=alert_mask(patient, weight, renal),
+    )
+
+
+class DoseTable:
+    """Read-only view of a table written by :func:`build_table`."""
+
+    def __init__(self, buffer: mmap.mmap) -> None:
+        if buffer[:4] != MAGIC:
+            raise ValueError("Not a dose table file")
+        version, header_length = struct.unpack_from("<II", buffer, 4)
+        if version != VERSION:
+            raise ValueError(f"Unsupported dose table version: {version}")
+        header_end = 12 + header_length
+        header = json.loads(bytes(buffer[12:header_end]).decode("utf-8"))
+        data_start = -(-header_end // ALIGNMENT) * ALIGNMENT
+
+        self._buffer = buffer
+        grid = header["grid"]
+        self.grid = Grid(**{key: tuple(value) for key, value in grid.items()})
+        arrays = {}
+        views = {}
+        raw = memoryview(buffer)
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            count = int(np.prod(spec["shape"]))
+            start = data_start + spec["offset"]
+            arrays[name] = np.frombuffer(
+                buffer, dtype=dtype, count=count, offset=start
+            ).reshape(spec["shape"])
+            # Flat memoryviews keep per-lookup cost to a few integer operations.
+            views[name] = raw[start : start + count * dtype.itemsize].cast(dtype.char)
+        self.arrays = arrays
+        self._band_limits = views["band_limits"]
+        self._first = views["first_dose"]
+        self._second = views["second_dose_band_3"]
+        self._over_600 = views["dose_over_600"]
+        self._bmi_flags = views["bmi_flags"]
+        _, ages, weights, heights, _ = arrays["band_limits"].shape
+        self._mg_count = len(self.grid.mg_per_kg)
+        self._hour_count = arrays["second_dose_band_3"].shape[-1]
+        self._heights = heights
+        self._weights = weights
+        self._ages = ages
+        self._mg_index = {value: index for index, value in enumerate(self.grid.mg_per_kg)}
+
+    @classmethod
+    def open(cls, path: Path = DEFAULT_PATH) -> "DoseTable":
+        with Path(path).open("rb") as handle:
+            buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(buffer)
+
+    def lookup(self, patient: PatientInput) -> Optional[TableEntry]:
+        """Return the stored entry, or ``None`` when ``patient`` is off the grid."""
+        grid = self.grid
+        age = _grid_index(patient.age_years, grid.ages)
+        weight = _grid_index(patient.weight_kg, grid.weights)
+        creatinine = _grid_index(patient.creatinine_umol_l, grid.creatinine)
+        hour = _grid_index(patient.first_dose_hour, grid.hours)
+        mg = self._mg_index.get(float(patient.mg_per_kg))
+        if patient.height_cm is None:
+            height: Optional[int] = 0
+        else:
+            height = _grid_index(patient.height_cm, grid.heights)
+            height = None if height is None else height + 1
+        if None in (age, weight, creatinine, hour, mg, height):
+            return None
+
+        sex = 1 if (patient.sex or "").strip().lower() in MALE_LABELS else 0
+        body = (sex * self._weights + weight) * self._heights + height
+        renal = (((sex * self._ages + age) * self._weights + weight) * self._heights + height) * 2
+        limit_3 = self._band_limits[renal]
+        limit_2 = self._band_limits[renal + 1]
+        value = creatinine + grid.creatinine[0]
+        band = 3 if value <= limit_3 else 2 if value <= limit_2 else 1
+
+        mask = _BIT["creatinine_floor"] if value < 60 else 0
+        bmi_flags = self._bmi_flags[weight * self._heights + height]
+        if band >= 2:
+            mask |= bmi_flags
+        else:
+            mask |= bmi_flags & _BIT["bmi_30_35"]
+        dose = body * self._mg_count + mg
+        if self._over_600[dose]:
+            mask |= _BIT["dose_over_600"]
+
+        if band == 1:
+            return TableEntry(None, None, None, band, mask)
+        first = self._first[dose]
+        if band == 2:
+            return TableEntry(first, first, None, band, mask)
+        second = self._second[dose * self._hour_count + hour]
+        return TableEntry(first, second, first, band, mask)
+
+    def entry(self, patient: PatientInput) -> TableEntry:
+        """Like :meth:`lookup` but falls back to the scalar engine off the grid."""
+        found = self.lookup(patient)
+        return found if found is not None else _compute_entry(patient)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Precomputed gentamicin dose table.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Generate the dose table file.")
+    build.add_argument(
+        "--output",
+        type=Path,
+        default=DEFAULT_PATH,
+        help=f"Where to write the table (default: {DEFAULT_PATH})",
+    )
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        path = build_table(args.output)
+        elapsed = time.perf_counter() - started
+        size_mb = path.stat().st_size / 1e6
+        print(f"Wrote {path} ({size_mb:.1f} MB) in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Counters and histograms shared between worker processes.
+
+Every process appends its samples to its own memory-mapped file in
+``directory`` (one writer per file, so updates need only a thread lock), and
+:meth:`Registry.exposition` sums all files in the directory into the
+Prometheus text format. A scrape only reads files; it never takes a lock
+that a request holds.
+
+Files of exited workers are kept so counters stay monotonic across worker
+restarts; empty the directory when the server starts (see
+``gunicorn.conf.py``). Without a directory the samples live in the current
+process only.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from typing import Iterable, Iterator, Optional, Sequence
+
+FILE_PREFIX = "metrics_"
+FILE_SUFFIX = ".db"
+
+# 0.5 ms .. 2.5 s; the engine itself answers in well under a millisecond.
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+_INITIAL_SIZE = 64 * 1024
+# File header: number of bytes in use, including the header.
+_HEADER = struct.Struct("<Q")
+_LENGTH = struct.Struct("<I")
+_VALUE = struct.Struct("<d")
+
+
+def _entry_size(key: bytes) -> int:
+    # length prefix + key, padded so the value is 8-byte aligned
+    padded = (_LENGTH.size + len(key) + 7) // 8 * 8
+    return padded + _VALUE.size
+
+
+def _read_entries(data: bytes) -> Iterator[tuple[str, float]]:
+    if len(data) < _HEADER.size:
+        return
+    (used,) = _HEADER.unpack_from(data)
+    position = _HEADER.size
+    end = min(used, len(data))
+    while position < end:
+        (length,) = _LENGTH.unpack_from(data, position)
+        key = data[position + _LENGTH.size : position + _LENGTH.size + length]
+        position += _entry_size(key) - _VALUE.size
+        (value,) = _VALUE.unpack_from(data, position)
+        position += _VALUE.size
+        yield key.decode("utf-8"), value
+
+
+class _FileValues:
+    """Append-only key/value file written by a single process."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = os.fdopen(os.open(path, os.O_RDWR | os.O_CREAT, 0o644), "r+b")
+        if os.fstat(self._file.fileno()).st_size < _INITIAL_SIZE:
+            self._file.truncate(_INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._positions: dict[str, int] = {}
+        (used,) = _HEADER.unpack_from(self._map)
+        if used == 0:
+            used = _HEADER.size
+            _HEADER.pack_into(self._map, 0, used)
+        self._used = used
+        position = _HEADER.size
+        for key, _ in _read_entries(self._map[:used]):
+            position += _entry_size(key.encode("utf-8"))
+            self._positions[key] = position - _VALUE.size
+
+    def add(self, key: str, amount: float) -> None:
+        position = self._positions.get(key)
+        if position is None:
+            position = self._allocate(key)
+        (value,) = _VALUE.unpack_from(self._map, position)
+        _VALUE.pack_into(self._map, position, value + amount)
+
+    def _allocate(self, key: str) -> int:
+        encoded = key.encode("utf-8")
+        size = _entry_size(encoded)
+        if self._used + size > len(self._map):
+            capacity = len(self._map) * 2
+            while self._used + size > capacity:
+                capacity *= 2
+            self._map.close()
+            self._file.truncate(capacity)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        start = self._used
+        _LENGTH.pack_into(self._map, start, len(encoded))
+        self._map[start + _LENGTH.size : start + _LENGTH.size + len(encoded)] = encoded
+        position = start + size - _VALUE.size
+        _VALUE.pack_into(self._map, position, 0.0)
+        # Publish the entry only once it is complete; readers stop at ``used``.
+        self._used = start + size
+        _HEADER.pack_into(self._map, 0, self._used)
+        self._positions[key] = position
+        return position
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+
+class _LocalValues:
+    def __init__(self) -> None:
+        self._values: dict[str, float] = {}
+
+    def add(self, key: str, amount: float) -> None:
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def items(self) -> list[tuple[str, float]]:
+        return list(self._values.items())
+
+    def close(self) -> None:
+        pass
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Sequence[tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys: dict[tuple, str] = {}
+
+    def _key(self, sample: str, labelvalues: tuple, extra: tuple = ()) -> str:
+        cache_key = (sample, labelvalues, extra)
+        key = self._keys.get(cache_key)
+        if key is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            labels = [[name, str(value)] for name, value in zip(self.labelnames, labelvalues)]
+            key = json.dumps([sample, labels + [list(pair) for pair in extra]])
+            self._keys[cache_key] = key
+        return key
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues: object, amount: float = 1.0) -> None:
+        self.registry._add(self._key(self.name, labelvalues), amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        registry: "Registry",
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._bucket_labels = tuple(_format_value(bound) for bound in self.buckets)
+
+    def observe(self, value: float, *labelvalues: object) -> None:
+        # Each observation is stored in its own bucket only; the cumulative
+        # ``le`` counts are built at scrape time.
+        for bound, label in zip(self.buckets, self._bucket_labels):
+            if value <= bound:
+                break
+        add = self.registry._add
+        add(self._key(self.name + "_bucket", labelvalues, (("le", label),)), 1.0)
+        add(self._key(self.name + "_sum", labelvalues), value)
+        add(self._key(self.name + "_count", labelvalues), 1.0)
+
+
+class Registry:
+    def __init__(self, directory: Optional[str] = None) -> None:
+        self.directory = directory
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._values: Optional[_FileValues | _LocalValues] = None
+        self._pid: Optional[int] = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name!r}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def _current_values(self) -> _FileValues | _LocalValues:
+        # Opened lazily and per pid: gunicorn may fork after the app is imported.
+        pid = os.getpid()
+        if self._pid != pid:
+            if self.directory is None:
+                self._values = _LocalValues()
+            else:
+                self._values = _FileValues(
+                    os.path.join(self.directory, f"{FILE_PREFIX}{pid}{FILE_SUFFIX}")
+                )
+            self._pid = pid
+        return self._values
+
+    def _add(self, key: str, amount: float) -> None:
+        with self._lock:
+            self._current_values().add(key, amount)
+
+    def _samples(self) -> Iterable[tuple[str, float]]:
+        if self.directory is None:
+            with self._lock:
+                return self._current_values().items()
+        samples: list[tuple[str, float]] = []
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX)):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "rb") as handle:
+                    samples.extend(_read_entries(handle.read()))
+            except FileNotFoundError:
+                continue
+        return samples
+
+    def collect(self) -> dict[tuple[str, tuple[tuple[str, str], ...]], float]:
+        """Sum of every sample over all processes, keyed by (name, labels)."""
+        totals: dict[tuple[str, tuple[tuple[str, str], ...]], float] = {}
+        for key, value in self._samples():
+            sample, labels = json.loads(key)
+            identity = (sample, tuple((name, label) for name, label in labels))
+            totals[identity] = totals.get(identity, 0.0) + value
+        return totals
+
+    def exposition(self) -> str:
+        """Render all metrics in the Prometheus text format (version 0.0.4)."""
+        totals = self.collect()
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                lines.extend(self._histogram_lines(metric, totals))
+                continue
+            for (sample, labels), value in sorted(totals.items()):
+                if sample == metric.name:
+                    lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _histogram_lines(metric: Histogram, totals: dict) -> list[str]:
+        series: dict[tuple, dict[str, float]] = {}
+        for (sample, labels), value in totals.items():
+            if sample == metric.name + "_bucket":
+                base = labels[:-1]
+                series.setdefault(base, {})[labels[-1][1]] = value
+            elif sample in (metric.name + "_sum", metric.name + "_count"):
+                series.setdefault(labels, {})[sample] = value
+
+        lines: list[str] = []
+        for labels in sorted(series):
+            values = series[labels]
+            cumulative = 0.0
+            for label in metric._bucket_labels:
+                cumulative += values.get(label, 0.0)
+                bucket_labels = labels + (("le", label),)
+                lines.append(
+                    f"{metric.name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}"
+                )
+            for suffix in ("_sum", "_count"):
+                lines.append(
+                    f"{metric.name}{suffix}{_format_labels(labels)} "
+                    f"{_format_value(values.get(metric.name + suffix, 0.0))}"
+                )
+        return lines
+
+
+def clear_directory(directory: str) -> None:
+    """Remove the sample files left by a previous server run."""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith(FILE_PREFIX) and name.endswith(FILE_SUFFIX):
+            os.remove(os.path.join(directory, name))
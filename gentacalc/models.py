@@ -1,8 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from datetime import datetime
 from typing import Optional
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class PatientInput:
     sex: str  # "male" or "female"
     age_years: float
@@ -13,7 +14,7 @@ class PatientInput:
     first_dose_hour: int
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CalculationContext:
     """Intermediate metrics surfaced for testing and UI display."""
 
@@ -29,12 +30,97 @@ class CalculationContext:
     gfr_band: Optional[int]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class ScheduledDose:
+    """One dose of a plan's schedule.
+
+    ``label`` is ``"first"``, ``"second"`` or ``"third"``; ``time`` is ``None``
+    when the dose is not given.
+    """
+
+    label: str
+    time: Optional[datetime]
+
+    @property
+    def given(self) -> bool:
+        return self.time is not None
+
+
+@dataclass(frozen=True, slots=True)
 class DosingPlan:
+    """A rendered plan.
+
+    ``schedule`` and ``monitoring_time`` are absolute times and keyword-only.
+    The Norwegian ``instructions`` and ``monitoring`` strings, and the ISO
+    timestamps of the JSON responses, are formatted from them on first access
+    and then kept on the plan.
+    """
+
+    first_dose_mg: Optional[float]
+    second_dose_mg: Optional[float]
+    third_dose_mg: Optional[float]
+    schedule: tuple[ScheduledDose, ScheduledDose, ScheduledDose] = field(kw_only=True)
+    alerts: tuple[str, ...]
+    context: CalculationContext
+    monitoring_time: Optional[datetime] = field(default=None, kw_only=True)
+    _instructions: Optional[tuple[str, str, str]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _monitoring: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+    _schedule_isoformat: Optional[tuple[Optional[str], ...]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _monitoring_isoformat: Optional[str] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def instructions(self) -> tuple[str, str, str]:
+        if self._instructions is None:
+            from .dosing import format_instructions
+
+            object.__setattr__(
+                self, "_instructions", format_instructions(self.context.gfr_band, self.schedule)
+            )
+        return self._instructions
+
+    @property
+    def monitoring(self) -> Optional[str]:
+        if self._monitoring is None and self.monitoring_time is not None:
+            from .dosing import format_monitoring
+
+            object.__setattr__(self, "_monitoring", format_monitoring(self.monitoring_time))
+        return self._monitoring
+
+    @property
+    def schedule_isoformat(self) -> tuple[Optional[str], ...]:
+        """ISO timestamps of ``schedule``; ``None`` for doses not given."""
+        if self._schedule_isoformat is None:
+            times = tuple(
+                None if dose.time is None else dose.time.isoformat() for dose in self.schedule
+            )
+            object.__setattr__(self, "_schedule_isoformat", times)
+        return self._schedule_isoformat
+
+    @property
+    def monitoring_isoformat(self) -> Optional[str]:
+        if self._monitoring_isoformat is None and self.monitoring_time is not None:
+            object.__setattr__(self, "_monitoring_isoformat", self.monitoring_time.isoformat())
+        return self._monitoring_isoformat
+
+
+@dataclass(frozen=True, slots=True)
+class PlanCore:
+    """Time-independent part of a plan, derived from ``PatientInput`` alone.
+
+    ``schedule_hours`` and ``monitoring_hours`` are offsets in whole hours from
+    midnight of the day the plan is rendered for.
+    """
+
     first_dose_mg: Optional[float]
     second_dose_mg: Optional[float]
     third_dose_mg: Optional[float]
-    instructions: tuple[str, str, str]
     alerts: tuple[str, ...]
     context: CalculationContext
-    monitoring: Optional[str] = None
+    schedule_hours: tuple[Optional[int], Optional[int], Optional[int]]
+    monitoring_hours: Optional[int] = None
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Mapping, Optional
+from math import isfinite
+from typing import Any, Iterable, Mapping, NamedTuple, Optional, Sequence, Union
 
 from .models import PatientInput
 
@@ -9,81 +10,162 @@ from .models import PatientInput
 class ValidationError(ValueError):
     """Raised when incoming payload violates validation rules."""
 
+    def __init__(self, message: str, field: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.field = field
 
-def _require_number(
-    payload: Mapping[str, Any],
-    key: str,
-    label: str,
-    *,
-    minimum: Optional[float] = None,
-    maximum: Optional[float] = None,
-    required: bool = True,
-    allow_empty: bool = False,
-) -> Optional[float]:
-    raw = payload.get(key)
-    if raw in (None, ""):
-        if required and not allow_empty:
-            raise ValidationError(f"{label} må fylles ut")
-        return None
-    try:
-        value = float(raw)
-    except (TypeError, ValueError) as exc:
-        raise ValidationError(f"{label} må være et tall") from exc
-
-    def format_bound(bound: float) -> str:
-        return str(int(bound)) if float(bound).is_integer() else str(bound)
-
-    if minimum is not None and value < minimum:
-        raise ValidationError(f"{label} må være minst {format_bound(minimum)}")
-    if maximum is not None and value > maximum:
-        raise ValidationError(f"{label} må være høyst {format_bound(maximum)}")
-    return value
 
+@dataclass(frozen=True)
+class FieldSpec:
+    key: str
+    label: str
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    required: bool = True
+    allow_empty: bool = False
 
-def parse_patient(payload: Mapping[str, Any]) -> PatientInput:
-    sex = str(payload.get("sex", "")).strip().lower()
-    if sex not in {"female", "male"}:
-        raise ValidationError("Kjønn må være 'kvinne' eller 'mann'")
-
-    age = _require_number(payload, "age", "Alder", minimum=16, maximum=110)
-    weight = _require_number(payload, "weight", "Vekt", minimum=35, maximum=250)
-    height = _require_number(
-        payload,
-        "height",
-        "Høyde",
-        minimum=130,
-        maximum=210,
-        required=False,
-        allow_empty=True,
-    )
-    creatinine = _require_number(payload, "creatinine", "Kreatinin", minimum=30, maximum=1000)
-    mg_per_kg = _require_number(payload, "mg_per_kg", "Dose (mg/kg)", minimum=3, maximum=7)
-    first_hour_value = _require_number(
-        payload,
-        "first_dose_hour",
-        "Klokkeslett for første dose",
-        minimum=1,
-        maximum=24,
-    )
 
-    if (
-        age is None
-        or weight is None
-        or creatinine is None
-        or mg_per_kg is None
-        or first_hour_value is None
-    ):
-        raise ValidationError("Påkrevd verdi mangler")
-
-    if not float(first_hour_value).is_integer():
-        raise ValidationError("Klokkeslett for første dose må være en hel time")
-
-    return PatientInput(
-        sex=sex,
-        age_years=age,
-        weight_kg=weight,
-        height_cm=height,
-        creatinine_umol_l=creatinine,
-        mg_per_kg=mg_per_kg,
-        first_dose_hour=int(first_hour_value),
+PATIENT_FIELDS: tuple[FieldSpec, ...] = (
+    FieldSpec("age", "Alder", minimum=16, maximum=110),
+    FieldSpec("weight", "Vekt", minimum=35, maximum=250),
+    FieldSpec("height", "Høyde", minimum=130, maximum=210, required=False, allow_empty=True),
+    FieldSpec("creatinine", "Kreatinin", minimum=30, maximum=1000),
+    FieldSpec("mg_per_kg", "Dose (mg/kg)", minimum=3, maximum=7),
+    FieldSpec("first_dose_hour", "Klokkeslett for første dose", minimum=1, maximum=24),
+)
+
+SEX_VALUES = frozenset({"female", "male"})
+
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+
+class _CompiledField(NamedTuple):
+    key: str
+    minimum: float
+    maximum: float
+    # ``None`` when an empty value is accepted.
+    missing_message: Optional[str]
+    type_message: str
+    minimum_message: str
+    maximum_message: str
+
+
+def _compile(spec: FieldSpec) -> _CompiledField:
+    return _CompiledField(
+        key=spec.key,
+        minimum=float("-inf") if spec.minimum is None else spec.minimum,
+        maximum=float("inf") if spec.maximum is None else spec.maximum,
+        missing_message=(
+            f"{spec.label} må fylles ut" if spec.required and not spec.allow_empty else None
+        ),
+        type_message=f"{spec.label} må være et tall",
+        minimum_message=(
+            "" if spec.minimum is None else f"{spec.label} må være minst {_format_bound(spec.minimum)}"
+        ),
+        maximum_message=(
+            "" if spec.maximum is None else f"{spec.label} må være høyst {_format_bound(spec.maximum)}"
+        ),
     )
+
+
+class PatientValidator:
+    """Validator compiled once from field specs.
+
+    Error messages are formatted up front; values that already arrive as JSON
+    numbers skip string coercion.
+    """
+
+    def __init__(self, fields: Sequence[FieldSpec] = PATIENT_FIELDS) -> None:
+        self.fields = tuple(fields)
+        self._compiled = tuple(_compile(spec) for spec in self.fields)
+
+    def __call__(self, payload: Mapping[str, Any]) -> PatientInput:
+        sex = str(payload.get("sex", "")).strip().lower()
+        if sex not in SEX_VALUES:
+            raise ValidationError("Kjønn må være 'kvinne' eller 'mann'", "sex")
+
+        get = payload.get
+        values: list[Optional[float]] = []
+        for key, minimum, maximum, missing, type_message, low, high in self._compiled:
+            raw = get(key)
+            kind = type(raw)
+            if kind is float:
+                value = raw
+            elif kind is int:
+                try:
+                    value = float(raw)
+                except OverflowError as exc:
+                    raise ValidationError(type_message, key) from exc
+            elif raw is None or raw == "":
+                if missing is not None:
+                    raise ValidationError(missing, key)
+                values.append(None)
+                continue
+            else:
+                try:
+                    value = float(raw)
+                except (TypeError, ValueError, OverflowError) as exc:
+                    raise ValidationError(type_message, key) from exc
+
+            # NaN passes every bound check, so non-finite values are rejected
+            # (``json.loads`` accepts ``NaN`` and ``Infinity``).
+            if not isfinite(value):
+                raise ValidationError(type_message, key)
+            if value < minimum:
+                raise ValidationError(low, key)
+            if value > maximum:
+                raise ValidationError(high, key)
+            values.append(value)
+
+        age, weight, height, creatinine, mg_per_kg, first_hour_value = values
+        if (
+            age is None
+            or weight is None
+            or creatinine is None
+            or mg_per_kg is None
+            or first_hour_value is None
+        ):
+            raise ValidationError("Påkrevd verdi mangler")
+
+        if not first_hour_value.is_integer():
+            raise ValidationError(
+                "Klokkeslett for første dose må være en hel time", "first_dose_hour"
+            )
+
+        return PatientInput(
+            sex=sex,
+            age_years=age,
+            weight_kg=weight,
+            height_cm=height,
+            creatinine_umol_l=creatinine,
+            mg_per_kg=mg_per_kg,
+            first_dose_hour=int(first_hour_value),
+        )
+
+    def validate_many(
+        self, payloads: Iterable[Any]
+    ) -> list[Union[PatientInput, ValidationError]]:
+        """Validate each row, returning the patient or the error in its place."""
+        results: list[Union[PatientInput, ValidationError]] = []
+        for payload in payloads:
+            if not isinstance(payload, Mapping):
+                results.append(ValidationError("Ugyldig pasientdata"))
+                continue
+            try:
+                results.append(self(payload))
+            except ValidationError as exc:
+                results.append(exc)
+        return results
+
+
+_validator = PatientValidator()
+
+
+def parse_patient(payload: Mapping[str, Any]) -> PatientInput:
+    return _validator(payload)
+
+
+def parse_patients(payloads: Iterable[Any]) -> list[Union[PatientInput, ValidationError]]:
+    return _validator.validate_many(payloads)
@@ -8,7 +8,7 @@ from .anthropometrics import WeightMetrics
 from .models import PatientInput
 
 
-@dataclass
+@dataclass(slots=True)
 class RenalMetrics:
     creatinine_used: float
     cockcroft_gault_male: Optional[float]
@@ -0,0 +1,162 @@
+"""JSON encoding specialised for the fixed ``DosingPlan`` response shape.
+
+The output is byte-for-byte what ``json.dumps(..., sort_keys=True,
+separators=(",", ":"))`` (Flask's ``jsonify`` outside debug mode) produces for
+the ``{"plan": ..., "context": ...}`` payload, but the key fragments are
+formatted once at import instead of walking a dict on every response.
+"""
+
+from __future__ import annotations
+
+import math
+from datetime import datetime
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii as _string
+from typing import Any, Optional
+
+from .alerts import ALERT_FLAGS, alerts_from_mask
+from .models import DosingPlan, ScheduledDose
+
+# (response key, attribute) in sorted key order.
+CONTEXT_FIELDS = (
+    ("adjusted_body_weight", "adjusted_body_weight"),
+    ("bmi", "bmi"),
+    ("chosen_gfr", "chosen_gfr"),
+    ("cockcroft_gault_bmi_29_9", "cockcroft_gault_bmi_29_9"),
+    ("cockcroft_gault_female", "cockcroft_gault_female"),
+    ("cockcroft_gault_male", "cockcroft_gault"),
+    ("creatinine_used", "creatinine_used"),
+    ("dosing_weight", "dosing_weight"),
+    ("gfr_band", "gfr_band"),
+    ("ideal_body_weight", "ideal_body_weight"),
+)
+PLAN_FIELDS = (
+    "alerts",
+    "first_dose_mg",
+    "instructions",
+    "monitoring",
+    "monitoring_time",
+    "schedule",
+    "second_dose_mg",
+    "third_dose_mg",
+)
+
+_TEMPLATE = (
+    '"context":{'
+    + ",".join(f'"{key}":%s' for key, _ in CONTEXT_FIELDS)
+    + '},"plan":{'
+    + ",".join(f'"{key}":%s' for key in PLAN_FIELDS)
+    + "}"
+)
+
+
+def _number(value: Any) -> str:
+    return "null" if value is None else repr(value)
+
+
+def _optional_string(value: Optional[str]) -> str:
+    return "null" if value is None else _string(value)
+
+
+def _optional_time(value: Optional[datetime]) -> str:
+    return "null" if value is None else _string(value.isoformat())
+
+
+@lru_cache(maxsize=512)
+def _string_list(values: tuple[str, ...]) -> str:
+    return "[" + ",".join(map(_string, values)) + "]"
+
+
+@lru_cache(maxsize=512)
+def _schedule(doses: tuple[ScheduledDose, ...]) -> str:
+    return (
+        "["
+        + ",".join(
+            '{"label":%s,"time":%s}' % (_string(dose.label), _optional_time(dose.time))
+            for dose in doses
+        )
+        + "]"
+    )
+
+
+def plan_members(plan: DosingPlan) -> str:
+    """Encode ``plan`` as the members of a JSON object, without braces."""
+    context = plan.context
+    return _TEMPLATE % (
+        _number(context.adjusted_body_weight),
+        _number(context.bmi),
+        _number(context.chosen_gfr),
+        _number(context.cockcroft_gault_bmi_29_9),
+        _number(context.cockcroft_gault_female),
+        _number(context.cockcroft_gault),
+        _number(context.creatinine_used),
+        _number(context.dosing_weight),
+        _number(context.gfr_band),
+        _number(context.ideal_body_weight),
+        _string_list(plan.alerts),
+        _number(plan.first_dose_mg),
+        _string_list(plan.instructions),
+        _optional_string(plan.monitoring),
+        _optional_string(plan.monitoring_isoformat),
+        _schedule(plan.schedule),
+        _number(plan.second_dose_mg),
+        _number(plan.third_dose_mg),
+    )
+
+
+def dumps_plan(plan: DosingPlan) -> str:
+    return "{" + plan_members(plan) + "}"
+
+
+def _float_column(values: list[float]) -> list[str]:
+    return ["null" if math.isnan(value) else repr(value) for value in values]
+
+
+def _int_column(values: list[float]) -> list[str]:
+    return ["null" if math.isnan(value) else repr(int(value)) for value in values]
+
+
+def plan_array_members(plans: Any) -> list[str]:
+    """Encode rows of :func:`gentacalc.batch.calculate_plans` column by column.
+
+    Numeric types follow :func:`gentacalc.batch.plans_from_array`.
+    """
+    columns = {name: plans[name].tolist() for name in plans.dtype.names}
+    chosen = [
+        repr(value) if from_surrogate else repr(int(value))
+        for value, from_surrogate in zip(columns["chosen_gfr"], columns["gfr_from_surrogate"])
+    ]
+    masks = columns["alert_mask"]
+    alerts = {mask: _string_list(alerts_from_mask(mask)) for mask in set(masks)}
+    # Clamped creatinine is the int 60 on the scalar path (see plans_from_array).
+    creatinine_floor = 1 << ALERT_FLAGS.index("creatinine_floor")
+    creatinine_used = [
+        "60" if mask & creatinine_floor else repr(value)
+        for mask, value in zip(masks, columns["creatinine_used"])
+    ]
+    encoded = zip(
+        _float_column(columns["adjusted_body_weight"]),
+        _float_column(columns["bmi"]),
+        chosen,
+        _float_column(columns["cockcroft_gault_bmi_29_9"]),
+        _int_column(columns["cockcroft_gault_female"]),
+        _int_column(columns["cockcroft_gault"]),
+        creatinine_used,
+        _float_column(columns["dosing_weight"]),
+        ["null" if band == 0 else repr(band) for band in columns["gfr_band"]],
+        _float_column(columns["ideal_body_weight"]),
+        [alerts[mask] for mask in masks],
+        _int_column(columns["first_dose_mg"]),
+        [
+            _string_list(instructions)
+            for instructions in zip(
+                columns["instruction1"], columns["instruction2"], columns["instruction3"]
+            )
+        ],
+        [_optional_string(value) for value in columns["monitoring"]],
+        [_optional_time(value) for value in columns["monitoring_time"]],
+        [_schedule(doses) for doses in columns["schedule"]],
+        _int_column(columns["second_dose_mg"]),
+        _int_column(columns["third_dose_mg"]),
+    )
+    return [_TEMPLATE % row for row in encoded]
@@ -0,0 +1,11 @@
+import os
+
+
+def on_starting(server):
+    # Counters in GENTACALC_METRICS_DIR are per worker pid; start each server
+    # run from zero instead of summing files left by the previous one.
+    directory = os.environ.get("GENTACALC_METRICS_DIR")
+    if directory:
+        from gentacalc.metrics import clear_directory
+
+        clear_directory(directory)
@@ -2,33 +2,34 @@
 """
 Inspect comparison results and focus on dose discrepancies.
 
+Records are read, filtered and written in a single streaming pass, so memory
+use does not grow with the size of the comparison run.
+
 Usage:
     python scripts/analyze_dose_differences.py \
-        --input scripts/compare_results.json \
+        --input scripts/compare_results.jsonl \
         --output scripts/dose_mismatches.json
 """
 
 from __future__ import annotations
 
 import argparse
-import json
+import sys
 from pathlib import Path
-from typing import Any, Dict, List
-
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
-DOSE_KEYS = {"dose_1", "dose_2", "dose_3"}
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
 
+from scripts.comparison_results import JsonArrayWriter, default_results_path, iter_records
 
-def load_results(path: Path) -> Dict[str, Any]:
-    data = json.loads(path.read_text(encoding="utf-8"))
-    if "results" not in data or "mismatches" not in data:
-        raise ValueError("Invalid comparison file: missing 'results' or 'mismatches'.")
-    return data
+DOSE_KEYS = {"dose_1", "dose_2", "dose_3"}
+SAMPLE_SIZE = 10
 
 
-def extract_dose_mismatches(data: Dict[str, Any]) -> List[Dict[str, Any]]:
-    mismatches = []
-    for entry in data.get("results", []):
+def iter_dose_mismatches(records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for entry in records:
         inputs = entry.get("input") or {}
         if inputs.get("age", 0) < 16:
             continue
@@ -40,32 +41,28 @@ def extract_dose_mismatches(data: Dict[str, Any]) -> List[Dict[str, Any]]:
         dose_fields = {k: v for k, v in diff.items() if k in DOSE_KEYS}
         if dose_fields:
             excel_plan = entry.get("excel", {})
-            mismatches.append(
-                {
-                    "id": entry.get("id"),
-                    "input": inputs,
-                    "dose_differences": dose_fields,
-                    "excel_doses": {
-                        "dose_1": excel_plan.get("first_dose_mg"),
-                        "dose_2": excel_plan.get("second_dose_mg"),
-                        "dose_3": excel_plan.get("third_dose_mg"),
-                    },
-                    "python_doses": {
-                        "dose_1": python_plan["plan"].get("first_dose_mg"),
-                        "dose_2": python_plan["plan"].get("second_dose_mg"),
-                        "dose_3": python_plan["plan"].get("third_dose_mg"),
-                    },
-                }
-            )
-    return mismatches
-
-
-def summarize(mismatches: List[Dict[str, Any]]) -> None:
-    print(f"Dose mismatches: {len(mismatches)}")
-    if not mismatches:
+            yield {
+                "id": entry.get("id"),
+                "input": inputs,
+                "dose_differences": dose_fields,
+                "excel_doses": {
+                    "dose_1": excel_plan.get("first_dose_mg"),
+                    "dose_2": excel_plan.get("second_dose_mg"),
+                    "dose_3": excel_plan.get("third_dose_mg"),
+                },
+                "python_doses": {
+                    "dose_1": python_plan["plan"].get("first_dose_mg"),
+                    "dose_2": python_plan["plan"].get("second_dose_mg"),
+                    "dose_3": python_plan["plan"].get("third_dose_mg"),
+                },
+            }
+
+
+def summarize(count: int, sample: List[Dict[str, Any]]) -> None:
+    print(f"Dose mismatches: {count}")
+    if not sample:
         return
-    sample = mismatches[: min(len(mismatches), 10)]
-    print("\nSample dose differences (up to 10 shown):")
+    print(f"\nSample dose differences (up to {SAMPLE_SIZE} shown):")
     for entry in sample:
         scenario = entry["input"]
         print(f"- Scenario #{entry['id']}: {scenario}")
@@ -78,8 +75,8 @@ def main() -> None:
     parser.add_argument(
         "--input",
         type=Path,
-        default=Path("scripts/compare_results.json"),
-        help="Path to comparison JSON (default: scripts/compare_results.json)",
+        default=default_results_path(),
+        help="Comparison records, JSONL or legacy JSON (default: scripts/compare_results.jsonl)",
     )
     parser.add_argument(
         "--output",
@@ -91,13 +88,22 @@ def main() -> None:
     if not args.input.exists():
         raise SystemExit(f"Comparison file not found: {args.input}")
 
-    data = load_results(args.input)
-    mismatches = extract_dose_mismatches(data)
-    summarize(mismatches)
+    writer: Optional[JsonArrayWriter] = JsonArrayWriter(args.output) if args.output else None
+    count = 0
+    sample: List[Dict[str, Any]] = []
+    try:
+        for mismatch in iter_dose_mismatches(iter_records(args.input)):
+            count += 1
+            if len(sample) < SAMPLE_SIZE:
+                sample.append(mismatch)
+            if writer is not None:
+                writer.write(mismatch)
+    finally:
+        if writer is not None:
+            writer.close()
+    summarize(count, sample)
 
     if args.output:
-        args.output.parent.mkdir(parents=True, exist_ok=True)
-        args.output.write_text(json.dumps(mismatches, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
         print(f"\nDetailed dose mismatches written to {args.output}")
 
 
@@ -1,81 +1,24 @@
 #!/usr/bin/env python3
-"""Extract instruction mismatches from compare_results.json."""
+"""Extract instruction mismatches from the comparison records.
+
+Records are streamed in a single pass; memory does not grow with the run size.
+"""
 
 from __future__ import annotations
 
 import argparse
-import json
-import re
+import sys
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-
-WEEKDAY_PATTERN = re.compile(
-    r"\b(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)\b",
-    re.IGNORECASE,
-)
-TIME_PATTERN = re.compile(r"kl\.?\s*(\d{1,2})[:\.]?\s*(\d{2})?", re.IGNORECASE)
-DATE_PATTERN = re.compile(r"(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?")
-ACTION_PATTERN = re.compile(
-    r"^(gis umiddelbart|gis 36 timer etter dose 1|gis|bestill|tredje dose gentamicin skal ikke gis)",
-    re.IGNORECASE,
-)
-TRAILING_TIME_PATTERN = re.compile(r"^\.*\s*kl\.?\s*\d{1,2}(?::\d{2})?\.*$", re.IGNORECASE)
-
-
-def parse_instruction(text: Any) -> Optional[Dict[str, Optional[str]]]:
-    if text is None:
-        return None
-    raw = str(text).strip()
-    if not raw:
-        return None
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 
-    normalized = re.sub(r"\s+", " ", raw)
-    normalized = WEEKDAY_PATTERN.sub("", normalized)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    normalized = re.sub(r"\.\s*(?=kl)", " ", normalized, flags=re.IGNORECASE)
-
-    action = None
-    match = ACTION_PATTERN.match(normalized)
-    if match:
-        action = match.group(1).lower()
-        normalized = normalized[len(match.group(0)) :].strip(" -")
-
-    year = None
-    date = None
-    match = DATE_PATTERN.search(normalized)
-    if match:
-        day = match.group(1).zfill(2)
-        month = match.group(2).zfill(2)
-        year = match.group(3)
-        if year:
-            year = year[-4:]
-        date = f"{day}.{month}"
-        normalized = normalized.replace(match.group(0), "").strip(" -")
-
-    time = None
-    match = TIME_PATTERN.search(normalized)
-    if match:
-        hour = match.group(1).zfill(2)
-        minute = (match.group(2) or "00").zfill(2)
-        time = f"{hour}:{minute}"
-        normalized = normalized.replace(match.group(0), "").strip()
-
-    reminder = normalized.strip(" .-") if normalized else None
-    if reminder and TRAILING_TIME_PATTERN.match(reminder):
-        reminder = None
-
-    return {
-        "raw": raw,
-        "action": action,
-        "date": date,
-        "time": time,
-        "text": reminder,
-    }
-
-
-def load_results(path: Path) -> List[Dict[str, Any]]:
-    data = json.loads(path.read_text(encoding="utf-8"))
-    return data.get("results", data)
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.comparison_results import JsonArrayWriter, default_results_path, iter_records
+from scripts.instructions import TRAILING_TIME_PATTERN, parse_instruction
+
+SAMPLE_SIZE = 10
 
 
 def normalize_entry(entry: Any) -> Optional[Dict[str, Optional[str]]]:
@@ -107,29 +50,8 @@ def normalize_entry(entry: Any) -> Optional[Dict[str, Optional[str]]]:
     return standardize(parse_instruction(entry))
 
 
-
-def main() -> None:
-    parser = argparse.ArgumentParser(description="List instruction mismatches")
-    parser.add_argument(
-        "--input",
-        type=Path,
-        default=Path("scripts/compare_results.json"),
-        help="Path to comparison JSON (default: scripts/compare_results.json)",
-    )
-    parser.add_argument(
-        "--output",
-        type=Path,
-        help="Optional path to write mismatches as JSON",
-    )
-    args = parser.parse_args()
-
-    if not args.input.exists():
-        raise SystemExit(f"Comparison file not found: {args.input}")
-
-    results = load_results(args.input)
-
-    mismatches: List[Dict[str, Any]] = []
-    for entry in results:
+def iter_instruction_mismatches(records: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    for entry in records:
         diffs = entry.get("differences", {})
         inst = {}
         for key, value in diffs.items():
@@ -151,16 +73,47 @@ def main() -> None:
                 "python": python_part,
             }
         if inst:
-            mismatches.append(
-                {
-                    "id": entry.get("id"),
-                    "input": entry.get("input"),
-                    "instructions": inst,
-                }
-            )
+            yield {
+                "id": entry.get("id"),
+                "input": entry.get("input"),
+                "instructions": inst,
+            }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="List instruction mismatches")
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=default_results_path(),
+        help="Comparison records, JSONL or legacy JSON (default: scripts/compare_results.jsonl)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Optional path to write mismatches as JSON",
+    )
+    args = parser.parse_args()
+
+    if not args.input.exists():
+        raise SystemExit(f"Comparison file not found: {args.input}")
 
-    print(f"Instruction mismatches: {len(mismatches)}")
-    for sample in mismatches[:10]:
+    writer: Optional[JsonArrayWriter] = JsonArrayWriter(args.output) if args.output else None
+    count = 0
+    samples: List[Dict[str, Any]] = []
+    try:
+        for mismatch in iter_instruction_mismatches(iter_records(args.input)):
+            count += 1
+            if len(samples) < SAMPLE_SIZE:
+                samples.append(mismatch)
+            if writer is not None:
+                writer.write(mismatch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(f"Instruction mismatches: {count}")
+    for sample in samples:
         print(f"- Scenario #{sample['id']}: {sample['input']}")
         for key, info in sample["instructions"].items():
             print(
@@ -168,11 +121,6 @@ def main() -> None:
             )
 
     if args.output:
-        args.output.parent.mkdir(parents=True, exist_ok=True)
-        args.output.write_text(
-            json.dumps(mismatches, indent=2, ensure_ascii=False) + "\n",
-            encoding="utf-8",
-        )
         print(f"\nDetailed mismatches written to {args.output}")
 
 
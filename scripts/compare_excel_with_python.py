@@ -7,25 +7,43 @@ Requirements:
   * `xlwings` Python package available in the active environment.
   * The workbook referenced must match the gold-standard calculator.
 
+Excel outputs are recorded in scripts/excel_oracle.sqlite (see
+scripts/excel_oracle.py) and replayed on later runs, so Excel is only started
+for scenarios that are not recorded yet. With --offline the comparison runs
+without Excel (e.g. on Linux/CI) and unrecorded scenarios are reported as
+missing.
+
 Example:
   python scripts/compare_excel_with_python.py \
       --workbook Original_gentaCalc.xlsm \
       --max-scenarios 2500 \
-      --output tests/fixtures/excel_python_diff.json
+      --output tests/fixtures/excel_python_diff.jsonl
+  python scripts/compare_excel_with_python.py --offline
+  python scripts/compare_excel_with_python.py --exhaustive --shard 3/8 \
+      --output runs/shard3.jsonl --resume
+
+Records are appended to the output as JSON lines while the run progresses
+(see scripts/comparison_results.py); --resume continues an interrupted run
+and skips the scenario ids already written.
 """
 from __future__ import annotations
 
 import argparse
-import json
+import itertools
+import os
 import random
 import sys
-import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
 
 from pathlib import Path
-from typing import Any, Dict, Iterable, List
+from typing import Any, Callable, Collection, Deque, Dict, Iterable, Iterator, List, Optional
 
-import xlwings as xw
+try:
+    import xlwings as xw
+except ImportError:  # replaying recorded outputs does not need Excel
+    xw = None
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
@@ -33,6 +51,9 @@ if str(PROJECT_ROOT) not in sys.path:
 
 from gentacalc.engine import calculate_plan
 from gentacalc.models import PatientInput
+from scripts.comparison_results import DEFAULT_RESULTS, ResultWriter
+from scripts.excel_oracle import DEFAULT_STORE, OracleStore, scenario_from_key
+from scripts.instructions import parse_instruction
 
 
 SEX_LABELS = {"female": "Kvinne", "male": "Mann"}
@@ -45,47 +66,84 @@ MG_PER_KG_VALUES = [3, 4, 5, 6, 7]
 FIRST_DOSE_HOURS = [1, 6, 8, 12, 18, 20, 23]
 SEX_VALUES = ["female", "male"]
 
+# Mismatching records kept in memory for the console summary.
+MISMATCH_SAMPLE = 5
+DEFAULT_SCENARIOS = 1500
+
+
+# Scenario grid in nested-loop order; the last axis varies fastest. Ages the
+# calculator rejects are left out so every grid point is a valid patient.
+AXES: tuple[tuple[str, tuple[Any, ...]], ...] = (
+    ("sex", tuple(SEX_VALUES)),
+    ("age", tuple(age for age in AGE_VALUES if age >= 16)),
+    ("weight", tuple(WEIGHT_VALUES)),
+    ("height", tuple(HEIGHT_VALUES)),
+    ("creatinine", tuple(CREATININE_VALUES)),
+    ("mg_per_kg", tuple(MG_PER_KG_VALUES)),
+    ("first_dose_hour", tuple(FIRST_DOSE_HOURS)),
+)
+GRID_SIZE = 1
+for _, _values in AXES:
+    GRID_SIZE *= len(_values)
+
+
+def decode_scenario(index: int) -> Dict[str, Any]:
+    """Mixed-radix decode of a grid index into a scenario."""
+    if not 0 <= index < GRID_SIZE:
+        raise IndexError(f"Scenario index out of range: {index}")
+    scenario: Dict[str, Any] = {}
+    for name, values in reversed(AXES):
+        index, digit = divmod(index, len(values))
+        scenario[name] = values[digit]
+    return {name: scenario[name] for name, _ in AXES}
+
+
+def encode_scenario(scenario: Dict[str, Any]) -> int:
+    """Inverse of :func:`decode_scenario`; raises ValueError off the grid."""
+    index = 0
+    for name, values in AXES:
+        index = index * len(values) + values.index(scenario[name])
+    return index
+
+
+def generate_scenarios(
+    max_scenarios: int, seed: int = 2024, shard: int = 0, shards: int = 1
+) -> Iterator[Dict[str, Any]]:
+    """Uniform sample of distinct grid points, yielded in grid order.
+
+    Only the requested indices are drawn and decoded, so the cost does not
+    depend on the size of the grid. ``shard``/``shards`` splits the sample
+    between workers.
+    """
+    count = min(max_scenarios, GRID_SIZE)
+    indices = sorted(random.Random(seed).sample(range(GRID_SIZE), count))
+    for index in indices[shard::shards]:
+        yield decode_scenario(index)
+
+
+def all_scenarios(shard: int = 0, shards: int = 1) -> Iterator[Dict[str, Any]]:
+    """Every grid point; shard ``shard`` of ``shards`` takes every ``shards``-th one."""
+    for index in range(shard, GRID_SIZE, shards):
+        yield decode_scenario(index)
 
-def generate_scenarios(max_scenarios: int, seed: int = 2024) -> List[Dict[str, Any]]:
-    """Randomly sample scenarios from the Cartesian product."""
-    total = (
-        len(SEX_VALUES)
-        * len(AGE_VALUES)
-        * len(WEIGHT_VALUES)
-        * len(HEIGHT_VALUES)
-        * len(CREATININE_VALUES)
-        * len(MG_PER_KG_VALUES)
-        * len(FIRST_DOSE_HOURS)
-    )
-    include_prob = min(1.0, max_scenarios / total) if total else 1.0
-
-    rng = random.Random(seed)
-    scenarios: list[Dict[str, Any]] = []
-
-    for sex in SEX_VALUES:
-        for age in AGE_VALUES:
-            if age < 16:
-                continue
-            for weight in WEIGHT_VALUES:
-                for height in HEIGHT_VALUES:
-                    for creatinine in CREATININE_VALUES:
-                        for mg_per_kg in MG_PER_KG_VALUES:
-                            for hour in FIRST_DOSE_HOURS:
-                                if len(scenarios) >= max_scenarios:
-                                    return scenarios
-                                if rng.random() <= include_prob:
-                                    scenarios.append(
-                                        {
-                                            "sex": sex,
-                                            "age": age,
-                                            "weight": weight,
-                                            "height": height,
-                                            "creatinine": creatinine,
-                                            "mg_per_kg": mg_per_kg,
-                                            "first_dose_hour": hour,
-                                        }
-                                    )
-    return scenarios
+
+def _grid_indices(scenarios: Iterable[Dict[str, Any]]) -> Iterator[int]:
+    for scenario in scenarios:
+        try:
+            yield encode_scenario(scenario)
+        except ValueError:
+            continue  # recorded for a grid that has since changed
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """Parse ``i/N`` (1-based) into a 0-based shard number and the shard count."""
+    try:
+        number, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected i/N, e.g. 1/4") from None
+    if not 1 <= number <= count:
+        raise argparse.ArgumentTypeError("shard must satisfy 1 <= i <= N")
+    return number - 1, count
 
 
 def set_inputs(sheet: xw.Sheet, scenario: Dict[str, Any]) -> None:
@@ -146,70 +204,6 @@ def normalize_dose(value: Any) -> Any:
     return float(value)
 
 
-WEEKDAY_PATTERN = re.compile(
-    r"\b(Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)\b",
-    re.IGNORECASE,
-)
-TIME_PATTERN = re.compile(r"kl\.?\s*(\d{1,2})[:\.]?\s*(\d{2})?", re.IGNORECASE)
-DATE_PATTERN = re.compile(r"(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?")
-ACTION_PATTERN = re.compile(
-    r"^(gis umiddelbart|gis 36 timer etter dose 1|gis|bestill|tredje dose gentamicin skal ikke gis)",
-    re.IGNORECASE,
-)
-
-
-def parse_instruction(text: Any) -> Optional[Dict[str, Optional[str]]]:
-    if text is None:
-        return None
-    raw = str(text).strip()
-    if not raw:
-        return None
-
-    normalized = re.sub(r"\s+", " ", raw)
-    normalized = WEEKDAY_PATTERN.sub("", normalized)
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    normalized = re.sub(r"\.\s*(?=kl)", " ", normalized, flags=re.IGNORECASE)
-
-    action_match = ACTION_PATTERN.match(normalized)
-    action = None
-    if action_match:
-        action = action_match.group(1).lower()
-        normalized = normalized[len(action_match.group(0)) :].strip(" -")
-
-    date_match = DATE_PATTERN.search(normalized)
-    date = None
-    if date_match:
-        day = date_match.group(1).zfill(2)
-        month = date_match.group(2).zfill(2)
-        year = date_match.group(3)
-        if year:
-            year = year[-4:]
-        date = f"{day}.{month}"
-        normalized = normalized.replace(date_match.group(0), "").strip(" -")
-
-    time_match = TIME_PATTERN.search(normalized)
-    time = None
-    if time_match:
-        hour = time_match.group(1).zfill(2)
-        minute = (time_match.group(2) or "00").zfill(2)
-        time = f"{hour}:{minute}"
-        normalized = normalized.replace(time_match.group(0), "").strip()
-
-    reminder = normalized.strip(" .-") if normalized else None
-    if reminder and re.match(r"^\.*\s*kl\.?\s*\d{1,2}(?::\d{2})?\.*$", reminder, re.IGNORECASE):
-        reminder = None
-
-    return {
-        "raw": raw,
-        "action": action,
-        "date": date,
-        "time": time,
-        "text": reminder,
-    }
-
-
-
-
 def compare_records(
     excel: Dict[str, Any], python_plan: Dict[str, Any], scenario: Dict[str, Any]
 ) -> Dict[str, Dict[str, Any]]:
@@ -302,99 +296,240 @@ def compare_records(
     return diffs
 
 
+class ExcelSession:
+    """Excel instance that is only started when a scenario needs it."""
+
+    def __init__(self, workbook_path: Path, visible: bool = False) -> None:
+        self.workbook_path = workbook_path
+        self.visible = visible
+        self._app = None
+        self._book = None
+
+    def _open(self) -> None:
+        if xw is None:
+            raise SystemExit("xlwings is not installed; run with --offline to replay recorded outputs only")
+        if not self.workbook_path.exists():
+            raise SystemExit(f"Workbook not found: {self.workbook_path}")
+        self._app = xw.App(visible=self.visible)
+        self._app.display_alerts = False
+        self._app.screen_updating = False
+        self._book = self._app.books.open(str(self.workbook_path))
+        try:
+            self._app.calculation = "manual"
+        except AttributeError:
+            try:
+                self._app.api.Calculation = -4135  # xlCalculationManual
+            except Exception:
+                pass
+
+    def read(self, scenario: Dict[str, Any]) -> Dict[str, Any]:
+        if self._book is None:
+            self._open()
+        set_inputs(self._book.sheets["Gentacalc"], scenario)
+        self._app.calculate()
+        return read_excel_outputs(self._book)
+
+    def close(self) -> None:
+        try:
+            if self._book is not None:
+                self._book.close()
+        finally:
+            if self._app is not None:
+                self._app.quit()
+
+
+def build_python_plan(scenario: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    patient = PatientInput(
+        sex=scenario["sex"],
+        age_years=scenario["age"],
+        weight_kg=scenario["weight"],
+        height_cm=scenario["height"],
+        creatinine_umol_l=scenario["creatinine"],
+        mg_per_kg=scenario["mg_per_kg"],
+        first_dose_hour=scenario["first_dose_hour"],
+    )
+    python_plan_obj = calculate_plan(patient, now=now)
+    return {
+        "plan": {
+            "first_dose_mg": python_plan_obj.first_dose_mg,
+            "second_dose_mg": python_plan_obj.second_dose_mg,
+            "third_dose_mg": python_plan_obj.third_dose_mg,
+            "instructions": list(python_plan_obj.instructions),
+        },
+        "context": {
+            "bmi": python_plan_obj.context.bmi,
+            "ideal_body_weight": python_plan_obj.context.ideal_body_weight,
+            "adjusted_body_weight": python_plan_obj.context.adjusted_body_weight,
+            "dosing_weight": python_plan_obj.context.dosing_weight,
+            "cockcroft_gault": python_plan_obj.context.cockcroft_gault,
+            "cockcroft_gault_female": python_plan_obj.context.cockcroft_gault_female,
+            "cockcroft_gault_bmi_29_9": python_plan_obj.context.cockcroft_gault_bmi_29_9,
+            "chosen_gfr": python_plan_obj.context.chosen_gfr,
+            "creatinine_used": python_plan_obj.context.creatinine_used,
+            "gfr_band": python_plan_obj.context.gfr_band,
+        },
+    }
+
+
+def _evaluate_item(
+    idx: int, scenario: Dict[str, Any], excel_outputs: Dict[str, Any], now: datetime
+) -> Dict[str, Any]:
+    try:
+        python_plan = build_python_plan(scenario, now)
+    except ValueError as exc:
+        return {
+            "id": idx,
+            "input": scenario,
+            "error": str(exc),
+        }
+    return {
+        "id": idx,
+        "input": scenario,
+        "excel": excel_outputs,
+        "python": python_plan,
+        "differences": compare_records(excel_outputs, python_plan, scenario),
+    }
+
+
+def _evaluate_chunk(items: List[tuple]) -> List[Dict[str, Any]]:
+    return [_evaluate_item(*item) for item in items]
+
+
+def _resolve_chunk(
+    chunk: List[tuple],
+    session: ExcelSession,
+    oracle: Optional[OracleStore],
+    offline: bool,
+) -> tuple[List[tuple], int, int]:
+    """Attach Excel outputs (recorded or fresh) to each ``(id, scenario)``.
+
+    Returns the evaluable items and the number replayed and missing.
+    """
+    if oracle is not None:
+        entries = oracle.get_many([scenario for _, scenario in chunk])
+    else:
+        entries = [None] * len(chunk)
+    items = []
+    replayed = missing = 0
+    for (idx, scenario), entry in zip(chunk, entries):
+        if entry is not None:
+            recorded_at = entry.recorded_at
+            now = datetime(recorded_at.year, recorded_at.month, recorded_at.day)
+            items.append((idx, scenario, entry.outputs, now))
+            replayed += 1
+        elif offline:
+            missing += 1
+        else:
+            excel_outputs = session.read(scenario)
+            now = datetime.now()
+            if oracle is not None:
+                oracle.put(scenario, excel_outputs, now.date())
+            items.append((idx, scenario, excel_outputs, now))
+    return items, replayed, missing
+
+
+def _chunks(
+    scenarios: Iterable[Dict[str, Any]], size: int, skip_ids: Collection[int] = frozenset()
+) -> Iterator[List[tuple]]:
+    # Grid indices are stable across samples and shards, so they serve as ids.
+    numbered = (
+        (idx, scenario)
+        for idx, scenario in ((encode_scenario(scenario), scenario) for scenario in scenarios)
+        if idx not in skip_ids
+    )
+    while True:
+        chunk = list(itertools.islice(numbered, size))
+        if not chunk:
+            return
+        yield chunk
+
+
 def evaluate_scenarios(
     workbook_path: Path,
     scenarios: Iterable[Dict[str, Any]],
     visible: bool = False,
     fail_fast: bool = False,
+    oracle: Optional[OracleStore] = None,
+    offline: bool = False,
+    workers: int = 1,
+    chunk_size: int = 256,
+    progress: bool = False,
+    total: Optional[int] = None,
+    sink: Optional[Callable[[Dict[str, Any]], None]] = None,
+    skip_ids: Collection[int] = frozenset(),
 ) -> Dict[str, Any]:
-    app = xw.App(visible=visible)
-    app.display_alerts = False
-    app.screen_updating = False
-    try:
-        book = app.books.open(str(workbook_path))
-        try:
-            sheet = book.sheets["Gentacalc"]
-            try:
-                app.calculation = "manual"
-            except AttributeError:
-                try:
-                    app.api.Calculation = -4135  # xlCalculationManual
-                except Exception:
-                    pass
-
-            results: list[Dict[str, Any]] = []
-            mismatches: list[Dict[str, Any]] = []
-
-            for idx, scenario in enumerate(scenarios, start=1):
-                set_inputs(sheet, scenario)
-                app.calculate()
-                excel_outputs = read_excel_outputs(book)
-
-                patient = PatientInput(
-                    sex=scenario["sex"],
-                    age_years=scenario["age"],
-                    weight_kg=scenario["weight"],
-                    height_cm=scenario["height"],
-                    creatinine_umol_l=scenario["creatinine"],
-                    mg_per_kg=scenario["mg_per_kg"],
-                    first_dose_hour=scenario["first_dose_hour"],
-                )
-
-                now = datetime.now()
-                try:
-                    python_plan_obj = calculate_plan(patient, now=now)
-                except ValueError as exc:
-                    results.append(
-                        {
-                            "id": idx,
-                            "input": scenario,
-                            "error": str(exc),
-                        }
-                    )
-                    continue
-                python_plan = {
-                    "plan": {
-                        "first_dose_mg": python_plan_obj.first_dose_mg,
-                        "second_dose_mg": python_plan_obj.second_dose_mg,
-                        "third_dose_mg": python_plan_obj.third_dose_mg,
-                        "instructions": list(python_plan_obj.instructions),
-                    },
-                    "context": {
-                        "bmi": python_plan_obj.context.bmi,
-                        "ideal_body_weight": python_plan_obj.context.ideal_body_weight,
-                        "adjusted_body_weight": python_plan_obj.context.adjusted_body_weight,
-                        "dosing_weight": python_plan_obj.context.dosing_weight,
-                        "cockcroft_gault": python_plan_obj.context.cockcroft_gault,
-                        "cockcroft_gault_female": python_plan_obj.context.cockcroft_gault_female,
-                        "cockcroft_gault_bmi_29_9": python_plan_obj.context.cockcroft_gault_bmi_29_9,
-                        "chosen_gfr": python_plan_obj.context.chosen_gfr,
-                        "creatinine_used": python_plan_obj.context.creatinine_used,
-                        "gfr_band": python_plan_obj.context.gfr_band,
-                    },
-                }
-
-                diff = compare_records(excel_outputs, python_plan, scenario)
-
-                record = {
-                    "id": idx,
-                    "input": scenario,
-                    "excel": excel_outputs,
-                    "python": python_plan,
-                    "differences": diff,
-                }
-                results.append(record)
-                if diff:
-                    mismatches.append(record)
-                    if fail_fast:
-                        break
-
-            return {"results": results, "mismatches": mismatches}
+    """Compare each scenario, replaying Excel outputs from ``oracle`` when recorded.
+
+    Fresh Excel reads are added to ``oracle``. Python plans are rendered for
+    the day the Excel outputs were recorded, so instruction dates line up.
+    With ``workers > 1`` the Python engine and diffing run in a process pool,
+    ``chunk_size`` scenarios per task, while this process keeps reading Excel;
+    results are merged back in scenario order. Record ids are grid indices
+    (see :func:`encode_scenario`). ``total`` is only used for progress output.
+
+    Each record is handed to ``sink`` as soon as it is merged and is not kept;
+    only the counts and the first few mismatches are returned. Scenarios whose
+    id is in ``skip_ids`` are not evaluated at all.
+    """
+    session = ExcelSession(workbook_path, visible=visible)
+    sample: list[Dict[str, Any]] = []
+    mismatches = 0
+    missing = 0
+    replayed = 0
+    done = 0
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    pending: Deque[Future] = deque()
+
+    def collect(records: List[Dict[str, Any]]) -> bool:
+        nonlocal done, mismatches
+        for record in records:
+            if sink is not None:
+                sink(record)
+            done += 1
+            if record.get("differences"):
+                mismatches += 1
+                if len(sample) < MISMATCH_SAMPLE:
+                    sample.append(record)
+                if fail_fast:
+                    return True
+        if progress:
+            suffix = f"/{total}" if total is not None else ""
+            print(f"\rEvaluated {done}{suffix}", end="", file=sys.stderr, flush=True)
+        return False
 
-        finally:
-            book.close()
+    try:
+        stop = False
+        for chunk in _chunks(scenarios, chunk_size, skip_ids):
+            items, chunk_replayed, chunk_missing = _resolve_chunk(chunk, session, oracle, offline)
+            replayed += chunk_replayed
+            missing += chunk_missing
+            if pool is None:
+                stop = collect(_evaluate_chunk(items))
+            else:
+                pending.append(pool.submit(_evaluate_chunk, items))
+                # Bound the work in flight so memory does not grow with the run.
+                while len(pending) > workers * 2 and not stop:
+                    stop = collect(pending.popleft().result())
+            if stop:
+                break
+        while pending and not stop:
+            stop = collect(pending.popleft().result())
     finally:
-        app.quit()
+        if progress and done:
+            print(file=sys.stderr)
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if oracle is not None:
+            oracle.commit()
+        session.close()
+
+    return {
+        "evaluated": done,
+        "mismatches": mismatches,
+        "sample_mismatches": sample,
+        "missing": missing,
+        "replayed": replayed,
+    }
 
 
 def main() -> None:
@@ -410,8 +545,26 @@ def main() -> None:
     parser.add_argument(
         "--max-scenarios",
         type=int,
-        default=1500,
-        help="Maximum number of scenarios to evaluate.",
+        default=None,
+        help=f"Maximum number of scenarios to evaluate (default: {DEFAULT_SCENARIOS}).",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--exhaustive",
+        action="store_true",
+        help=f"Evaluate every grid point ({GRID_SIZE} scenarios) instead of a sample.",
+    )
+    source.add_argument(
+        "--from-oracle",
+        action="store_true",
+        help="Evaluate exactly the scenarios recorded in the oracle.",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=(0, 1),
+        metavar="i/N",
+        help="Only evaluate shard i of N (1-based), e.g. --shard 2/8.",
     )
     parser.add_argument(
         "--seed",
@@ -422,8 +575,19 @@ def main() -> None:
     parser.add_argument(
         "--output",
         type=Path,
-        default=Path("scripts/compare_results.json"),
-        help="Path to write JSON results (default: scripts/compare_results.json)",
+        default=DEFAULT_RESULTS,
+        help=f"JSONL file the records are appended to (default: {DEFAULT_RESULTS})",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run: keep the records in --output and skip their ids.",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=1000,
+        help="Records between durable checkpoints of the output file.",
     )
     parser.add_argument(
         "--visible",
@@ -435,40 +599,109 @@ def main() -> None:
         action="store_true",
         help="Stop after the first mismatch is detected.",
     )
+    parser.add_argument(
+        "--oracle",
+        type=Path,
+        default=DEFAULT_STORE,
+        help=f"Recorded Excel outputs to replay and extend (default: {DEFAULT_STORE})",
+    )
+    parser.add_argument(
+        "--no-oracle",
+        action="store_true",
+        help="Always read from Excel and do not record the outputs.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help=(
+            "Never start Excel. Without --exhaustive or --max-scenarios this implies "
+            "--from-oracle; scenarios missing from the oracle fail the run."
+        ),
+    )
 
-    args = parser.parse_args()
-
-    if not args.workbook.exists():
-        raise SystemExit(f"Workbook not found: {args.workbook}")
-
-    scenarios = generate_scenarios(args.max_scenarios, seed=args.seed)
-    summary = evaluate_scenarios(
-        args.workbook, scenarios, visible=args.visible, fail_fast=args.fail_fast
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes for the Python engine and diffing (default: all cores; 1 runs inline).",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=256,
+        help="Scenarios per work item sent to a worker process.",
     )
 
-    total = len(summary["results"])
-    mismatches = summary["mismatches"]
+    args = parser.parse_args()
+    if args.offline and args.no_oracle:
+        parser.error("--offline needs the oracle")
+
+    if args.from_oracle and args.no_oracle:
+        parser.error("--from-oracle needs the oracle")
+
+    if args.offline and not args.exhaustive and args.max_scenarios is None:
+        # A random sample would mostly miss the oracle without Excel.
+        args.from_oracle = True
+    if args.max_scenarios is None:
+        args.max_scenarios = DEFAULT_SCENARIOS
+
+    shard, shards = args.shard
+    oracle = None if args.no_oracle else OracleStore(args.oracle)
+    if args.exhaustive:
+        scenarios = all_scenarios(shard, shards)
+        total = len(range(shard, GRID_SIZE, shards))
+    elif args.from_oracle:
+        recorded = sorted(_grid_indices(scenario_from_key(key) for key in oracle.keys()))
+        scenarios = (decode_scenario(index) for index in recorded[shard::shards])
+        total = len(recorded[shard::shards])
+    else:
+        scenarios = generate_scenarios(args.max_scenarios, args.seed, shard, shards)
+        total = len(range(shard, min(args.max_scenarios, GRID_SIZE), shards))
+    writer = ResultWriter(args.output, resume=args.resume, checkpoint_every=args.checkpoint_every)
+    previous = writer.records
+    if previous:
+        print(f"Resuming {args.output}: {previous} records already written")
+        if total is not None:
+            total = max(total - previous, 0)
+    try:
+        summary = evaluate_scenarios(
+            args.workbook,
+            scenarios,
+            visible=args.visible,
+            fail_fast=args.fail_fast,
+            oracle=oracle,
+            offline=args.offline,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            progress=True,
+            total=total,
+            sink=writer.write,
+            skip_ids=writer.done_ids,
+        )
+    finally:
+        writer.close()
+        if oracle is not None:
+            oracle.close()
 
-    print(f"Evaluated scenarios: {total}")
-    print(f"Mismatches found: {len(mismatches)}")
+    print(f"Evaluated scenarios: {summary['evaluated']} ({summary['replayed']} replayed from the oracle)")
+    if summary["missing"]:
+        print(f"Not in the oracle (skipped): {summary['missing']}")
+    print(f"Mismatches found: {summary['mismatches']}")
 
-    if mismatches:
-        sample = mismatches[: min(5, len(mismatches))]
+    if summary["sample_mismatches"]:
         print("\nSample mismatches:")
-        for entry in sample:
+        for entry in summary["sample_mismatches"]:
             print(f"Scenario #{entry['id']}: {entry['input']}")
             for field, diff in entry["differences"].items():
                 print(f"  {field}: Excel={diff['excel']} vs Python={diff['python']}")
-        print("\nFull mismatch details available in JSON output (if requested).")
-
-    if args.output:
-        output_path = args.output
-        output_path.parent.mkdir(parents=True, exist_ok=True)
-        output_path.write_text(json.dumps(summary, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
-        print(f"Wrote detailed comparison to {output_path}")
 
-    if mismatches:
+    print(f"Wrote {writer.records} records ({writer.mismatches} with mismatches) to {args.output}")
+    if writer.mismatches:
         raise SystemExit(1)
+    if args.offline and summary["missing"]:
+        raise SystemExit(f"{summary['missing']} scenarios are not in the oracle; record them with Excel first")
+    if not writer.records:
+        raise SystemExit("No scenarios were evaluated")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Streaming storage for comparison records.
+
+``compare_excel_with_python.py`` appends one JSON record per line as
+scenarios complete. Every ``checkpoint_every`` records the file is fsynced
+and ``<output>.checkpoint`` is rewritten with the durable length and the
+running counts. ``--resume`` truncates the file to the last checkpoint (which
+drops a half-written line after a crash) and skips the ids already in it.
+
+The analyzer scripts read records through :func:`iter_records`, one record
+at a time. It also streams the older single-document ``{"results": [...]}``
+files (and bare arrays) element by element, so multi-gigabyte runs are
+filtered in constant memory.
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Set, TextIO
+
+DEFAULT_RESULTS = Path("scripts/compare_results.jsonl")
+LEGACY_RESULTS = Path("scripts/compare_results.json")
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_READ_SIZE = 64 * 1024
+
+
+def default_results_path() -> Path:
+    """The JSONL results if present, otherwise the legacy JSON document."""
+    return DEFAULT_RESULTS if DEFAULT_RESULTS.exists() or not LEGACY_RESULTS.exists() else LEGACY_RESULTS
+
+
+def checkpoint_path(path: Path) -> Path:
+    return path.with_name(path.name + ".checkpoint")
+
+
+class _JsonStream:
+    """Decode consecutive JSON values from a text file without loading it whole."""
+
+    def __init__(self, handle: TextIO, chunk_size: int = _READ_SIZE) -> None:
+        self._handle = handle
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        # Read at least as much as is buffered so a large value is not
+        # re-decoded once per small chunk.
+        data = self._handle.read(max(self._chunk_size, len(self._buffer) - self._pos))
+        if not data:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos :] + data
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or ``""`` at end of file."""
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self._pos} of the buffered input")
+        self._pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def array_items(self) -> Iterator[Any]:
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == "]":
+                self._pos += 1
+                return
+            self.expect(",")
+
+
+def _iter_document(handle: TextIO) -> Iterator[Dict[str, Any]]:
+    # Legacy output: a top-level array of records, or ``{"results": [...], ...}``.
+    stream = _JsonStream(handle)
+    if stream.peek() == "[":
+        yield from stream.array_items()
+        return
+    stream.expect("{")
+    while stream.peek() != "}":
+        key = stream.value()
+        stream.expect(":")
+        if key == "results":
+            yield from stream.array_items()
+            return
+        stream.value()
+        if stream.peek() == ",":
+            stream.expect(",")
+
+
+def iter_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield comparison records one at a time from a JSONL or legacy JSON file.
+
+    Memory use is bounded by the largest single record, not by the file size.
+    """
+    with path.open(encoding="utf-8") as handle:
+        first = handle.read(1)
+        while first and first in _WHITESPACE:
+            first = handle.read(1)
+        handle.seek(0)
+        if first == "[" or (first == "{" and path.suffix == ".json"):
+            yield from _iter_document(handle)
+            return
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+class JsonArrayWriter:
+    """Write a JSON array one item at a time.
+
+    The output matches ``json.dumps(items, indent=2)`` for the same items.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = path.open("w", encoding="utf-8")
+        self.count = 0
+
+    def write(self, item: Any) -> None:
+        text = json.dumps(item, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        self._handle.write(("[\n  " if self.count == 0 else ",\n  ") + text)
+        self.count += 1
+
+    def close(self) -> None:
+        self._handle.write("\n]\n" if self.count else "[]\n")
+        self._handle.close()
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class ResultWriter:
+    """Append-only JSONL writer with periodic durable checkpoints."""
+
+    def __init__(self, path: Path, resume: bool = False, checkpoint_every: int = 1000) -> None:
+        self.path = path
+        self.checkpoint_every = checkpoint_every
+        self.done_ids: Set[int] = set()
+        self.records = 0
+        self.mismatches = 0
+        self.errors = 0
+        self._since_checkpoint = 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        if resume and path.exists():
+            self._load_existing()
+            self._handle = path.open("a", encoding="utf-8", newline="\n")
+        else:
+            self._handle = path.open("w", encoding="utf-8", newline="\n")
+            self.checkpoint()
+
+    def _load_existing(self) -> None:
+        marker = checkpoint_path(self.path)
+        limit: Optional[int] = None
+        if marker.exists():
+            limit = json.loads(marker.read_text(encoding="utf-8"))["offset"]
+
+        valid = 0
+        with self.path.open("rb") as handle:
+            for line in handle:
+                if limit is not None and valid + len(line) > limit:
+                    break
+                if not line.endswith(b"\n"):
+                    break  # half-written record
+                self._count(json.loads(line))
+                valid += len(line)
+        with self.path.open("r+b") as handle:
+            handle.truncate(valid)
+
+    def _count(self, record: Dict[str, Any]) -> None:
+        self.done_ids.add(record["id"])
+        self.records += 1
+        if record.get("differences"):
+            self.mismatches += 1
+        if "error" in record:
+            self.errors += 1
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._count(record)
+        self._since_checkpoint += 1
+        if self._since_checkpoint >= self.checkpoint_every:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        state = {
+            "offset": self._handle.tell(),
+            "records": self.records,
+            "mismatches": self.mismatches,
+            "errors": self.errors,
+            "updated": datetime.now().isoformat(timespec="seconds"),
+        }
+        marker = checkpoint_path(self.path)
+        temporary = marker.with_name(marker.name + ".tmp")
+        temporary.write_text(json.dumps(state) + "\n", encoding="utf-8")
+        os.replace(temporary, marker)
+        self._since_checkpoint = 0
+
+    def close(self) -> None:
+        self.checkpoint()
+        self._handle.close()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
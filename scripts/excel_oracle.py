@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Recorded Excel outputs for the comparison scenarios.
+
+The workbook is deterministic apart from the instruction dates, which Excel
+derives from the day it ran. Each entry therefore stores the values read by
+``read_excel_outputs`` together with that day, and replays compare against a
+Python plan rendered for the same day.
+
+The store is a single SQLite file keyed by the scenario inputs. Entries can
+be imported from the records of an earlier comparison run:
+
+Usage:
+    python scripts/excel_oracle.py import scripts/compare_results.jsonl --recorded-at 2025-10-16
+    python scripts/excel_oracle.py stats
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from scripts.comparison_results import iter_records
+
+DEFAULT_STORE = Path("scripts/excel_oracle.sqlite")
+
+SCENARIO_FIELDS = (
+    "sex",
+    "age",
+    "weight",
+    "height",
+    "creatinine",
+    "mg_per_kg",
+    "first_dose_hour",
+)
+
+# Order of the values stored per entry; matches ``read_excel_outputs``.
+OUTPUT_FIELDS = (
+    "first_dose_mg",
+    "second_dose_mg",
+    "third_dose_mg",
+    "instruction1",
+    "instruction2",
+    "instruction3",
+    "chosen_gfr",
+    "gfr_band",
+    "bmi",
+    "ibw",
+    "abw",
+    "dosing_weight",
+    "cockcroft_gault",
+    "creatinine_used",
+    "offset_hours",
+    "offset_correction",
+    "reduction_factor",
+    "window_multiplier",
+)
+
+# SQLite limits the number of bound parameters per statement.
+_LOOKUP_BATCH = 500
+
+
+class OracleEntry(NamedTuple):
+    outputs: Dict[str, Any]
+    recorded_at: date
+
+
+def scenario_key(scenario: Dict[str, Any]) -> str:
+    """Canonical key; ``60`` and ``60.0`` map to the same entry."""
+    values: List[Any] = []
+    for field in SCENARIO_FIELDS:
+        value = scenario[field]
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        values.append(value)
+    return json.dumps(values, separators=(",", ":"))
+
+
+def scenario_from_key(key: str) -> Dict[str, Any]:
+    return dict(zip(SCENARIO_FIELDS, json.loads(key)))
+
+
+class OracleStore:
+    def __init__(self, path: Path = DEFAULT_STORE) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(self.path))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outputs ("
+            " scenario TEXT PRIMARY KEY,"
+            " recorded_at TEXT NOT NULL,"
+            " outputs TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def __enter__(self) -> "OracleStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM outputs").fetchone()[0]
+
+    def __contains__(self, scenario: Dict[str, Any]) -> bool:
+        return self.get(scenario) is not None
+
+    @staticmethod
+    def _entry(recorded_at: str, outputs: str) -> OracleEntry:
+        return OracleEntry(
+            dict(zip(OUTPUT_FIELDS, json.loads(outputs))), date.fromisoformat(recorded_at)
+        )
+
+    def get(self, scenario: Dict[str, Any]) -> Optional[OracleEntry]:
+        row = self._db.execute(
+            "SELECT recorded_at, outputs FROM outputs WHERE scenario = ?",
+            (scenario_key(scenario),),
+        ).fetchone()
+        return None if row is None else self._entry(*row)
+
+    def get_many(self, scenarios: List[Dict[str, Any]]) -> List[Optional[OracleEntry]]:
+        """Look up several scenarios at once, in input order."""
+        keys = [scenario_key(scenario) for scenario in scenarios]
+        found: Dict[str, OracleEntry] = {}
+        unique = list(dict.fromkeys(keys))
+        for start in range(0, len(unique), _LOOKUP_BATCH):
+            batch = unique[start : start + _LOOKUP_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            for key, recorded_at, outputs in self._db.execute(
+                f"SELECT scenario, recorded_at, outputs FROM outputs WHERE scenario IN ({placeholders})",
+                batch,
+            ):
+                found[key] = self._entry(recorded_at, outputs)
+        return [found.get(key) for key in keys]
+
+    def put(self, scenario: Dict[str, Any], outputs: Dict[str, Any], recorded_at: date) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO outputs VALUES (?, ?, ?)",
+            (
+                scenario_key(scenario),
+                recorded_at.isoformat(),
+                json.dumps([outputs.get(field) for field in OUTPUT_FIELDS], ensure_ascii=False),
+            ),
+        )
+
+    def put_many(self, rows: Iterable[Tuple[Dict[str, Any], Dict[str, Any], date]]) -> int:
+        count = 0
+        with self._db:
+            for scenario, outputs, recorded_at in rows:
+                self.put(scenario, outputs, recorded_at)
+                count += 1
+        return count
+
+    def commit(self) -> None:
+        self._db.commit()
+
+    def keys(self) -> Iterator[str]:
+        for (key,) in self._db.execute("SELECT scenario FROM outputs ORDER BY scenario"):
+            yield key
+
+    def entries(self) -> Iterator[Tuple[str, OracleEntry]]:
+        for key, recorded_at, outputs in self._db.execute(
+            "SELECT scenario, recorded_at, outputs FROM outputs ORDER BY scenario"
+        ):
+            yield key, self._entry(recorded_at, outputs)
+
+
+def _results_with_excel(path: Path) -> Iterator[Dict[str, Any]]:
+    for record in iter_records(path):
+        if record.get("excel"):
+            yield record
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manage the recorded Excel oracle.")
+    parser.add_argument("--store", type=Path, default=DEFAULT_STORE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    importer = commands.add_parser("import", help="Import Excel outputs from a comparison file.")
+    importer.add_argument("results", type=Path)
+    importer.add_argument(
+        "--recorded-at",
+        type=date.fromisoformat,
+        required=True,
+        help="Day the Excel session ran (YYYY-MM-DD); instruction dates depend on it.",
+    )
+    commands.add_parser("stats", help="Show the number of recorded scenarios.")
+
+    args = parser.parse_args()
+    with OracleStore(args.store) as store:
+        if args.command == "import":
+            count = store.put_many(
+                (record["input"], record["excel"], args.recorded_at)
+                for record in _results_with_excel(args.results)
+            )
+            print(f"Imported {count} scenarios into {args.store} ({len(store)} total)")
+        else:
+            days: Dict[date, int] = {}
+            for _, entry in store.entries():
+                days[entry.recorded_at] = days.get(entry.recorded_at, 0) + 1
+            print(f"{len(store)} scenarios in {args.store}")
+            for day, count in sorted(days.items()):
+                print(f"  recorded {day.isoformat()}: {count}")
+
+
+if __name__ == "__main__":
+    main()
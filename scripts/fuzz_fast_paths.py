@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+"""
+Differential fuzzing of the engine's fast paths against ``calculate_plan``.
+
+Every generated patient goes through ``parse_patient`` and is then evaluated
+by the scalar reference (``calculate_plan`` + ``dumps_plan``) and by each
+fast path:
+
+  batch   ``calculate_plans_for`` -> ``plans_from_array``, field by field
+  json    ``plan_array_members`` (the /api/dose/batch encoder), byte for byte
+  cache   ``calculate_plan`` through a small ``PlanCache``, twice per case
+  lookup  ``DoseTable.lookup`` doses, GFR band and alert bits on the grid
+
+Values are compared by ``repr``, so an int where the reference has a float
+(``61`` vs ``61.0`` on the wire) counts as a disagreement.
+
+A few cases carry a NaN, infinite or overflowing number. ``parse_patient``
+rejects them, and the batch validator (``parse_patients``, also after a JSON
+round trip for ``json``) must reject them with the same message and field.
+
+Inputs concentrate at the bounds ``parse_patient`` enforces and at the
+thresholds the engine branches on: BMI 30/35, GFR 40/59/60, creatinine 60,
+weight = 1.25 x IBW, a raw first dose of 600 mg and the 40 mg rounding
+midpoints, and the first-dose hours around 12 and the 3/19 hour offsets.
+About half of the cases are snapped to the dose table grid.
+
+Work is split into tasks of ``--batch-size`` cases, each seeded from
+``--seed`` and its task number, so a run is reproducible for any number of
+workers, and ``--shard i/N`` takes every N-th task. Each disagreement is
+shrunk to a simpler payload that still fails and printed together with a
+``--replay`` command.
+
+Usage:
+    python scripts/fuzz_fast_paths.py --cases 200000
+    python scripts/fuzz_fast_paths.py --cases 10000000 --shard 2/4 --output fuzz-2.json
+    python scripts/fuzz_fast_paths.py --replay '{"sex": "male", "age": 16, ...}' --now 2025-03-30T09:00
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import fields
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gentacalc.alerts import ALERT_FLAGS, alert_keys
+from gentacalc.anthropometrics import compute_weight_metrics
+from gentacalc.batch import calculate_plans_for, plans_from_array
+from gentacalc.engine import PlanCache, calculate_plan
+from gentacalc.lookup import DEFAULT_PATH, DoseTable, Grid, TableEntry, build_table
+from gentacalc.models import CalculationContext, DosingPlan, PatientInput
+from gentacalc.parser import PATIENT_FIELDS, ValidationError, parse_patient, parse_patients
+from gentacalc.serialization import plan_array_members, plan_members
+from scripts.compare_excel_with_python import parse_shard
+
+PATHS = ("batch", "json", "cache", "lookup")
+
+BOUNDS = {spec.key: (spec.minimum, spec.maximum) for spec in PATIENT_FIELDS}
+NUMERIC_FIELDS = ("age", "weight", "height", "creatinine", "mg_per_kg")
+
+# First-dose hours where the schedule or the second-dose reduction changes.
+EDGE_HOURS = (1, 7, 8, 11, 12, 13, 15, 16, 23, 24)
+
+# Numbers that must be rejected; ``json.loads`` accepts NaN and Infinity.
+NON_FINITE = (math.nan, math.inf, -math.inf, 10**400, "nan", "-Infinity", "1e999")
+
+Diffs = Dict[str, Tuple[str, str]]
+
+
+# --------------------------------------------------------------------------
+# Case generation
+# --------------------------------------------------------------------------
+
+
+def _near(rng: random.Random, value: float) -> float:
+    """``value`` or a value just beside it, at a random scale."""
+    choice = rng.random()
+    if choice < 0.2:
+        return value
+    if choice < 0.4:
+        return math.nextafter(value, rng.choice((-math.inf, math.inf)))
+    if choice < 0.6:
+        return rng.choice((math.floor(value), math.ceil(value)))
+    if choice < 0.8:
+        return round(value, rng.choice((1, 2, 3)))
+    return value + rng.uniform(-1.0, 1.0)
+
+
+def _field_value(rng: random.Random, key: str) -> float:
+    low, high = BOUNDS[key]
+    choice = rng.random()
+    if choice < 0.15:
+        return rng.choice((low, high))
+    if choice < 0.25:
+        return rng.choice((math.nextafter(low, math.inf), math.nextafter(high, -math.inf)))
+    if choice < 0.6:
+        return float(rng.randint(int(low), int(high)))
+    if choice < 0.8:
+        return round(rng.uniform(low, high), rng.choice((1, 2)))
+    return rng.uniform(low, high)
+
+
+def _clip(key: str, value: float) -> float:
+    low, high = BOUNDS[key]
+    return min(max(value, low), high)
+
+
+def _patient(payload: Dict[str, Any]) -> PatientInput:
+    return PatientInput(
+        sex=payload["sex"],
+        age_years=payload["age"],
+        weight_kg=payload["weight"],
+        height_cm=payload["height"],
+        creatinine_umol_l=payload["creatinine"],
+        mg_per_kg=payload["mg_per_kg"],
+        first_dose_hour=int(payload["first_dose_hour"]),
+    )
+
+
+def _target_bmi(rng: random.Random, payload: Dict[str, Any]) -> None:
+    if payload["height"] is None:
+        payload["height"] = _field_value(rng, "height")
+    target = rng.choice((30.0, 35.0))
+    payload["weight"] = _clip("weight", _near(rng, target * (payload["height"] / 100) ** 2))
+
+
+def _target_gfr(rng: random.Random, payload: Dict[str, Any]) -> None:
+    patient = _patient(payload)
+    weight = compute_weight_metrics(patient)
+    factor = 1.0 if patient.sex == "male" else 0.85
+    cockcroft_weight = patient.weight_kg
+    obese = weight.bmi is not None and weight.bmi > 30
+    if obese and weight.adjusted_body_weight:
+        cockcroft_weight = weight.adjusted_body_weight
+    target = rng.choice((40.0, 59.0, 60.0))
+    # chosen_gfr = K / creatinine; solve for the creatinine that gives ``target``.
+    creatinine = (140 - patient.age_years) * cockcroft_weight * factor / (0.814 * target)
+    if obese and patient.height_cm:
+        surrogate = (140 - patient.age_years) * 29.9 * (patient.height_cm / 100) ** 2 * factor
+        creatinine = max(creatinine, surrogate / (0.814 * target))
+    if rng.random() < 0.2:
+        creatinine = 60.0
+    payload["creatinine"] = _clip("creatinine", _near(rng, creatinine))
+
+
+def _target_first_dose(rng: random.Random, payload: Dict[str, Any]) -> None:
+    dosing_weight = compute_weight_metrics(_patient(payload)).dosing_weight
+    if rng.random() < 0.5:
+        target = 600.0
+    else:
+        target = 40.0 * rng.randint(3, 15) + 20.0  # rounding midpoint
+    payload["mg_per_kg"] = _clip("mg_per_kg", _near(rng, target / dosing_weight))
+
+
+def _target_ideal_weight(rng: random.Random, payload: Dict[str, Any]) -> None:
+    if payload["height"] is None:
+        payload["height"] = _field_value(rng, "height")
+    ideal = (50.0 if payload["sex"] == "male" else 45.5) + 0.9 * (payload["height"] - 152)
+    payload["weight"] = _clip("weight", _near(rng, ideal * 1.25))
+
+
+TARGETS: Tuple[Callable[[random.Random, Dict[str, Any]], None], ...] = (
+    _target_bmi,
+    _target_gfr,
+    _target_first_dose,
+    _target_ideal_weight,
+)
+
+
+def _snap_to_grid(rng: random.Random, payload: Dict[str, Any]) -> None:
+    for key in ("age", "weight", "height", "creatinine"):
+        if payload[key] is not None:
+            payload[key] = float(rng.choice((math.floor, math.ceil))(payload[key]))
+    payload["mg_per_kg"] = math.floor(payload["mg_per_kg"] * 2 + rng.random()) / 2
+
+
+def generate_payload(rng: random.Random) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"sex": rng.choice(("female", "male"))}
+    for key in NUMERIC_FIELDS:
+        payload[key] = _field_value(rng, key)
+    if rng.random() < 0.15:
+        payload["height"] = None
+    if rng.random() < 0.5:
+        payload["first_dose_hour"] = float(rng.choice(EDGE_HOURS))
+    else:
+        payload["first_dose_hour"] = float(rng.randint(1, 24))
+
+    # Apply zero to three threshold targets; later ones may move earlier ones
+    # off their threshold, which is fine - it still lands somewhere nearby.
+    for target in rng.sample(TARGETS, rng.choice((0, 1, 1, 2, 3))):
+        target(rng, payload)
+    if rng.random() < 0.5:
+        _snap_to_grid(rng, payload)
+    for key in NUMERIC_FIELDS:
+        if payload[key] is not None:
+            payload[key] = _clip(key, payload[key])
+    if rng.random() < 0.02:
+        payload[rng.choice(NUMERIC_FIELDS + ("first_dose_hour",))] = rng.choice(NON_FINITE)
+    return payload
+
+
+def _task_now(rng: random.Random) -> datetime:
+    return datetime(2024, 1, 1) + timedelta(days=rng.randrange(3 * 366), hours=rng.randrange(24))
+
+
+# --------------------------------------------------------------------------
+# Comparison
+# --------------------------------------------------------------------------
+
+
+def _plan_values(plan: DosingPlan) -> Dict[str, str]:
+    values = {
+        f"plan.{field.name}": repr(getattr(plan, field.name))
+        for field in fields(DosingPlan)
+        if field.compare and field.name != "context"
+    }
+    # The rendered strings are properties backed by uncompared cache fields.
+    values["plan.instructions"] = repr(plan.instructions)
+    values["plan.monitoring"] = repr(plan.monitoring)
+    for field in fields(CalculationContext):
+        values[f"context.{field.name}"] = repr(getattr(plan.context, field.name))
+    return values
+
+
+def _diff(expected: Dict[str, str], actual: Dict[str, str]) -> Diffs:
+    return {
+        key: (value, actual.get(key, "<missing>"))
+        for key, value in expected.items()
+        if actual.get(key, "<missing>") != value
+    }
+
+
+def _table_entry(plan: DosingPlan) -> TableEntry:
+    mask = 0
+    for key in alert_keys(plan.alerts):
+        mask |= 1 << ALERT_FLAGS.index(key)
+    return TableEntry(
+        plan.first_dose_mg,
+        plan.second_dose_mg,
+        plan.third_dose_mg,
+        plan.context.gfr_band or 0,
+        mask,
+    )
+
+
+def _on_grid(patient: PatientInput, grid: Grid) -> bool:
+    def within(value: float, bounds: Tuple[int, int]) -> bool:
+        return float(value).is_integer() and bounds[0] <= value <= bounds[1]
+
+    return (
+        within(patient.age_years, grid.ages)
+        and within(patient.weight_kg, grid.weights)
+        and within(patient.creatinine_umol_l, grid.creatinine)
+        and within(patient.first_dose_hour, grid.hours)
+        and float(patient.mg_per_kg) in grid.mg_per_kg
+        and (patient.height_cm is None or within(patient.height_cm, grid.heights))
+    )
+
+
+def _outcome(result: Any) -> str:
+    if isinstance(result, ValidationError):
+        return repr((str(result), result.field))
+    return "accepted"
+
+
+def _rejection(parse: Callable[[Dict[str, Any]], PatientInput], payload: Dict[str, Any]) -> str:
+    try:
+        return _outcome(parse(payload))
+    except ValidationError as exc:
+        return _outcome(exc)
+
+
+class Checker:
+    """Evaluates cases on every selected fast path in one process."""
+
+    def __init__(self, paths: Tuple[str, ...], table_path: Optional[Path]) -> None:
+        self.paths = paths
+        self.table = DoseTable.open(table_path) if "lookup" in paths and table_path else None
+        # Small enough that a long run also exercises eviction.
+        self.cache = PlanCache(64)
+
+    def check(self, patients: List[PatientInput], now: datetime) -> List[Tuple[int, str, Diffs]]:
+        """Return ``(index, path, differences)`` for every disagreement."""
+        failures: List[Tuple[int, str, Diffs]] = []
+        reference = [calculate_plan(patient, now=now) for patient in patients]
+        expected = [_plan_values(plan) for plan in reference]
+
+        if "batch" in self.paths or "json" in self.paths:
+            array = calculate_plans_for(patients, now=now)
+            if "batch" in self.paths:
+                for index, plan in enumerate(plans_from_array(array)):
+                    diffs = _diff(expected[index], _plan_values(plan))
+                    if diffs:
+                        failures.append((index, "batch", diffs))
+            if "json" in self.paths:
+                for index, members in enumerate(plan_array_members(array)):
+                    wanted = plan_members(reference[index])
+                    if members != wanted:
+                        failures.append((index, "json", {"members": (wanted, members)}))
+
+        if "cache" in self.paths:
+            for index, patient in enumerate(patients):
+                # The cache is shared across tasks, so the first call may
+                # already be a hit; the second one always is.
+                for _ in range(2):
+                    hits = self.cache.hits
+                    plan = calculate_plan(patient, now=now, cache=self.cache)
+                    attempt = "hit" if self.cache.hits > hits else "miss"
+                    diffs = _diff(expected[index], _plan_values(plan))
+                    if diffs:
+                        failures.append((index, "cache", {f"{attempt}:{k}": v for k, v in diffs.items()}))
+                        break
+
+        if self.table is not None:
+            for index, patient in enumerate(patients):
+                found = self.table.lookup(patient)
+                if not _on_grid(patient, self.table.grid):
+                    if found is not None:
+                        failures.append((index, "lookup", {"off_grid": ("None", repr(found))}))
+                    continue
+                wanted = _table_entry(reference[index])
+                if found != wanted:
+                    failures.append((index, "lookup", {"entry": (repr(wanted), repr(found))}))
+        return failures
+
+    def check_rejected(self, payloads: List[Dict[str, Any]]) -> List[Tuple[int, str, Diffs]]:
+        """Payloads ``parse_patient`` rejects must fail the same way in batches."""
+        failures: List[Tuple[int, str, Diffs]] = []
+        expected = [_rejection(parse_patient, payload) for payload in payloads]
+        batches = []
+        if "batch" in self.paths:
+            batches.append(("batch", payloads))
+        if "json" in self.paths:
+            batches.append(("json", json.loads(json.dumps(payloads))))
+        for path, batch in batches:
+            for index, result in enumerate(parse_patients(batch)):
+                actual = _outcome(result)
+                if actual != expected[index]:
+                    failures.append((index, path, {"rejection": (expected[index], actual)}))
+        return failures
+
+    def fails(self, payload: Dict[str, Any], path: str, now: datetime) -> Optional[Diffs]:
+        try:
+            patient = parse_patient(payload)
+        except ValidationError:
+            checked = self.check_rejected([payload])
+        else:
+            checked = self.check([patient], now)
+        for _, failed_path, diffs in checked:
+            if failed_path == path:
+                return diffs
+        return None
+
+
+# --------------------------------------------------------------------------
+# Minimization
+# --------------------------------------------------------------------------
+
+
+def _simpler(key: str, value: Any) -> List[Any]:
+    if value is None:
+        return []
+    candidates: List[Any] = []
+    if key == "height":
+        candidates.append(None)
+    low, _ = BOUNDS[key]
+    candidates.append(float(low))
+    for digits in (0, 1, 2, 3, 6):
+        rounded = float(round(value, digits))
+        candidates.append(rounded)
+    candidates.extend((float(math.floor(value)), float(math.ceil(value))))
+    # Candidates in order of simplicity; keep only ones that change the value.
+    seen = []
+    for candidate in candidates:
+        if candidate != value and candidate not in seen:
+            seen.append(candidate)
+    return seen
+
+
+def minimize(
+    checker: Checker, payload: Dict[str, Any], path: str, now: datetime
+) -> Tuple[Dict[str, Any], Diffs]:
+    """Greedily replace fields by simpler values while ``path`` still fails."""
+    current = dict(payload)
+    diffs = checker.fails(current, path, now)
+    if diffs is None:
+        return current, {}  # only fails together with the rest of its batch
+    changed = True
+    while changed:
+        changed = False
+        if current["sex"] != "female":
+            candidate = dict(current, sex="female")
+            found = checker.fails(candidate, path, now)
+            if found is not None:
+                current, diffs, changed = candidate, found, True
+        for key in NUMERIC_FIELDS + ("first_dose_hour",):
+            for simpler in _simpler(key, current[key]):
+                candidate = dict(current, **{key: simpler})
+                found = checker.fails(candidate, path, now)
+                if found is not None:
+                    current, diffs, changed = candidate, found, True
+                    break
+    return current, diffs
+
+
+# --------------------------------------------------------------------------
+# Driver
+# --------------------------------------------------------------------------
+
+_checker: Optional[Checker] = None
+
+
+def _init_worker(paths: Tuple[str, ...], table_path: Optional[Path]) -> None:
+    global _checker
+    _checker = Checker(paths, table_path)
+
+
+def run_task(seed: int, task: int, size: int) -> Dict[str, Any]:
+    """Generate and check one seeded task; failures come back minimized."""
+    assert _checker is not None
+    rng = random.Random(f"{seed}/{task}")
+    now = _task_now(rng)
+    payloads: List[Dict[str, Any]] = []
+    patients: List[PatientInput] = []
+    rejected: List[Dict[str, Any]] = []
+    for _ in range(size):
+        payload = generate_payload(rng)
+        try:
+            patients.append(parse_patient(payload))
+        except ValidationError:
+            rejected.append(payload)
+            continue
+        payloads.append(payload)
+
+    on_grid = 0
+    if _checker.table is not None:
+        on_grid = sum(1 for patient in patients if _on_grid(patient, _checker.table.grid))
+
+    counterexamples = []
+    for index, path, diffs in _checker.check(patients, now):
+        minimized, minimized_diffs = minimize(_checker, payloads[index], path, now)
+        counterexamples.append(
+            {
+                "task": task,
+                "path": path,
+                "now": now.isoformat(),
+                "payload": payloads[index],
+                "minimized": minimized,
+                "differences": minimized_diffs or diffs,
+            }
+        )
+    for index, path, diffs in _checker.check_rejected(rejected):
+        counterexamples.append(
+            {
+                "task": task,
+                "path": path,
+                "now": now.isoformat(),
+                "payload": rejected[index],
+                "minimized": rejected[index],
+                "differences": diffs,
+            }
+        )
+    return {
+        "cases": len(patients),
+        "rejected": len(rejected),
+        "on_grid": on_grid,
+        "counterexamples": counterexamples,
+    }
+
+
+def _replay_command(example: Dict[str, Any]) -> str:
+    payload = json.dumps(example["minimized"], separators=(",", ":"))
+    return (
+        f"python scripts/fuzz_fast_paths.py --paths {example['path']} "
+        f"--now {example['now']} --replay '{payload}'"
+    )
+
+
+def _replay(args: argparse.Namespace, paths: Tuple[str, ...], table_path: Optional[Path]) -> None:
+    checker = Checker(paths, table_path)
+    payload = json.loads(args.replay)
+    now = datetime.fromisoformat(args.now) if args.now else datetime.now()
+    failed = False
+    for path in paths:
+        diffs = checker.fails(payload, path, now)
+        if diffs:
+            failed = True
+            print(f"{path}: disagrees")
+            for field, (expected, actual) in diffs.items():
+                print(f"  {field}: reference={expected} fast={actual}")
+        else:
+            print(f"{path}: agrees")
+    raise SystemExit(1 if failed else 0)
+
+
+@contextmanager
+def _dose_table(args: argparse.Namespace, paths: Tuple[str, ...]) -> Iterator[Optional[Path]]:
+    """The table for the lookup path; a missing one is built and removed afterwards."""
+    if "lookup" not in paths:
+        yield None
+    elif args.table.exists():
+        yield args.table
+    else:
+        with tempfile.TemporaryDirectory(prefix="gentacalc-fuzz-") as directory:
+            print(f"{args.table} not found; building a table in {directory}", file=sys.stderr)
+            yield build_table(Path(directory) / "dose_table.bin")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fuzz the fast paths against calculate_plan.")
+    parser.add_argument("--cases", type=int, default=100_000, help="Cases over all shards.")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--batch-size", type=int, default=1000, help="Cases per seeded task.")
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=(0, 1),
+        metavar="i/N",
+        help="Only run every N-th task, starting at task i (1-based).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: all cores).",
+    )
+    parser.add_argument(
+        "--paths",
+        default=",".join(PATHS),
+        help=f"Comma-separated fast paths to check (default: {','.join(PATHS)}).",
+    )
+    parser.add_argument(
+        "--table",
+        type=Path,
+        default=DEFAULT_PATH,
+        help="Dose table for the lookup path; built in a temporary directory if missing.",
+    )
+    parser.add_argument(
+        "--max-counterexamples",
+        type=int,
+        default=20,
+        help="Stop once this many disagreements were found.",
+    )
+    parser.add_argument("--output", type=Path, help="Write a JSON report here.")
+    parser.add_argument("--replay", help="Check a single JSON payload instead of fuzzing.")
+    parser.add_argument("--now", help="Reference time for --replay (ISO format).")
+    args = parser.parse_args()
+
+    paths = tuple(path.strip() for path in args.paths.split(",") if path.strip())
+    unknown = set(paths) - set(PATHS)
+    if unknown:
+        parser.error(f"unknown paths: {', '.join(sorted(unknown))}")
+
+    # Workers map the table, so it is only removed once the pool has exited.
+    with _dose_table(args, paths) as table_path:
+        if args.replay:
+            _replay(args, paths, table_path)
+        _fuzz(args, paths, table_path)
+
+
+def _fuzz(args: argparse.Namespace, paths: Tuple[str, ...], table_path: Optional[Path]) -> None:
+    shard, shards = args.shard
+    tasks = range(shard, -(-args.cases // args.batch_size), shards)
+    totals = {"cases": 0, "rejected": 0, "on_grid": 0}
+    counterexamples: List[Dict[str, Any]] = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=max(args.workers, 1),
+        initializer=_init_worker,
+        initargs=(paths, table_path),
+    ) as pool:
+        results = pool.map(run_task, [args.seed] * len(tasks), tasks, [args.batch_size] * len(tasks))
+        for done, result in enumerate(results, start=1):
+            for key in totals:
+                totals[key] += result[key]
+            counterexamples.extend(result["counterexamples"])
+            elapsed = time.perf_counter() - started
+            print(
+                f"\rTask {done}/{len(tasks)}: {totals['cases']} cases, "
+                f"{totals['cases'] / elapsed:,.0f}/s, {len(counterexamples)} disagreements",
+                end="",
+                file=sys.stderr,
+                flush=True,
+            )
+            if len(counterexamples) >= args.max_counterexamples:
+                pool.shutdown(cancel_futures=True)
+                break
+    print(file=sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    print(
+        f"Checked {totals['cases']} cases ({totals['on_grid'] if 'lookup' in paths else '-'} on the "
+        f"table grid, {totals['rejected']} rejected by parse_patient) on {', '.join(paths)} "
+        f"in {elapsed:.1f}s ({totals['cases'] / elapsed:,.0f} cases/s)"
+    )
+    for example in counterexamples:
+        print(f"\n{example['path']} disagrees (task {example['task']}, now {example['now']}):")
+        print(f"  input:     {json.dumps(example['payload'])}")
+        print(f"  minimized: {json.dumps(example['minimized'])}")
+        for field, (expected, actual) in example["differences"].items():
+            print(f"  {field}: reference={expected} fast={actual}")
+        print(f"  replay: {_replay_command(example)}")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        report = {
+            "seed": args.seed,
+            "shard": f"{shard + 1}/{shards}",
+            "paths": list(paths),
+            **totals,
+            "seconds": elapsed,
+            "counterexamples": counterexamples,
+        }
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"\nWrote {args.output}")
+    if counterexamples:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Normalize dosing instructions from the workbook and the Python engine.
+
+Both sides render the same few templates ("Gis umiddelbart - 16.10.Thursday
+kl.8:00", "Gis 17.10 08:00", ...), so most strings are matched by one
+anchored pattern that extracts every field at once. Anything else goes
+through the general step-by-step parser, which gives the same result for the
+template strings (``benchmarks/bench_instructions.py`` checks this on a
+recorded corpus). Results are memoized per raw string in a bounded cache; a
+comparison run repeats the same handful of dates and times.
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+CACHE_SIZE = 8192
+
+_WEEKDAYS = r"(?:Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday)"
+
+WEEKDAY_PATTERN = re.compile(rf"\b{_WEEKDAYS}\b", re.IGNORECASE)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+DOT_BEFORE_KL_PATTERN = re.compile(r"\.\s*(?=kl)", re.IGNORECASE)
+TIME_PATTERN = re.compile(r"kl\.?\s*(\d{1,2})[:\.]?\s*(\d{2})?", re.IGNORECASE)
+DATE_PATTERN = re.compile(r"(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?")
+ACTION_PATTERN = re.compile(
+    r"^(gis umiddelbart|gis 36 timer etter dose 1|gis|bestill|tredje dose gentamicin skal ikke gis)",
+    re.IGNORECASE,
+)
+TRAILING_TIME_PATTERN = re.compile(r"^\.*\s*kl\.?\s*\d{1,2}(?::\d{2})?\.*$", re.IGNORECASE)
+
+# Action, date (optionally with year and weekday) and time, either as
+# "kl.H:MM" (workbook) or a bare "HH:MM" (Python engine).
+TEMPLATE_PATTERN = re.compile(
+    r"(?P<action>gis umiddelbart|gis 36 timer etter dose 1|gis)"
+    r"(?:\s+-)?\s+"
+    r"(?P<day>\d{1,2})\.(?P<month>\d{1,2})(?:\.\d{2,4})?"
+    rf"(?:\.\s*{_WEEKDAYS})?"
+    r"\s+(?:kl\.?\s*(?P<hour>\d{1,2}):(?P<minute>\d{2})|(?P<clock>\d{1,2}:\d{2}))",
+    re.IGNORECASE,
+)
+
+Fields = Tuple[Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+def _parse_general(raw: str) -> Fields:
+    normalized = WHITESPACE_PATTERN.sub(" ", raw)
+    normalized = WEEKDAY_PATTERN.sub("", normalized)
+    normalized = WHITESPACE_PATTERN.sub(" ", normalized).strip()
+    normalized = DOT_BEFORE_KL_PATTERN.sub(" ", normalized)
+
+    action = None
+    match = ACTION_PATTERN.match(normalized)
+    if match:
+        action = match.group(1).lower()
+        normalized = normalized[len(match.group(0)) :].strip(" -")
+
+    date = None
+    match = DATE_PATTERN.search(normalized)
+    if match:
+        date = f"{match.group(1).zfill(2)}.{match.group(2).zfill(2)}"
+        normalized = normalized.replace(match.group(0), "").strip(" -")
+
+    time = None
+    match = TIME_PATTERN.search(normalized)
+    if match:
+        time = f"{match.group(1).zfill(2)}:{(match.group(2) or '00').zfill(2)}"
+        normalized = normalized.replace(match.group(0), "").strip()
+
+    reminder = normalized.strip(" .-") if normalized else None
+    if reminder and TRAILING_TIME_PATTERN.match(reminder):
+        reminder = None
+    return action, date, time, reminder
+
+
+def _parse_template(raw: str) -> Optional[Fields]:
+    match = TEMPLATE_PATTERN.fullmatch(raw)
+    if match is None:
+        return None
+    date = f"{match['day'].zfill(2)}.{match['month'].zfill(2)}"
+    if match["clock"] is not None:
+        return match["action"].lower(), date, None, match["clock"]
+    return match["action"].lower(), date, f"{match['hour'].zfill(2)}:{match['minute']}", None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(raw: str) -> Fields:
+    fields = _parse_template(raw)
+    return fields if fields is not None else _parse_general(raw)
+
+
+def parse_instruction(text: Any) -> Optional[Dict[str, Optional[str]]]:
+    """Split an instruction into action, date (dd.mm), time (HH:MM) and remaining text."""
+    if text is None:
+        return None
+    raw = str(text).strip()
+    if not raw:
+        return None
+    action, date, time, reminder = _parse(raw)
+    return {
+        "raw": raw,
+        "action": action,
+        "date": date,
+        "time": time,
+        "text": reminder,
+    }
+
+
+def cache_info():
+    return _parse.cache_info()
+
+
+def cache_clear() -> None:
+    _parse.cache_clear()
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 from pathlib import Path
-from scripts.analyze_instruction_mismatches import parse_instruction
+from scripts.instructions import parse_instruction
 import json
 
 def main():
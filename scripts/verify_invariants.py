@@ -0,0 +1,493 @@
+#!/usr/bin/env python3
+"""
+Exhaustively check engine invariants on every integer-valued input.
+
+The grid is every input ``parse_patient`` accepts with whole-number values:
+both sexes, each age, weight, height (or none), creatinine, mg/kg and first
+dose hour within the ``PATIENT_FIELDS`` bounds, about 3.9 x 10^11 patients.
+They are not evaluated one by one. The vectorised engine (``gentacalc.batch``,
+which ``fuzz_fast_paths.py`` checks against ``calculate_plan``) computes
+
+  the GFR band   from sex, age, weight, height and creatinine,
+  the alerts     from those plus mg/kg (through the raw first dose),
+  the doses      from the band, sex, weight, height, mg/kg and hour,
+  the schedule   from the band and hour,
+
+so each stage is run over the full product of its own arguments, with doses
+checked for every band. That covers every grid input at a few billion array
+evaluations. Invariants checked:
+
+  renal     the band is 1-3 and never rises with creatinine; the creatinine
+            used is max(creatinine, 60)
+  alerts    creatinine_floor iff creatinine < 60; bmi_over_35 iff BMI > 35
+            and band >= 2; bmi_30_35 iff 30 <= BMI < 35; dose_over_600 iff
+            mg/kg x dosing weight > 600 (BMI and dosing weight from the scalar
+            ``compute_weight_metrics``)
+  doses     none in band 1; first = second and no third in band 2; three
+            doses with third = first in band 3; every dose a positive multiple
+            of 40 up to 600; second <= first; first = 600 above 600 mg raw
+  schedule  monitoring iff band >= 2; no dose times in band 1; no third dose
+            time iff band 2
+
+The same invariants (except the creatinine ordering) are also checked on
+``--samples`` random grid inputs per unit through the scalar
+``calculate_plan``, whose alerts come from ``collect_alerts``; those
+violations are reported with a ``(scalar)`` suffix.
+
+Work is split into units (the schedule, one per sex and mg/kg for doses, one
+per sex and age for renal and alerts). ``--shard i/N`` takes every N-th unit
+and ``--workers`` evaluates them in a process pool. Each finished unit is
+appended to ``--output`` as a JSON line and checkpointed (see
+``comparison_results.ResultWriter``); rerun with ``--resume`` after an
+interruption to skip the units already written.
+
+Usage:
+    python scripts/verify_invariants.py
+    python scripts/verify_invariants.py --shard 2/4 --output runs/invariants-2.jsonl
+    python scripts/verify_invariants.py --output runs/invariants-2.jsonl --shard 2/4 --resume
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gentacalc.alerts import ALERT_FLAGS, alert_keys
+from gentacalc.anthropometrics import compute_weight_metrics
+from gentacalc.batch import alert_columns, dose_columns, renal_columns, weight_columns
+from gentacalc.dosing import schedule_offsets
+from gentacalc.engine import _monitoring_offset, calculate_plan
+from gentacalc.models import PatientInput
+from gentacalc.parser import PATIENT_FIELDS
+from scripts.compare_excel_with_python import parse_shard
+from scripts.comparison_results import ResultWriter, iter_records
+
+DEFAULT_OUTPUT = Path("scripts/invariant_results.jsonl")
+
+BOUNDS = {spec.key: (int(spec.minimum), int(spec.maximum)) for spec in PATIENT_FIELDS}
+SEXES = ("female", "male")
+BANDS = (1, 2, 3)
+EXAMPLES = 5
+# Scalar samples are rendered for a fixed day; the invariants do not depend on it.
+NOW = datetime(2025, 1, 1, 9, 0)
+_BIT = {key: 1 << bit for bit, key in enumerate(ALERT_FLAGS)}
+ALERT_INVARIANTS = {
+    "creatinine_floor": "creatinine_floor iff creatinine < 60",
+    "bmi_over_35": "bmi_over_35 iff BMI > 35 and band >= 2",
+    "bmi_30_35": "bmi_30_35 iff 30 <= BMI < 35",
+    "dose_over_600": "dose_over_600 iff mg/kg x dosing weight > 600",
+}
+
+
+def _values(key: str) -> np.ndarray:
+    low, high = BOUNDS[key]
+    return np.arange(low, high + 1, dtype=np.float64)
+
+
+AGES = _values("age")
+WEIGHTS = _values("weight")
+# ``NaN`` stands for a missing height.
+HEIGHTS = np.concatenate(([np.nan], _values("height")))
+CREATININE = _values("creatinine")
+MG_PER_KG = _values("mg_per_kg")
+HOURS = _values("first_dose_hour").astype(np.int64)
+
+Unit = Tuple[Any, ...]
+
+
+def units() -> List[Unit]:
+    """All units of work, in a fixed order; a unit's position is its id."""
+    return [
+        ("schedule",),
+        *(("doses", sex, mg) for sex in SEXES for mg in MG_PER_KG.tolist()),
+        *(("renal", sex, age) for sex in SEXES for age in AGES.tolist()),
+    ]
+
+
+def unit_inputs(unit: Unit) -> int:
+    """Grid inputs whose checks are completed by ``unit`` (the renal units partition the grid)."""
+    if unit[0] != "renal":
+        return 0
+    return len(WEIGHTS) * len(HEIGHTS) * len(CREATININE) * len(MG_PER_KG) * len(HOURS)
+
+
+# --------------------------------------------------------------------------
+# Checks
+# --------------------------------------------------------------------------
+
+
+class Violations:
+    """Violation counts and the first few failing inputs per invariant."""
+
+    def __init__(self) -> None:
+        self.found: Dict[str, Dict[str, Any]] = {}
+
+    def check(self, name: str, holds: np.ndarray, describe) -> None:
+        failing = np.flatnonzero(~holds)
+        if not len(failing):
+            return
+        entry = self.found.setdefault(name, {"count": 0, "examples": []})
+        entry["count"] += int(len(failing))
+        for flat in failing[: EXAMPLES - len(entry["examples"])].tolist():
+            entry["examples"].append(describe(np.unravel_index(flat, holds.shape)))
+
+
+def _height(value: float) -> Optional[int]:
+    return None if np.isnan(value) else int(value)
+
+
+def _reference_weights(sex: str) -> Tuple[np.ndarray, np.ndarray]:
+    """BMI (``NaN`` without height) and dosing weight per (weight, height) from the scalar code."""
+    bmi = np.empty((len(WEIGHTS), len(HEIGHTS)))
+    dosing_weight = np.empty_like(bmi)
+    for i, weight in enumerate(WEIGHTS.tolist()):
+        for j, height in enumerate(HEIGHTS.tolist()):
+            metrics = compute_weight_metrics(
+                PatientInput(sex, 16.0, weight, _height(height), 60.0, 3.0, 12)
+            )
+            bmi[i, j] = np.nan if metrics.bmi is None else metrics.bmi
+            dosing_weight[i, j] = metrics.dosing_weight
+    return bmi, dosing_weight
+
+
+def _check_schedule(violations: Violations) -> int:
+    bands = np.array(BANDS)[:, None]
+    times = np.array(
+        [[[offset is not None for offset in schedule_offsets(band, hour)] for hour in HOURS.tolist()] for band in BANDS]
+    )
+    monitoring = np.array(
+        [[_monitoring_offset(band, hour) is not None for hour in HOURS.tolist()] for band in BANDS]
+    )
+
+    def describe(index: Tuple[int, ...]) -> Dict[str, Any]:
+        return {"gfr_band": BANDS[index[0]], "first_dose_hour": int(HOURS[index[1]])}
+
+    violations.check("monitoring iff band >= 2", monitoring == (bands >= 2), describe)
+    violations.check("no dose times in band 1", (bands != 1) | ~times.any(axis=2), describe)
+    violations.check(
+        "no third dose time iff band 2",
+        (bands == 1) | (times[..., :2].all(axis=2) & (times[..., 2] == (bands != 2))),
+        describe,
+    )
+    return len(BANDS) * len(HOURS)
+
+
+def _check_doses(violations: Violations, sex: str, mg_per_kg: float) -> int:
+    is_male = np.array(sex == "male")
+    weights = weight_columns(is_male, WEIGHTS[:, None], HEIGHTS[None, :])
+    first_raw = (mg_per_kg * weights["dosing_weight"])[None, :, :, None]
+    band = np.array(BANDS, dtype=np.int64)[:, None, None, None]
+    first, second, third = dose_columns(band, first_raw, HOURS[None, None, None, :])
+    shape = (len(BANDS), len(WEIGHTS), len(HEIGHTS), len(HOURS))
+    first, second, third = (np.broadcast_to(dose, shape) for dose in (first, second, third))
+
+    def describe(index: Tuple[int, ...]) -> Dict[str, Any]:
+        b, w, h, hour = index
+        return {
+            "gfr_band": BANDS[b],
+            "sex": sex,
+            "weight": float(WEIGHTS[w]),
+            "height": _height(HEIGHTS[h]),
+            "mg_per_kg": mg_per_kg,
+            "first_dose_hour": int(HOURS[hour]),
+        }
+
+    given = [~np.isnan(dose) for dose in (first, second, third)]
+    violations.check("band 1 gives no doses", (band != 1) | ~(given[0] | given[1] | given[2]), describe)
+    violations.check(
+        "band 2 gives first = second and no third",
+        (band != 2) | (given[0] & (second == first) & ~given[2]),
+        describe,
+    )
+    violations.check(
+        "band 3 gives three doses with third = first",
+        (band != 3) | (given[0] & given[1] & (third == first)),
+        describe,
+    )
+    for dose, present in zip((first, second, third), given):
+        with np.errstate(invalid="ignore"):
+            valid = (dose > 0) & (dose <= 600) & (np.fmod(dose, 40) == 0)
+        violations.check("doses are positive multiples of 40 up to 600", ~present | valid, describe)
+    with np.errstate(invalid="ignore"):
+        violations.check("second dose never exceeds the first", ~given[1] | (second <= first), describe)
+        violations.check(
+            "first dose is 600 above 600 mg raw", ~given[0] | (first_raw <= 600) | (first == 600), describe
+        )
+    return int(np.prod(shape))
+
+
+def _check_renal(violations: Violations, sex: str, age: float, block: int) -> int:
+    is_male = np.array(sex == "male")
+    weight = WEIGHTS[:, None, None]
+    height = HEIGHTS[None, :, None]
+    weights = weight_columns(is_male, weight, height)
+    bmi, dosing_weight = _reference_weights(sex)
+    bmi = bmi[:, :, None]
+    has_bmi = ~np.isnan(bmi)
+    over_35 = np.where(has_bmi, bmi > 35, False)
+    bmi_30_35 = np.where(has_bmi, (bmi >= 30) & (bmi < 35), False)
+    first_raws = [(mg * dosing_weight)[:, :, None] for mg in MG_PER_KG.tolist()]
+    fast_raws = [mg * weights["dosing_weight"] for mg in MG_PER_KG.tolist()]
+
+    previous: Optional[np.ndarray] = None
+    evaluated = 0
+    for start in range(0, len(CREATININE), block):
+        creatinine = CREATININE[None, None, start : start + block]
+        renal = renal_columns(is_male, np.array(age), weight, height, creatinine, weights)
+        band = renal["gfr_band"]
+        evaluated += band.size
+
+        def describe(index: Tuple[int, ...], mg_per_kg: Optional[float] = None) -> Dict[str, Any]:
+            w, h, c = index[:3]
+            example = {
+                "sex": sex,
+                "age": age,
+                "weight": float(WEIGHTS[w]),
+                "height": _height(HEIGHTS[h]),
+                "creatinine": float(CREATININE[start + c]),
+            }
+            if mg_per_kg is not None:
+                example["mg_per_kg"] = mg_per_kg
+            return example
+
+        violations.check("band is 1, 2 or 3", (band >= 1) & (band <= 3), describe)
+        steps = np.diff(band, axis=2, prepend=band[:, :, :1] if previous is None else previous)
+        violations.check("band never rises with creatinine", steps <= 0, describe)
+        previous = band[:, :, -1:]
+        violations.check(
+            "creatinine used is max(creatinine, 60)",
+            renal["creatinine_used"] == np.maximum(creatinine, 60),
+            describe,
+        )
+
+        # Expected alert bits; only rows that disagree are broken down per flag.
+        expected_bmi = np.where(over_35 & (band >= 2), _BIT["bmi_over_35"], 0) | np.where(
+            bmi_30_35, _BIT["bmi_30_35"], 0
+        )
+        expected_base = expected_bmi | np.where(creatinine < 60, _BIT["creatinine_floor"], 0)
+        for mg, first_raw, fast_raw in zip(MG_PER_KG.tolist(), first_raws, fast_raws):
+            mask = alert_columns(np.broadcast_to(creatinine, band.shape), weights, renal, fast_raw)
+            expected = expected_base | np.where(first_raw > 600, _BIT["dose_over_600"], 0)
+            if np.array_equal(mask, expected):
+                continue
+
+            def describe_mg(index: Tuple[int, ...], mg: float = mg) -> Dict[str, Any]:
+                return describe(index, mg)
+
+            for key, name in ALERT_INVARIANTS.items():
+                violations.check(name, (mask & _BIT[key]) == (expected & _BIT[key]), describe_mg)
+    return evaluated
+
+
+def _sample_patients(unit_id: int, unit: Unit, count: int) -> List[PatientInput]:
+    """Random grid inputs with the unit's own sex and mg/kg or age, seeded by its id."""
+    rng = np.random.default_rng(unit_id)
+    sex = unit[1] if len(unit) > 1 else None
+    patients = []
+    for _ in range(count):
+        patients.append(
+            PatientInput(
+                sex=sex or SEXES[rng.integers(len(SEXES))],
+                age_years=unit[2] if unit[0] == "renal" else float(rng.choice(AGES)),
+                weight_kg=float(rng.choice(WEIGHTS)),
+                height_cm=_height(rng.choice(HEIGHTS)),
+                creatinine_umol_l=float(rng.choice(CREATININE)),
+                mg_per_kg=unit[2] if unit[0] == "doses" else float(rng.choice(MG_PER_KG)),
+                first_dose_hour=int(rng.choice(HOURS)),
+            )
+        )
+    return patients
+
+
+def _check_scalar_sample(violations: Violations, patients: List[PatientInput]) -> int:
+    """Check the invariants on ``calculate_plan`` for each of ``patients``."""
+    holds: Dict[str, List[bool]] = {}
+    for patient in patients:
+        plan = calculate_plan(patient, now=NOW)
+        weight = compute_weight_metrics(patient)
+        band = plan.context.gfr_band
+        bmi = weight.bmi
+        keys = set(alert_keys(plan.alerts))
+        doses = (plan.first_dose_mg, plan.second_dose_mg, plan.third_dose_mg)
+        first, second, third = doses
+        times = [dose.time is not None for dose in plan.schedule]
+        first_raw = patient.mg_per_kg * weight.dosing_weight
+        expected_alerts = {
+            "creatinine_floor": patient.creatinine_umol_l < 60,
+            "bmi_over_35": bmi is not None and bmi > 35 and band is not None and band >= 2,
+            "bmi_30_35": bmi is not None and 30 <= bmi < 35,
+            "dose_over_600": first_raw > 600,
+        }
+        checks = {
+            "band is 1, 2 or 3": band in BANDS,
+            "creatinine used is max(creatinine, 60)": plan.context.creatinine_used
+            == max(patient.creatinine_umol_l, 60),
+            **{
+                ALERT_INVARIANTS[key]: (key in keys) == expected
+                for key, expected in expected_alerts.items()
+            },
+            "band 1 gives no doses": band != 1 or doses == (None, None, None),
+            "band 2 gives first = second and no third": band != 2
+            or (first is not None and second == first and third is None),
+            "band 3 gives three doses with third = first": band != 3
+            or (first is not None and second is not None and third == first),
+            "doses are positive multiples of 40 up to 600": all(
+                dose is None or (0 < dose <= 600 and dose % 40 == 0) for dose in doses
+            ),
+            "second dose never exceeds the first": second is None or second <= first,
+            "first dose is 600 above 600 mg raw": first is None or first_raw <= 600 or first == 600,
+            "monitoring iff band >= 2": (plan.monitoring_time is not None)
+            == (band is not None and band >= 2),
+            "no dose times in band 1": band != 1 or not any(times),
+            "no third dose time iff band 2": band == 1
+            or (times[0] and times[1] and times[2] == (band != 2)),
+        }
+        for name, value in checks.items():
+            holds.setdefault(name, []).append(value)
+
+    def describe(index: Tuple[int, ...]) -> Dict[str, Any]:
+        patient = patients[index[0]]
+        return {
+            "sex": patient.sex,
+            "age": patient.age_years,
+            "weight": patient.weight_kg,
+            "height": patient.height_cm,
+            "creatinine": patient.creatinine_umol_l,
+            "mg_per_kg": patient.mg_per_kg,
+            "first_dose_hour": patient.first_dose_hour,
+        }
+
+    for name, values in holds.items():
+        violations.check(f"{name} (scalar)", np.array(values), describe)
+    return len(patients)
+
+
+def run_unit(unit_id: int, unit: Unit, block: int, samples: int = 0) -> Dict[str, Any]:
+    """Check one unit; ``inputs`` counts the grid inputs whose checks it completes."""
+    started = time.perf_counter()
+    violations = Violations()
+    kind = unit[0]
+    if kind == "schedule":
+        evaluated = _check_schedule(violations)
+    elif kind == "doses":
+        evaluated = _check_doses(violations, unit[1], unit[2])
+    else:
+        evaluated = _check_renal(violations, unit[1], unit[2], block)
+    sampled = _check_scalar_sample(violations, _sample_patients(unit_id, unit, samples))
+    return {
+        "id": unit_id,
+        "unit": list(unit),
+        "evaluated": evaluated,
+        "sampled": sampled,
+        "inputs": unit_inputs(unit),
+        "seconds": round(time.perf_counter() - started, 3),
+        "differences": violations.found,
+    }
+
+
+def _summarize(path: Path) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {"units": 0, "evaluated": 0, "inputs": 0, "violations": {}}
+    for record in iter_records(path):
+        summary["units"] += 1
+        summary["evaluated"] += record["evaluated"]
+        summary["inputs"] += record["inputs"]
+        for name, entry in record["differences"].items():
+            total = summary["violations"].setdefault(name, {"count": 0, "examples": []})
+            total["count"] += entry["count"]
+            total["examples"].extend(entry["examples"][: EXAMPLES - len(total["examples"])])
+    return summary
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Check engine invariants on every integer-valued input.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT, help="JSONL file of finished units.")
+    parser.add_argument("--resume", action="store_true", help="Skip units already in --output.")
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=(0, 1),
+        metavar="i/N",
+        help="Only run every N-th unit, starting at unit i (1-based).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: all cores).",
+    )
+    parser.add_argument(
+        "--block",
+        type=int,
+        default=128,
+        help="Creatinine values evaluated per array; bounds memory per worker.",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=200,
+        help="Grid inputs per unit also checked through the scalar calculate_plan.",
+    )
+    args = parser.parse_args()
+
+    shard, shards = args.shard
+    todo = [(unit_id, unit) for unit_id, unit in enumerate(units()) if unit_id % shards == shard]
+    with ResultWriter(args.output, resume=args.resume, checkpoint_every=1) as writer:
+        pending = [(unit_id, unit) for unit_id, unit in todo if unit_id not in writer.done_ids]
+        if len(pending) < len(todo):
+            print(f"Resuming: {len(todo) - len(pending)} of {len(todo)} units already done", file=sys.stderr)
+
+        evaluated = inputs = 0
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as pool:
+            results = pool.map(
+                run_unit,
+                [unit_id for unit_id, _ in pending],
+                [unit for _, unit in pending],
+                [args.block] * len(pending),
+                [args.samples] * len(pending),
+            )
+            for done, result in enumerate(results, start=1):
+                writer.write(result)
+                evaluated += result["evaluated"]
+                inputs += result["inputs"]
+                elapsed = time.perf_counter() - started
+                print(
+                    f"\rUnit {done}/{len(pending)}: {evaluated / elapsed / 1e6:,.1f}M evaluations/s, "
+                    f"{inputs / elapsed / 1e6:,.0f}M inputs/s, {writer.mismatches} units with violations",
+                    end="",
+                    file=sys.stderr,
+                    flush=True,
+                )
+        print(file=sys.stderr)
+        elapsed = time.perf_counter() - started
+
+    summary = _summarize(args.output)
+    shard_inputs = sum(unit_inputs(unit) for _, unit in todo)
+    print(
+        f"Shard {shard + 1}/{shards}: {summary['units']} of {len(todo)} units done, covering "
+        f"{summary['inputs']:,} of {shard_inputs:,} grid inputs. This run: {evaluated:,} evaluations "
+        f"in {elapsed:.1f}s ({evaluated / max(elapsed, 1e-9) / 1e6:,.1f}M/s, "
+        f"{inputs / max(elapsed, 1e-9) / 1e9:,.1f}G inputs/s)"
+    )
+    for name, entry in summary["violations"].items():
+        print(f"\nViolated: {name} ({entry['count']:,} cases)")
+        for example in entry["examples"]:
+            print(f"  {example}")
+    print(f"Wrote {args.output}")
+    if summary["violations"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
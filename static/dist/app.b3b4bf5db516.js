@@ -0,0 +1,609 @@
+const form = document.querySelector("#dose-form");
+const resetButton = document.querySelector("#reset-button");
+
+const selectors = {
+  doseValues: [
+    document.querySelector("#dose1-value"),
+    document.querySelector("#dose2-value"),
+    document.querySelector("#dose3-value"),
+  ],
+  doseInstructions: [
+    document.querySelector("#dose1-instruction"),
+    document.querySelector("#dose2-instruction"),
+    document.querySelector("#dose3-instruction"),
+  ],
+  monitoringBlock: document.querySelector("#monitoring-block"),
+  monitoringText: document.querySelector("#monitoring-text"),
+  alerts: document.querySelector("#alerts"),
+  alertsBody: document.querySelector("#alerts-body"),
+  gfrValue: document.querySelector("#gfr-value"),
+  bmi: document.querySelector("#bmi-value"),
+  cg: document.querySelector("#cg-value"),
+  panel: document.querySelector(".panel"),
+};
+
+const validationModal = document.querySelector("#validation-modal");
+const validationMessage = document.querySelector("#validation-message");
+const validationClose = document.querySelector("#validation-close");
+let lastInvalidInput = null;
+let modalVisible = false;
+
+const copyCard = document.querySelector("#copy-plan-card");
+const copyButton = document.querySelector("#copy-plan-button");
+const copyStatus = document.querySelector("#copy-plan-status");
+const copyIcon = copyButton ? copyButton.querySelector(".icon") : null;
+const isCopyAvailable = () =>
+  copyCard &&
+  !copyCard.classList.contains("hidden") &&
+  copyButton &&
+  !copyButton.disabled;
+const copyDefaultHint = "←Klikk/Trykk enter";
+const defaultCopyIcon = `
+  <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="1.9" stroke-linecap="round" stroke-linejoin="round">
+    <rect x="9" y="9" width="12" height="12" rx="2" ry="2"/>
+    <path d="M5 15H4a2 2 0 0 1-2-2V4a2 2 0 0 1 2-2h9a2 2 0 0 1 2 2v1"/>
+  </svg>
+`;
+const successCopyIcon = `
+  <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+    <path d="M20 6L9 17l-5-5" />
+  </svg>
+`;
+const errorCopyIcon = `
+  <svg width="20" height="20" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round">
+    <circle cx="12" cy="12" r="9" />
+    <line x1="12" y1="8" x2="12" y2="13" />
+    <circle cx="12" cy="16" r="1" fill="currentColor" stroke="none" />
+  </svg>
+`;
+if (copyIcon) {
+  copyIcon.innerHTML = defaultCopyIcon;
+}
+let lastPlanPayload = null;
+let copyStatusTimer = null;
+let formDirtySincePlan = true;
+let copyShortcutReady = false;
+
+const syncPanelHeight = () => {
+  if (!selectors.panel) return;
+  selectors.panel.style.removeProperty("min-height");
+  const formHeight = form ? form.getBoundingClientRect().height : 0;
+  if (formHeight) {
+    const style = window.getComputedStyle(selectors.panel);
+    const verticalPadding = parseFloat(style.paddingTop || "0") + parseFloat(style.paddingBottom || "0");
+    const verticalBorder = parseFloat(style.borderTopWidth || "0") + parseFloat(style.borderBottomWidth || "0");
+    const adjustment = -0.7;
+    const target = Math.max(0, formHeight - verticalPadding - verticalBorder + adjustment);
+    selectors.panel.style.minHeight = `${target}px`;
+  }
+};
+
+const showCopyHint = () => {
+  if (!copyStatus) {
+    return;
+  }
+  if (isCopyAvailable()) {
+    copyStatus.textContent = copyDefaultHint;
+  } else {
+    copyStatus.textContent = "";
+  }
+  copyStatus.removeAttribute("data-variant");
+};
+
+const setCopyStatus = (message = "", variant) => {
+  if (!copyStatus) return;
+  if (copyStatusTimer) {
+    clearTimeout(copyStatusTimer);
+    copyStatusTimer = null;
+  }
+  if (copyButton) {
+    copyButton.classList.remove("copy-trigger--success", "copy-trigger--error");
+  }
+  if (copyIcon) {
+    copyIcon.innerHTML = defaultCopyIcon;
+  }
+  if (!message) {
+    showCopyHint();
+    return;
+  }
+
+  copyStatus.textContent = message;
+  if (variant) {
+    copyStatus.dataset.variant = variant;
+  }
+  if (copyIcon) {
+    if (variant === "success") {
+      copyIcon.innerHTML = successCopyIcon;
+    } else if (variant === "error") {
+      copyIcon.innerHTML = errorCopyIcon;
+    }
+  }
+  if (copyButton) {
+    if (variant === "success") {
+      copyButton.classList.add("copy-trigger--success");
+    } else if (variant === "error") {
+      copyButton.classList.add("copy-trigger--error");
+    }
+  }
+
+  copyStatusTimer = setTimeout(() => {
+    if (copyButton) {
+      copyButton.classList.remove("copy-trigger--success", "copy-trigger--error");
+    }
+    if (copyIcon) {
+      copyIcon.innerHTML = defaultCopyIcon;
+    }
+    showCopyHint();
+    copyStatusTimer = null;
+  }, 4000);
+};
+
+const buildCopyText = (payload) => {
+  if (!payload || !payload.plan) {
+    return "";
+  }
+  const { plan } = payload;
+  const hasDose = [plan.first_dose_mg, plan.second_dose_mg, plan.third_dose_mg].some(
+    (value) => value != null
+  );
+  if (!hasDose) {
+    return "";
+  }
+  const instructions = plan.instructions || [];
+  const doses = [
+    { label: "Dose 1", value: plan.first_dose_mg, instruction: instructions[0] },
+    { label: "Dose 2", value: plan.second_dose_mg, instruction: instructions[1] },
+    { label: "Dose 3", value: plan.third_dose_mg, instruction: instructions[2] },
+  ];
+
+  const lines = doses
+    .map(({ label, value, instruction }) => {
+      const amountText = value == null ? "—" : `${value} mg`;
+      const trimmedInstruction = (instruction || "").replace(/\s+/g, " ").trim();
+      if (!trimmedInstruction) {
+        if (value == null) {
+          return null;
+        }
+        return `${label}: ${amountText}`;
+      }
+      return `${label}: ${amountText} – ${trimmedInstruction}`;
+    })
+    .filter(Boolean);
+
+  return lines.join("\n");
+};
+
+const updateCopyUI = (payload) => {
+  const text = buildCopyText(payload);
+  if (copyButton) {
+    const disabled = !text;
+    copyButton.disabled = disabled;
+    if (disabled) {
+      copyButton.setAttribute("aria-disabled", "true");
+      if (copyIcon) {
+        copyIcon.innerHTML = defaultCopyIcon;
+      }
+      copyButton.classList.remove("copy-trigger--success", "copy-trigger--error");
+    } else {
+      copyButton.removeAttribute("aria-disabled");
+    }
+  }
+  if (copyCard) {
+    if (text) {
+      copyCard.classList.remove("hidden");
+    } else {
+      copyCard.classList.add("hidden");
+    }
+  }
+  if (!text) {
+    setCopyStatus("");
+  } else {
+    showCopyHint();
+  }
+  syncPanelHeight();
+  return text;
+};
+
+const fallbackCopy = (text) => {
+  const textarea = document.createElement("textarea");
+  textarea.value = text;
+  textarea.setAttribute("readonly", "");
+  textarea.style.position = "fixed";
+  textarea.style.opacity = "0";
+  document.body.appendChild(textarea);
+  textarea.select();
+  textarea.setSelectionRange(0, textarea.value.length);
+  let success = false;
+  try {
+    success = document.execCommand("copy");
+  } catch (error) {
+    success = false;
+  }
+  document.body.removeChild(textarea);
+  return success;
+};
+
+const attemptCopy = async (text) => {
+  if (navigator.clipboard && navigator.clipboard.writeText) {
+    await navigator.clipboard.writeText(text);
+    return true;
+  }
+  return fallbackCopy(text);
+};
+
+updateCopyUI(null);
+
+const fieldRefs = {
+  age: document.querySelector("#age"),
+  sex: document.querySelector("#sex"),
+  weight: document.querySelector("#weight"),
+  height: document.querySelector("#height"),
+  mg_per_kg: document.querySelector("#mg_per_kg"),
+  creatinine: document.querySelector("#creatinine"),
+  first_dose_hour: document.querySelector("#first_dose_hour"),
+};
+
+const requiredFieldLabels = {
+  age: "Alder",
+  sex: "Kjønn",
+  weight: "Vekt (kg)",
+  mg_per_kg: "Dose (mg/kg)",
+  creatinine: "Kreatinin (µmol/L)",
+  first_dose_hour: "Klokkeslett for første dose",
+};
+
+const fieldRules = {
+  age: {
+    min: 16,
+    max: 110,
+    low: "Kalkulatoren er ikke beregnet til bruk på barn under 16 år.",
+    high: "Alder er over anbefalt område for kalkulatoren.",
+  },
+  weight: {
+    min: 35,
+    max: 250,
+    low: "Kalkulatoren er ikke beregnet på pasienter med grov undervekt eller overvekt.",
+    high: "Kalkulatoren er ikke beregnet på pasienter med grov undervekt eller overvekt.",
+  },
+  height: {
+    min: 130,
+    max: 210,
+    low: "Er høyden korrekt? Må oppgis i centimeter.",
+    high: "Er høyden korrekt? Må oppgis i centimeter.",
+  },
+  mg_per_kg: {
+    min: 3,
+    max: 7,
+    low: "Dosering er utenfor anbefalt område!",
+    high: "Dosering er utenfor anbefalt område!",
+  },
+  creatinine: {
+    min: 30,
+    max: 1000,
+    low: "S-kreatinin er en ekstremverdi, er dette riktig?",
+    high: "S-kreatinin er en ekstremverdi, er dette riktig?",
+  },
+  first_dose_hour: {
+    min: 1,
+    max: 24,
+    low: "Klokkeslett oppgis som mellom 1 og 24.",
+    high: "Klokkeslett oppgis som mellom 1 og 24.",
+  },
+};
+
+const showValidation = (message, input) => {
+  if (!validationModal || !validationMessage || !validationClose) {
+    return;
+  }
+  validationMessage.textContent = message;
+  validationModal.classList.add("visible");
+  validationClose.focus();
+  modalVisible = true;
+  lastInvalidInput = input;
+};
+
+const hideValidation = () => {
+  if (!validationModal) {
+    return;
+  }
+  validationModal.classList.remove("visible");
+  modalVisible = false;
+  if (lastInvalidInput) {
+    lastInvalidInput.focus();
+    lastInvalidInput = null;
+  }
+};
+
+if (validationClose) {
+  validationClose.addEventListener("click", hideValidation);
+}
+if (validationModal) {
+  validationModal.addEventListener("click", (event) => {
+    if (event.target === validationModal) {
+      hideValidation();
+    }
+  });
+}
+document.addEventListener("keydown", (event) => {
+  if (modalVisible && event.key === "Escape") {
+    hideValidation();
+  }
+});
+
+const validateField = (key, input, { silent = false, force = false } = {}) => {
+  const rule = fieldRules[key];
+  if (!rule || !input) return true;
+  const raw = input.value.trim();
+  if (!raw) {
+    input.setCustomValidity("");
+    input.dataset.invalid = "";
+    delete input.dataset.lastShown;
+    return true;
+  }
+  const value = Number(raw);
+  const shouldClearValue = force || !silent;
+
+  if (!Number.isFinite(value)) {
+    const msg = "Oppgi en gyldig tallverdi.";
+    if (shouldClearValue) {
+      input.value = "";
+    }
+    input.setCustomValidity(msg);
+    const shouldShow = force || (!silent && input.dataset.lastShown !== "format");
+    input.dataset.invalid = "format";
+    if (shouldShow) {
+      showValidation(msg, input);
+      input.dataset.lastShown = "format";
+    }
+    return false;
+  }
+
+  let message = "";
+  let flag = "";
+  if (value < rule.min) {
+    message = rule.low || rule.message;
+    flag = "low";
+  } else if (value > rule.max) {
+    message = rule.high || rule.message;
+    flag = "high";
+  }
+
+  if (message) {
+    if (shouldClearValue) {
+      input.value = "";
+    }
+    input.setCustomValidity(message);
+    const shouldShow = force || (!silent && input.dataset.lastShown !== flag);
+    input.dataset.invalid = flag;
+    if (shouldShow) {
+      showValidation(message, input);
+      input.dataset.lastShown = flag;
+    }
+    return false;
+  }
+
+  input.setCustomValidity("");
+  input.dataset.invalid = "";
+  delete input.dataset.lastShown;
+  return true;
+};
+
+const validateAll = () => {
+  return Object.entries(fieldRefs).every(([key, input]) => validateField(key, input, { force: true }));
+};
+
+Object.entries(fieldRefs).forEach(([key, input]) => {
+  if (!input) return;
+  input.addEventListener("input", () => {
+    formDirtySincePlan = true;
+    copyShortcutReady = false;
+    if (!input.dataset.invalid) {
+      return;
+    }
+    input.dataset.invalid = "";
+    delete input.dataset.lastShown;
+    input.setCustomValidity("");
+  });
+  input.addEventListener("change", () => {
+    formDirtySincePlan = true;
+    copyShortcutReady = false;
+  });
+  input.addEventListener("blur", () => {
+    validateField(key, input);
+  });
+});
+
+if (copyButton) {
+  copyButton.addEventListener("click", async () => {
+    const text = buildCopyText(lastPlanPayload);
+    if (!text) {
+      setCopyStatus("Ingen doseringsplan å kopiere.", "error");
+      return;
+    }
+    try {
+      const success = await attemptCopy(text);
+      if (!success) {
+        setCopyStatus("Kunne ikke kopiere plan.", "error");
+        return;
+      }
+      setCopyStatus("Plan kopiert.", "success");
+    } catch (error) {
+      const fallbackSuccess = fallbackCopy(text);
+      if (fallbackSuccess) {
+        setCopyStatus("Plan kopiert.", "success");
+      } else {
+        setCopyStatus("Kunne ikke kopiere plan.", "error");
+      }
+    }
+  });
+}
+
+const formatNumber = (value, digits = 1) =>
+  Number.isFinite(value) ? value.toFixed(digits) : "—";
+
+const renderAlerts = (alerts) => {
+  if (!alerts.length) {
+    selectors.alerts.classList.remove("visible");
+    selectors.alertsBody.innerHTML = "";
+    return;
+  }
+  selectors.alerts.classList.add("visible");
+  selectors.alertsBody.innerHTML = alerts
+    .map((alert) => `<li>${alert.replace(/\n/g, "<br />")}</li>`)
+    .join("");
+};
+
+const renderPlan = (payload) => {
+  lastPlanPayload = payload;
+  updateCopyUI(payload);
+  setCopyStatus("");
+  formDirtySincePlan = false;
+  copyShortcutReady = true;
+  const { plan, context } = payload;
+  const doseValues = [
+    plan.first_dose_mg,
+    plan.second_dose_mg,
+    plan.third_dose_mg,
+  ];
+
+  doseValues.forEach((value, index) => {
+    selectors.doseValues[index].textContent = value == null ? "— mg" : `${value} mg`;
+    selectors.doseInstructions[index].textContent = plan.instructions[index] || "—";
+  });
+
+  selectors.gfrValue.textContent = formatNumber(context.chosen_gfr, 0);
+  selectors.bmi.textContent = formatNumber(context.bmi, 2);
+
+  const cg = context.cockcroft_gault;
+  const cgFemale = context.cockcroft_gault_female;
+  if (cg != null) {
+    selectors.cg.textContent = `${formatNumber(cg, 0)} ml/min`;
+  } else if (cgFemale != null) {
+    selectors.cg.textContent = `${formatNumber(cgFemale, 0)} ml/min`;
+  } else {
+    selectors.cg.textContent = "—";
+  }
+
+  renderAlerts(plan.alerts || []);
+
+  if (plan.monitoring) {
+    selectors.monitoringBlock.classList.add("visible");
+    const detailText = plan.monitoring.split(":").slice(1).join(":").trim();
+    if (detailText) {
+      selectors.monitoringText.innerHTML = `
+        <span class="monitoring-note">(Eller vurder videre bruk)</span>
+        <span class="monitoring-date">${detailText}</span>
+      `;
+    } else {
+      selectors.monitoringText.innerHTML = `<span class="monitoring-note">(Eller vurder videre bruk)</span>`;
+    }
+  } else {
+    selectors.monitoringBlock.classList.remove("visible");
+    selectors.monitoringText.textContent = "—";
+  }
+  syncPanelHeight();
+
+};
+
+const resetUI = () => {
+  form.reset();
+  lastPlanPayload = null;
+  updateCopyUI(null);
+  setCopyStatus("");
+  formDirtySincePlan = true;
+  copyShortcutReady = false;
+  selectors.doseValues.forEach((node) => {
+    node.textContent = "— mg";
+  });
+  selectors.doseInstructions.forEach((node) => {
+    node.textContent = "—";
+  });
+  selectors.gfrValue.textContent = "— ml/min";
+  selectors.bmi.textContent = "—";
+  selectors.cg.textContent = "—";
+  selectors.monitoringBlock.classList.remove("visible");
+  selectors.monitoringText.textContent = "—";
+  renderAlerts([]);
+  Object.values(fieldRefs).forEach((input) => {
+    if (!input) return;
+    input.dataset.invalid = "";
+    input.setCustomValidity("");
+    delete input.dataset.lastShown;
+  });
+  hideValidation();
+  syncPanelHeight();
+};
+
+form.addEventListener("keydown", (event) => {
+  if (
+    event.key !== "Enter" ||
+    event.shiftKey ||
+    event.ctrlKey ||
+    event.altKey ||
+    event.metaKey ||
+    event.repeat
+  ) {
+    return;
+  }
+  if (!formDirtySincePlan && copyShortcutReady && isCopyAvailable()) {
+    event.preventDefault();
+    copyButton.click();
+  }
+});
+
+form.addEventListener("submit", async (event) => {
+  event.preventDefault();
+  hideValidation();
+
+  if (!validateAll()) {
+    return;
+  }
+
+  const formData = new FormData(form);
+  const payload = Object.fromEntries(formData.entries());
+
+  const missingFields = Object.entries(requiredFieldLabels).filter(([key]) => {
+    const raw = payload[key];
+    return raw == null || String(raw).trim() === "";
+  });
+
+  if (missingFields.length) {
+    const [firstKey, label] = missingFields[0];
+    const message =
+      missingFields.length > 1
+        ? "Flere felt mangler verdier. Fyll ut alle nødvendige felt før du beregner."
+        : `${label} må fylles ut.`;
+    showValidation(message, fieldRefs[firstKey]);
+    return;
+  }
+
+  try {
+    const response = await fetch("/api/dose", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(payload),
+    });
+    const data = await response.json();
+
+    if (!response.ok) {
+      throw new Error(data.error || "Kunne ikke beregne dose.");
+    }
+
+    hideValidation();
+    renderPlan(data);
+  } catch (error) {
+    const message =
+      error instanceof Error && error.message
+        ? error.message
+        : "Kunne ikke beregne dose.";
+    showValidation(message, null);
+    copyShortcutReady = false;
+  }
+});
+
+resetButton.addEventListener("click", resetUI);
+
+const handleResize = () => requestAnimationFrame(syncPanelHeight);
+window.addEventListener("load", handleResize, { once: true });
+window.addEventListener("resize", handleResize);
+requestAnimationFrame(syncPanelHeight);
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 from app import app
@@ -26,6 +28,10 @@ def test_api_dose_happy_path(client):
     assert data["plan"]["first_dose_mg"] == 280
     assert data["plan"]["instructions"][2] == " Tredje dose Gentamicin skal ikke gis"
     assert data["plan"]["monitoring"].startswith("Vurder videre bruk")
+    assert [dose["label"] for dose in data["plan"]["schedule"]] == ["first", "second", "third"]
+    assert data["plan"]["schedule"][0]["time"].endswith("T23:00:00")
+    assert data["plan"]["schedule"][2]["time"] is None
+    assert data["plan"]["monitoring_time"].endswith("T08:00:00")
     assert data["plan"]["alerts"] == []
     assert data["context"]["gfr_band"] == 2
     assert data["context"]["chosen_gfr"] == 45
@@ -37,3 +43,181 @@ def test_api_returns_validation_error(client):
     assert response.status_code == 400
     data = response.get_json()
     assert "Kjønn må være 'kvinne' eller 'mann'" in data["error"]
+
+
+def test_api_dose_reports_server_timing_when_enabled(client, monkeypatch):
+    payload = {
+        "sex": "female",
+        "age": "72",
+        "weight": "49",
+        "height": "169",
+        "mg_per_kg": "6",
+        "creatinine": "77",
+        "first_dose_hour": "23",
+    }
+    assert "Server-Timing" not in client.post("/api/dose", json=payload).headers
+
+    monkeypatch.setitem(app.config, "SERVER_TIMING", True)
+    response = client.post("/api/dose", json=payload)
+    assert response.status_code == 200
+    metrics = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert metrics[:3] == ["parse", "compute", "serialize"]
+    assert "renal" in metrics
+    assert all(";dur=" in entry for entry in response.headers["Server-Timing"].split(", "))
+
+    rejected = client.post("/api/dose", json={"sex": "unknown"})
+    assert rejected.status_code == 400
+    assert rejected.headers["Server-Timing"].startswith("parse;dur=")
+
+
+def test_metrics_count_plans_and_validation_errors(client):
+    def value(text, sample):
+        for line in text.splitlines():
+            if line.startswith(sample + " "):
+                return float(line.split()[-1])
+        return 0.0
+
+    before = client.get("/metrics").get_data(as_text=True)
+    client.post("/api/dose", json={"sex": "female", "age": "15"})
+    client.post(
+        "/api/dose",
+        json={
+            "sex": "male",
+            "age": "50",
+            "weight": "120",
+            "height": "175",
+            "mg_per_kg": "6",
+            "creatinine": "50",
+            "first_dose_hour": "12",
+        },
+    )
+    client.post("/api/dose/batch", json=[{"sex": "female"}, "oops"])
+    response = client.get("/metrics")
+    assert response.mimetype == "text/plain"
+    after = response.get_data(as_text=True)
+
+    def delta(sample):
+        return value(after, sample) - value(before, sample)
+
+    assert delta('gentacalc_validation_errors_total{field="age"}') == 2
+    assert delta('gentacalc_validation_errors_total{field="payload"}') == 1
+    assert delta('gentacalc_plans_total{gfr_band="3"}') == 1
+    assert delta('gentacalc_plan_alerts_total{alert="creatinine_floor"}') == 1
+    assert delta('gentacalc_plan_alerts_total{alert="bmi_over_35"}') == 1
+    assert delta('gentacalc_http_requests_total{endpoint="/api/dose",status="400"}') == 1
+    assert delta('gentacalc_http_request_duration_seconds_count{endpoint="/api/dose"}') == 2
+
+
+def test_api_dose_batch_matches_single_endpoint_and_keeps_order(client):
+    valid = {
+        "sex": "female",
+        "age": "72",
+        "weight": "49",
+        "height": "169",
+        "mg_per_kg": "6",
+        "creatinine": "77",
+        "first_dose_hour": "23",
+    }
+    obese = {
+        "sex": "male",
+        "age": 45,
+        "weight": 140,
+        "height": 175,
+        "mg_per_kg": 7,
+        "creatinine": 50,
+        "first_dose_hour": 6,
+    }
+    payloads = [valid, {"sex": "unknown"}, obese, "not-a-patient"]
+    response = client.post("/api/dose/batch", json=payloads)
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert len(results) == 4
+
+    assert "Kjønn må være 'kvinne' eller 'mann'" in results[1]["error"]
+    assert "error" in results[3]
+    for index in (0, 2):
+        single = client.post("/api/dose", json=payloads[index]).get_json()
+        single["plan"]["instructions"] = results[index]["plan"]["instructions"]
+        single["plan"]["monitoring"] = results[index]["plan"]["monitoring"]
+        assert results[index] == single
+
+
+def test_api_dose_batch_and_stream_isolate_non_finite_rows(client):
+    patient = {
+        "sex": "female",
+        "age": 72,
+        "weight": 49,
+        "height": 169,
+        "mg_per_kg": 6,
+        "creatinine": 77,
+        "first_dose_hour": 23,
+    }
+    # json.loads accepts NaN/Infinity; a huge int overflows float().
+    bad_rows = [
+        json.dumps(dict(patient, weight=float("nan"))),
+        json.dumps(dict(patient, creatinine=float("inf"))),
+        json.dumps(dict(patient, age=10**400)),
+    ]
+    rows = [json.dumps(patient), *bad_rows, json.dumps(patient)]
+    response = client.post(
+        "/api/dose/batch", data="[" + ",".join(rows) + "]", content_type="application/json"
+    )
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [result.get("error") for result in results[1:4]] == [
+        "Vekt må være et tall",
+        "Kreatinin må være et tall",
+        "Alder må være et tall",
+    ]
+    assert results[0]["plan"]["first_dose_mg"] == 280
+    assert results[4] == results[0]
+
+    response = client.post(
+        "/api/dose/stream", data="\n".join(rows), content_type="application/x-ndjson"
+    )
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line.pop("row") for line in lines] == [1, 2, 3, 4, 5]
+    assert lines == results
+
+
+def test_api_dose_batch_requires_list(client):
+    response = client.post("/api/dose/batch", json={"sex": "female"})
+    assert response.status_code == 400
+
+
+def test_api_dose_stream_returns_one_line_per_input_line(client):
+    patient = {
+        "sex": "female",
+        "age": 72,
+        "weight": 49,
+        "height": 169,
+        "mg_per_kg": 6,
+        "creatinine": 77,
+        "first_dose_hour": 23,
+    }
+    body = "\n".join(
+        [json.dumps(patient), "", "{not json", json.dumps({"sex": "unknown"}), json.dumps(patient)]
+    )
+    app.config["STREAM_CHUNK_ROWS"] = 2
+    try:
+        response = client.post(
+            "/api/dose/stream", data=body, content_type="application/x-ndjson"
+        )
+    finally:
+        app.config["STREAM_CHUNK_ROWS"] = 256
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line["row"] for line in lines] == [1, 2, 3, 4]
+    assert lines[0]["plan"]["first_dose_mg"] == 280
+    assert lines[1]["error"] == "Ugyldig JSON"
+    assert "Kjønn" in lines[2]["error"]
+    assert lines[3] == dict(lines[0], row=4)
+
+
+def test_api_dose_stream_rejects_oversized_lines(client):
+    body = b'{"sex": "' + b"x" * (20 * 1024) + b'"}\n{"sex": "unknown"}\n'
+    response = client.post("/api/dose/stream", data=body)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[0]["error"] == "Linjen er for lang"
+    assert "Kjønn" in lines[1]["error"]
@@ -0,0 +1,174 @@
+import asyncio
+import json
+
+import pytest
+
+from app import app
+from asgi import application
+
+
+def _call(method, path, body=b"", content_type="application/json", chunk_size=None):
+    chunk_size = chunk_size or max(len(body), 1)
+    chunks = [body[start : start + chunk_size] for start in range(0, len(body), chunk_size)] or [b""]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "headers": [(b"content-type", content_type.encode())],
+    }
+    asyncio.run(application(scope, receive, send))
+    status = sent[0]["status"]
+    data = b"".join(message.get("body", b"") for message in sent[1:])
+    return status, data
+
+
+@pytest.fixture
+def client():
+    app.config.update({"TESTING": True})
+    with app.test_client() as client:
+        yield client
+
+
+PAYLOAD = {
+    "sex": "female",
+    "age": "72",
+    "weight": "49",
+    "height": "169",
+    "mg_per_kg": "6",
+    "creatinine": "77",
+    "first_dose_hour": "23",
+}
+
+
+def test_asgi_dose_matches_flask(client):
+    for payload in (PAYLOAD, {"sex": "unknown"}, dict(PAYLOAD, age="15")):
+        expected = client.post("/api/dose", json=payload)
+        status, data = _call("POST", "/api/dose", json.dumps(payload).encode())
+        assert status == expected.status_code
+        assert data == expected.data
+
+
+def test_asgi_dose_accepts_form_fields(client):
+    body = "&".join(f"{key}={value}" for key, value in PAYLOAD.items()).encode()
+    status, data = _call("POST", "/api/dose", body, "application/x-www-form-urlencoded")
+    assert status == 200
+    assert data == client.post("/api/dose", data=PAYLOAD).data
+
+
+def test_asgi_dose_parses_payloads_like_flask(client):
+    form = "&".join(f"{key}={value}" for key, value in PAYLOAD.items()).encode()
+    boundary = "xYzZy"
+    multipart = "".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'
+        for key, value in PAYLOAD.items()
+    ).encode() + f"--{boundary}--\r\n".encode()
+    cases = [
+        (b"sex=%ff\xff&age=72", "application/x-www-form-urlencoded"),
+        (multipart, f"multipart/form-data; boundary={boundary}"),
+        (json.dumps(PAYLOAD).encode(), "application/x-ndjson"),
+        (json.dumps(PAYLOAD).encode(), "application/vnd.api+json"),
+        (form, "text/plain"),
+    ]
+    for body, content_type in cases:
+        expected = client.post("/api/dose", data=body, content_type=content_type)
+        status, data = _call("POST", "/api/dose", body, content_type)
+        assert (status, data) == (expected.status_code, expected.data), content_type
+
+
+def test_asgi_batch_matches_flask(client):
+    payloads = [PAYLOAD, {"sex": "male"}, "oops"]
+    status, data = _call("POST", "/api/dose/batch", json.dumps(payloads).encode())
+    assert status == 200
+    assert data == client.post("/api/dose/batch", json=payloads).data
+    assert _call("POST", "/api/dose/batch", b'{"sex": "female"}')[0] == 400
+
+    body = json.dumps([PAYLOAD, dict(PAYLOAD, age=float("nan")), dict(PAYLOAD, age=10**400)])
+    status, data = _call("POST", "/api/dose/batch", body.encode())
+    assert status == 200
+    assert data == client.post("/api/dose/batch", data=body, content_type="application/json").data
+
+
+def test_asgi_stream_matches_flask_across_body_chunks(client):
+    app.config["STREAM_MAX_LINE_BYTES"] = 200
+    try:
+        lines = [json.dumps(PAYLOAD), "", "not json", "x" * 500, json.dumps(dict(PAYLOAD, age="15"))]
+        body = ("\n".join(lines * 3) + "\n" + json.dumps(PAYLOAD)).encode()
+        expected = client.post("/api/dose/stream", data=body).data
+        for chunk_size in (1, 7, 64, len(body)):
+            status, data = _call("POST", "/api/dose/stream", body, "application/x-ndjson", chunk_size)
+            assert status == 200
+            assert data == expected
+    finally:
+        app.config["STREAM_MAX_LINE_BYTES"] = 16 * 1024
+
+
+def test_asgi_falls_back_to_flask_for_other_paths():
+    status, data = _call("GET", "/metrics", content_type="text/plain")
+    assert status == 200
+    assert b"gentacalc_http_requests_total" in data
+    assert _call("GET", "/api/dose")[0] == 405
+
+
+def test_asgi_applies_the_flask_body_limit(client, monkeypatch):
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 2000)
+    small = json.dumps([PAYLOAD] * 5).encode()
+    large = json.dumps([PAYLOAD] * 50).encode()
+    for body in (small, large):
+        expected = client.post("/api/dose/batch", data=body, content_type="application/json")
+        for chunk_size in (7, len(body)):
+            status, data = _call("POST", "/api/dose/batch", body, chunk_size=chunk_size)
+            assert (status, data) == (expected.status_code, expected.data)
+    assert _call("POST", "/api/dose/batch", large)[0] == 413
+    assert _call("POST", "/", large, "text/plain") == (413, b'{"error":"Request Entity Too Large"}\n')
+
+    # The stream is exempt; only its lines are bounded.
+    lines = b"\n".join([json.dumps(PAYLOAD).encode()] * 50)
+    status, data = _call("POST", "/api/dose/stream", lines, "application/x-ndjson", 64)
+    assert status == 200
+    assert data == client.post("/api/dose/stream", data=lines).data
+    assert len(data.splitlines()) == 50
+
+
+def test_asgi_counts_requests_whose_handler_raises(client, monkeypatch):
+    def count():
+        sample = 'gentacalc_http_requests_total{endpoint="/api/dose/batch",status="500"} '
+        for line in client.get("/metrics").get_data(as_text=True).splitlines():
+            if line.startswith(sample):
+                return float(line.split()[-1])
+        return 0.0
+
+    def fail(payloads):
+        raise RuntimeError("engine failure")
+
+    before = count()
+    monkeypatch.setattr("asgi._batch_body", fail)
+    with pytest.raises(RuntimeError):
+        _call("POST", "/api/dose/batch", json.dumps([PAYLOAD]).encode())
+    assert count() == before + 1
+
+
+def test_asgi_fallback_ignores_clients_that_disconnect():
+    sent = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/", "query_string": b"", "headers": []}
+    asyncio.run(application(scope, receive, send))
+    assert sent == []
@@ -0,0 +1,61 @@
+import gzip
+
+import pytest
+
+from app import ASSET_MANIFEST, app
+from assets import SOURCE_DIR, SOURCES, fingerprinted_name
+
+
+@pytest.fixture
+def client():
+    app.config.update({"TESTING": True})
+    with app.test_client() as client:
+        yield client
+
+
+def test_built_assets_match_sources():
+    # Fails when static/src changed without re-running ``python assets.py``.
+    for name in SOURCES:
+        assert ASSET_MANIFEST[name] == fingerprinted_name(name, (SOURCE_DIR / name).read_bytes())
+
+
+def test_shell_links_fingerprinted_assets_and_revalidates(client):
+    response = client.get("/")
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert "<style>" not in html and "<script>" not in html
+    assert f'href="/assets/{ASSET_MANIFEST["app.css"]}"' in html
+    assert f'src="/assets/{ASSET_MANIFEST["app.js"]}"' in html
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    etag = response.headers["ETag"]
+    repeat = client.get("/", headers={"If-None-Match": etag})
+    assert repeat.status_code == 304
+    assert repeat.data == b""
+
+
+def test_shell_is_gzipped_when_accepted(client):
+    plain = client.get("/")
+    compressed = client.get("/", headers={"Accept-Encoding": "gzip, deflate"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] != plain.headers["ETag"]
+
+
+def test_assets_are_immutable_and_precompressed(client):
+    name = ASSET_MANIFEST["app.js"]
+    source = (SOURCE_DIR / "app.js").read_bytes()
+
+    plain = client.get(f"/assets/{name}")
+    assert plain.status_code == 200
+    assert plain.data == source
+    assert plain.mimetype in ("text/javascript", "application/javascript")
+    assert "immutable" in plain.headers["Cache-Control"]
+    assert "Content-Encoding" not in plain.headers
+
+    compressed = client.get(f"/assets/{name}", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(compressed.data) == source
+
+    assert client.get("/assets/app.js").status_code == 404
@@ -0,0 +1,111 @@
+import math
+import random
+from dataclasses import fields
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from gentacalc.batch import calculate_plans, calculate_plans_for, plans_from_array
+from gentacalc.engine import calculate_plan
+from gentacalc.models import PatientInput
+
+
+NOW = datetime(2025, 8, 24, 9, 0)
+
+
+def _random_patients(count: int, seed: int = 7) -> list[PatientInput]:
+    rng = random.Random(seed)
+    patients = []
+    for _ in range(count):
+        patients.append(
+            PatientInput(
+                sex=rng.choice(["female", "male"]),
+                age_years=rng.choice([rng.randint(16, 110), round(rng.uniform(16, 110), 1)]),
+                weight_kg=rng.choice([rng.randint(35, 250), round(rng.uniform(35, 250), 2)]),
+                height_cm=rng.choice([None, rng.randint(130, 210), round(rng.uniform(130, 210), 1)]),
+                creatinine_umol_l=rng.choice([rng.randint(30, 1000), rng.randint(30, 120)]),
+                mg_per_kg=rng.choice([3, 4, 5, 6, 7, round(rng.uniform(3, 7), 2)]),
+                first_dose_hour=rng.randint(1, 23),
+            )
+        )
+    return patients
+
+
+def _assert_same_value(batch_value, scalar_value):
+    if isinstance(scalar_value, float) and isinstance(batch_value, float):
+        assert batch_value.hex() == scalar_value.hex()
+    else:
+        assert batch_value == scalar_value
+
+
+def test_batch_matches_scalar_engine_bit_for_bit():
+    patients = _random_patients(4000)
+    plans = plans_from_array(calculate_plans_for(patients, now=NOW))
+
+    for patient, batch_plan in zip(patients, plans):
+        scalar_plan = calculate_plan(patient, now=NOW)
+        for field in fields(scalar_plan):
+            if not field.compare or field.name == "context":
+                continue
+            _assert_same_value(getattr(batch_plan, field.name), getattr(scalar_plan, field.name))
+        assert batch_plan.instructions == scalar_plan.instructions
+        assert batch_plan.monitoring == scalar_plan.monitoring
+        for field in fields(scalar_plan.context):
+            _assert_same_value(
+                float(getattr(batch_plan.context, field.name) or 0),
+                float(getattr(scalar_plan.context, field.name) or 0),
+            )
+        assert batch_plan == scalar_plan
+
+
+def test_batch_covers_every_band_and_alert():
+    plans = calculate_plans_for(_random_patients(4000), now=NOW)
+    assert set(plans["gfr_band"].tolist()) == {1, 2, 3}
+    assert set(np.unique(plans["alert_mask"] & 0b1111).tolist()) >= {0, 1, 2, 4, 8}
+    assert np.all(np.isnan(plans["first_dose_mg"][plans["gfr_band"] == 1]))
+    assert np.all(np.isnan(plans["third_dose_mg"][plans["gfr_band"] == 2]))
+
+
+def test_batch_rounds_ties_up_and_caps_at_600():
+    plans = calculate_plans(
+        ["male", "male"],
+        [20, 20],
+        [80, 200],
+        [None, None],
+        [60, 60],
+        [4.75, 7],  # 4.75 * 80 = 380 -> tie between 360 and 400
+        [12, 12],
+        now=NOW,
+    )
+    assert plans["first_dose_mg"].tolist() == [400.0, 600.0]
+
+
+def test_batch_accepts_boolean_sex_and_nan_height():
+    labels = calculate_plans(["Mann"], [50], [80], [math.nan], [80], [5], [12], now=NOW)
+    flags = calculate_plans([True], [50], [80], [None], [80], [5], [12], now=NOW)
+    assert repr(labels.tolist()) == repr(flags.tolist())
+    assert np.isnan(labels["bmi"][0])
+
+
+def test_batch_rejects_patients_younger_than_16():
+    with pytest.raises(ValueError, match="under 16"):
+        calculate_plans(["female"], [15], [50], [160], [70], [5], [12], now=NOW)
+
+
+def test_batch_keeps_scalar_number_types():
+    # Clamped creatinine is the int 60, and a surrogate GFR that wins stays a
+    # float even when it is integral (34.0 here).
+    patients = [
+        PatientInput("female", 16.0, 74.0, 145.0, 239.4112100737101, 3.0, 1),
+        PatientInput("male", 40.0, 80.0, 180.0, 45.0, 5.0, 8),
+    ]
+    plans = plans_from_array(calculate_plans_for(patients, now=NOW))
+    for patient, batch_plan in zip(patients, plans):
+        scalar_plan = calculate_plan(patient, now=NOW)
+        for name in ("chosen_gfr", "creatinine_used"):
+            assert repr(getattr(batch_plan.context, name)) == repr(
+                getattr(scalar_plan.context, name)
+            )
+    assert repr(plans[0].context.chosen_gfr) == "34.0"
+    assert repr(plans[1].context.creatinine_used) == "60"
@@ -0,0 +1,130 @@
+import io
+import json
+from datetime import date, datetime
+from functools import partial
+
+import pytest
+
+from scripts.compare_excel_with_python import (
+    GRID_SIZE,
+    build_python_plan,
+    decode_scenario,
+    encode_scenario,
+    evaluate_scenarios,
+)
+from scripts.comparison_results import (
+    ResultWriter,
+    _iter_document,
+    _JsonStream,
+    checkpoint_path,
+    iter_records,
+)
+from scripts.excel_oracle import OracleStore, scenario_key
+
+
+def _record(number, differences=None):
+    return {"id": number, "input": {"age": 40 + number}, "differences": differences or {}}
+
+
+def test_result_writer_resume_truncates_to_the_checkpoint(tmp_path):
+    path = tmp_path / "results.jsonl"
+    with ResultWriter(path, checkpoint_every=2) as writer:
+        for number in range(3):
+            writer.write(_record(number, {"dose": 1} if number == 1 else None))
+    # Simulate a crash: one record after the last checkpoint, then a torn line.
+    marker = json.loads(checkpoint_path(path).read_text())
+    with path.open("a", encoding="utf-8") as handle:
+        handle.write(json.dumps(_record(3)) + "\n" + '{"id": 4, "inp')
+    checkpoint_path(path).write_text(json.dumps(marker))
+
+    resumed = ResultWriter(path, resume=True)
+    assert resumed.done_ids == {0, 1, 2}
+    assert (resumed.records, resumed.mismatches) == (3, 1)
+    resumed.write(_record(5))
+    resumed.close()
+    assert [record["id"] for record in iter_records(path)] == [0, 1, 2, 5]
+
+
+def test_result_writer_resume_drops_a_half_written_line_without_checkpoint(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text(json.dumps(_record(0)) + "\n" + '{"id": 1, "inp', encoding="utf-8")
+
+    with ResultWriter(path, resume=True) as writer:
+        assert writer.done_ids == {0}
+    assert path.read_text(encoding="utf-8") == json.dumps(_record(0)) + "\n"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7])
+def test_legacy_document_is_streamed_in_small_chunks(tmp_path, monkeypatch, chunk_size):
+    records = [_record(number, {"dose": {"excel": 1.5e3, "python": 1500}}) for number in range(5)]
+    document = {"summary": {"evaluated": 5, "note": "[not], {a} \"list\""}, "results": records, "after": 1}
+    path = tmp_path / "results.json"
+    path.write_text(json.dumps(document, indent=2), encoding="utf-8")
+
+    monkeypatch.setattr(
+        "scripts.comparison_results._JsonStream", partial(_JsonStream, chunk_size=chunk_size)
+    )
+    assert list(iter_records(path)) == records
+    with path.open(encoding="utf-8") as handle:
+        assert list(_iter_document(handle)) == records
+    assert list(_iter_document(io.StringIO(json.dumps(records)))) == records
+
+
+def test_scenario_grid_indices_round_trip():
+    for index in (0, 1, 12345, GRID_SIZE - 1):
+        assert encode_scenario(decode_scenario(index)) == index
+    scenario = decode_scenario(4242)
+    assert encode_scenario({**scenario, "creatinine": float(scenario["creatinine"])}) == 4242
+    with pytest.raises(IndexError):
+        decode_scenario(GRID_SIZE)
+    with pytest.raises(ValueError):
+        encode_scenario({**scenario, "weight": 36})
+
+
+def test_oracle_key_treats_integral_floats_as_ints():
+    scenario = decode_scenario(4242)
+    as_floats = {**scenario, "creatinine": 60.0, "weight": 75.0}
+    as_ints = {**scenario, "creatinine": 60, "weight": 75}
+    assert scenario_key(as_floats) == scenario_key(as_ints)
+    assert scenario_key({**as_ints, "creatinine": 60.5}) != scenario_key(as_ints)
+
+
+def test_evaluate_scenarios_replays_the_oracle_in_order_across_workers(tmp_path):
+    scenarios = [
+        dict(decode_scenario(0), age=age, weight=75, creatinine=creatinine, first_dose_hour=hour)
+        for age in (30, 70)
+        for creatinine in (60, 110, 450)
+        for hour in (6, 20)
+    ]
+    recorded_at = date(2024, 3, 5)
+    with OracleStore(tmp_path / "oracle.sqlite") as oracle:
+        # Every third scenario has no recorded Excel output.
+        oracle.put_many(
+            (scenario, {"first_dose_mg": 400, "gfr_band": 3}, recorded_at)
+            for index, scenario in enumerate(scenarios)
+            if index % 3
+        )
+        runs = []
+        for workers in (1, 2):
+            records = []
+            summary = evaluate_scenarios(
+                tmp_path / "missing.xlsm",
+                scenarios,
+                oracle=oracle,
+                offline=True,
+                workers=workers,
+                chunk_size=3,
+                sink=records.append,
+            )
+            runs.append((summary, records))
+
+    assert runs[0] == runs[1]
+    summary, records = runs[0]
+    recorded = [scenario for index, scenario in enumerate(scenarios) if index % 3]
+    assert (summary["evaluated"], summary["replayed"], summary["missing"]) == (8, 8, 4)
+    assert [record["id"] for record in records] == [encode_scenario(s) for s in recorded]
+    # Python plans are rendered for the day the Excel outputs were recorded.
+    for record, scenario in zip(records, recorded):
+        assert record["python"] == build_python_plan(scenario, datetime(2024, 3, 5))
+    instructions = [line for record in records for line in record["python"]["plan"]["instructions"]]
+    assert any("05.03" in line for line in instructions)
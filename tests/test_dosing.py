@@ -36,6 +36,11 @@ def test_dosing_plan_for_reference_patient(reference_now: datetime):
         == " Gis 36 timer etter dose 1  -  26.08 11:00"
     )
     assert result.instructions[2] == " Tredje dose Gentamicin skal ikke gis"
+    assert [dose.time for dose in result.schedule] == [
+        datetime(2025, 8, 24, 23, 0),
+        datetime(2025, 8, 26, 11, 0),
+        None,
+    ]
 
 
 def test_no_dosing_when_gfr_below_40(reference_now: datetime):
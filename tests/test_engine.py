@@ -1,11 +1,15 @@
+import copy
 import json
+import pickle
 from pathlib import Path
+from dataclasses import replace
 from datetime import datetime
 
 import pytest
 
-from gentacalc.engine import calculate_plan
-from gentacalc.models import PatientInput
+from gentacalc import dosing
+from gentacalc.engine import STAGES, PlanCache, calculate_core, calculate_plan, render_plan
+from gentacalc.models import DosingPlan, PatientInput
 
 
 def test_engine_matches_excel_snapshot_default_case():
@@ -75,3 +79,236 @@ def test_monitoring_recommendation_gfr_between_40_and_60():
     )
     plan = calculate_plan(patient, now=datetime(2025, 8, 24, 9, 0))
     assert "26.08 08:00" in plan.monitoring
+
+
+def test_plan_core_is_time_independent_and_renders_per_day():
+    patient = PatientInput(
+        sex="female",
+        age_years=72,
+        weight_kg=49,
+        height_cm=169,
+        creatinine_umol_l=77,
+        mg_per_kg=6,
+        first_dose_hour=23,
+    )
+    core = calculate_core(patient)
+    assert core == calculate_core(patient)
+    assert core.schedule_hours == (23, 59, None)
+    assert core.monitoring_hours == 3 * 24 + 8
+
+    for now in (datetime(2025, 8, 24, 9, 0), datetime(2025, 12, 31, 23, 59)):
+        assert render_plan(core, now) == calculate_plan(patient, now=now)
+    assert render_plan(core, datetime(2025, 12, 31, 1, 0)).instructions[1].endswith("02.01 11:00")
+
+
+def test_plan_schedule_is_typed_and_strings_are_formatted_on_access(monkeypatch):
+    patient = PatientInput(
+        sex="female",
+        age_years=72,
+        weight_kg=49,
+        height_cm=169,
+        creatinine_umol_l=77,
+        mg_per_kg=6,
+        first_dose_hour=23,
+    )
+    formatted = []
+
+    def format_datetime(dt):
+        formatted.append(dt)
+        return dt.strftime("%d.%m %H:%M")
+
+    monkeypatch.setattr(dosing, "_format_datetime", format_datetime)
+    dosing.format_instructions.cache_clear()
+    dosing.format_monitoring.cache_clear()
+    plan = calculate_plan(patient, now=datetime(2025, 8, 24, 9, 0))
+    assert formatted == []
+
+    assert [dose.label for dose in plan.schedule] == ["first", "second", "third"]
+    assert [dose.time for dose in plan.schedule] == [
+        datetime(2025, 8, 24, 23, 0),
+        datetime(2025, 8, 26, 11, 0),
+        None,
+    ]
+    assert [dose.given for dose in plan.schedule] == [True, True, False]
+    assert plan.monitoring_time == datetime(2025, 8, 27, 8, 0)
+
+    assert plan.instructions[1] == " Gis 36 timer etter dose 1  -  26.08 11:00"
+    assert plan.monitoring == "Vurder videre bruk: 27.08 08:00"
+    assert len(formatted) == 3
+
+    dosing.format_instructions.cache_clear()
+    dosing.format_monitoring.cache_clear()
+    assert plan.instructions is plan.instructions
+    assert plan.monitoring is plan.monitoring
+    assert len(formatted) == 3
+    assert plan.schedule_isoformat == ("2025-08-24T23:00:00", "2025-08-26T11:00:00", None)
+    assert plan.monitoring_isoformat == "2025-08-27T08:00:00"
+
+
+def test_plan_strings_follow_copies_and_old_constructor_calls_fail():
+    plan = calculate_plan(_cache_patient(), now=datetime(2025, 8, 24, 9, 0))
+    strings = (plan.instructions, plan.monitoring)
+    copies = [
+        copy.copy(plan),
+        copy.deepcopy(plan),
+        pickle.loads(pickle.dumps(plan)),
+        replace(plan, alerts=("bmi_over_35",)),
+    ]
+    for other in copies:
+        assert (other.instructions, other.monitoring) == strings
+        assert other.schedule_isoformat == plan.schedule_isoformat
+    assert copies[0] == plan
+
+    # The cached strings are not compared, but replacing the schedule
+    # formats them again.
+    later = calculate_plan(_cache_patient(), now=datetime(2025, 8, 25, 9, 0))
+    moved = replace(plan, schedule=later.schedule, monitoring_time=later.monitoring_time)
+    assert (moved.instructions, moved.monitoring) == (later.instructions, later.monitoring)
+    assert moved.instructions != plan.instructions
+
+    # ``schedule`` and ``monitoring_time`` are keyword-only, so calls in the
+    # old ``(..., instructions, alerts, context, monitoring)`` order fail.
+    with pytest.raises(TypeError):
+        DosingPlan(
+            plan.first_dose_mg,
+            plan.second_dose_mg,
+            plan.third_dose_mg,
+            plan.instructions,
+            plan.alerts,
+            plan.context,
+            plan.monitoring,
+        )
+    with pytest.raises(TypeError):
+        DosingPlan(
+            first_dose_mg=plan.first_dose_mg,
+            second_dose_mg=plan.second_dose_mg,
+            third_dose_mg=plan.third_dose_mg,
+            instructions=plan.instructions,
+            alerts=plan.alerts,
+            context=plan.context,
+            monitoring=plan.monitoring,
+        )
+
+
+def test_stage_timings_are_recorded_only_when_requested(monkeypatch):
+    patient = PatientInput(
+        sex="male",
+        age_years=50,
+        weight_kg=110,
+        height_cm=175,
+        creatinine_umol_l=80,
+        mg_per_kg=5,
+        first_dose_hour=12,
+    )
+    now = datetime(2025, 8, 24, 9, 0)
+    timings = {}
+    timed = calculate_plan(patient, now=now, timings=timings)
+    assert set(timings) == set(STAGES) | {"render"}
+    assert all(elapsed >= 0 for elapsed in timings.values())
+
+    cached = {}
+    calculate_plan(patient, now=now, cache=PlanCache(4), timings=cached)
+    assert set(cached) == {"cache", "render"}
+
+    def fail():
+        raise AssertionError("clock read while timing is disabled")
+
+    monkeypatch.setattr("gentacalc.engine.time.perf_counter", fail)
+    assert calculate_plan(patient, now=now) == timed
+
+
+def test_first_dose_at_hour_24_is_rendered_as_next_midnight():
+    patient = PatientInput(
+        sex="female",
+        age_years=40,
+        weight_kg=70,
+        height_cm=170,
+        creatinine_umol_l=70,
+        mg_per_kg=5,
+        first_dose_hour=24,
+    )
+    plan = calculate_plan(patient, now=datetime(2025, 8, 24, 9, 0))
+    assert plan.instructions[0] == " Gis umiddelbart  -   25.08 00:00"
+
+
+def _cache_patient(**overrides) -> PatientInput:
+    values = dict(
+        sex="male",
+        age_years=45,
+        weight_kg=80,
+        height_cm=180,
+        creatinine_umol_l=70,
+        mg_per_kg=7,
+        first_dose_hour=20,
+    )
+    values.update(overrides)
+    return PatientInput(**values)
+
+
+def test_plan_cache_counts_hits_and_renders_for_each_day():
+    cache = PlanCache(maxsize=4)
+    patient = _cache_patient()
+    monday = calculate_plan(patient, now=datetime(2025, 8, 24, 9, 0), cache=cache)
+    tuesday = calculate_plan(
+        _cache_patient(sex=" Male ", age_years=45.0), now=datetime(2025, 8, 25, 9, 0), cache=cache
+    )
+
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+    assert monday.first_dose_mg == tuesday.first_dose_mg
+    assert tuesday == calculate_plan(patient, now=datetime(2025, 8, 25, 9, 0))
+    assert "28.08 08:00" in tuesday.monitoring
+
+
+def test_plan_cache_miss_keeps_the_callers_number_types():
+    patient = _cache_patient()
+    now = datetime(2025, 8, 24, 9, 0)
+    cached = calculate_plan(patient, now=now, cache=PlanCache(maxsize=4))
+    assert repr(cached) == repr(calculate_plan(patient, now=now))
+
+
+def test_plan_cache_evicts_least_recently_used():
+    cache = PlanCache(maxsize=2)
+    first, second, third = (_cache_patient(first_dose_hour=hour) for hour in (1, 2, 3))
+    cache.get_core(first)
+    cache.get_core(second)
+    cache.get_core(first)
+    cache.get_core(third)
+
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    cache.get_core(first)
+    assert cache.stats()["hits"] == 2
+    cache.get_core(second)
+    assert cache.stats()["misses"] == 4
+
+
+def test_plan_cache_fifo_and_ttl():
+    clock = [0.0]
+    cache = PlanCache(maxsize=2, ttl=10, policy="fifo", clock=lambda: clock[0])
+    first, second, third = (_cache_patient(first_dose_hour=hour) for hour in (1, 2, 3))
+    cache.get_core(first)
+    cache.get_core(second)
+    cache.get_core(first)
+    cache.get_core(third)
+    cache.get_core(second)
+    assert cache.stats()["misses"] == 3
+
+    clock[0] = 11.0
+    cache.get_core(second)
+    assert cache.stats()["misses"] == 4
+
+
+def test_plan_cache_does_not_store_rejected_patients():
+    cache = PlanCache()
+    with pytest.raises(ValueError, match="under 16"):
+        calculate_plan(_cache_patient(age_years=15), cache=cache)
+    assert len(cache) == 0
+
+
+def test_plan_objects_are_slotted():
+    plan = calculate_plan(_cache_patient(), now=datetime(2025, 8, 24, 9, 0))
+    core = calculate_core(_cache_patient())
+    for obj in (plan, plan.context, core, _cache_patient()):
+        assert not hasattr(obj, "__dict__")
+    assert plan == calculate_plan(_cache_patient(), now=datetime(2025, 8, 24, 9, 0))
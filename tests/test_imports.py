@@ -0,0 +1,35 @@
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+
+def _loaded_after(statement: str, modules: list[str]) -> list[str]:
+    code = f"import sys; {statement}; print(','.join(m for m in {modules!r} if m in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    return [name for name in output.split(",") if name]
+
+
+def test_library_import_does_not_load_flask_or_numpy():
+    loaded = _loaded_after(
+        "import gentacalc.engine, gentacalc.parser, gentacalc.serialization",
+        ["flask", "numpy"],
+    )
+    assert "flask" not in loaded
+    assert "numpy" not in loaded
+
+
+def test_package_reexports_are_lazy():
+    assert _loaded_after("import gentacalc", ["gentacalc.models"]) == []
+    assert _loaded_after("from gentacalc import PlanCore", ["gentacalc.models"]) == [
+        "gentacalc.models"
+    ]
+
+
+def test_alert_texts_are_read_on_first_use():
+    from gentacalc import alerts
+
+    assert alerts.ALERT_TEXTS["creatinine_floor"]
@@ -0,0 +1,60 @@
+import itertools
+
+import pytest
+
+from gentacalc.lookup import DoseTable, Grid, _compute_entry, build_table
+from gentacalc.models import PatientInput
+
+
+SMALL_GRID = Grid(
+    ages=(16, 110),
+    weights=(35, 250),
+    heights=(150, 190),
+    creatinine=(30, 1000),
+    mg_per_kg=(3.0, 5.5, 7.0),
+    hours=(1, 24),
+)
+
+
+@pytest.fixture(scope="module")
+def table(tmp_path_factory) -> DoseTable:
+    path = tmp_path_factory.mktemp("lookup") / "table.bin"
+    return DoseTable.open(build_table(path, SMALL_GRID))
+
+
+def test_lookup_matches_scalar_engine_on_grid_points(table: DoseTable):
+    for sex, age, weight, height, creatinine, mg_per_kg, hour in itertools.product(
+        ("female", "male"),
+        (16, 45, 80, 110),
+        (35, 60, 95, 140, 250),
+        (None, 150, 171, 190),
+        (30, 59, 60, 77, 120, 180, 300, 1000),
+        SMALL_GRID.mg_per_kg,
+        (1, 7, 8, 12, 15, 20, 24),
+    ):
+        patient = PatientInput(sex, age, weight, height, creatinine, mg_per_kg, hour)
+        assert table.lookup(patient) == _compute_entry(patient), patient
+
+
+def test_band_limits_are_exact_at_every_creatinine(table: DoseTable):
+    for creatinine in range(30, 1001):
+        patient = PatientInput("male", 60, 140, 175, creatinine, 5.5, 20)
+        assert table.lookup(patient).gfr_band == _compute_entry(patient).gfr_band
+
+
+def test_off_grid_inputs_fall_back_to_scalar_engine(table: DoseTable):
+    off_grid = [
+        PatientInput("female", 40.5, 70, 170, 80, 5.5, 12),
+        PatientInput("female", 40, 70, 200, 80, 5.5, 12),
+        PatientInput("female", 40, 70, 170, 80, 6, 12),
+    ]
+    for patient in off_grid:
+        assert table.lookup(patient) is None
+        assert table.entry(patient) == _compute_entry(patient)
+
+
+def test_open_rejects_foreign_files(tmp_path):
+    path = tmp_path / "not-a-table.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        DoseTable.open(path)
@@ -0,0 +1,66 @@
+import multiprocessing
+
+from gentacalc.metrics import Registry, clear_directory
+
+
+def _registry(directory=None):
+    registry = Registry(directory)
+    counter = registry.counter("demo_total", "Demo counter.", ("kind",))
+    histogram = registry.histogram("demo_seconds", "Demo latency.", ("kind",), buckets=(0.1, 1.0))
+    return registry, counter, histogram
+
+
+def _work(directory, count):
+    _, counter, histogram = _registry(directory)
+    for _ in range(count):
+        counter.inc("a")
+        histogram.observe(0.5, "a")
+
+
+def test_counters_and_histograms_render_in_text_format():
+    registry, counter, histogram = _registry()
+    counter.inc("a")
+    counter.inc('b"c', amount=2)
+    histogram.observe(0.05, "a")
+    histogram.observe(0.5, "a")
+    histogram.observe(5, "a")
+
+    text = registry.exposition()
+    assert "# TYPE demo_total counter" in text
+    assert 'demo_total{kind="a"} 1.0' in text
+    assert 'demo_total{kind="b\\"c"} 2.0' in text
+    assert 'demo_seconds_bucket{kind="a",le="0.1"} 1.0' in text
+    assert 'demo_seconds_bucket{kind="a",le="1.0"} 2.0' in text
+    assert 'demo_seconds_bucket{kind="a",le="+Inf"} 3.0' in text
+    assert 'demo_seconds_count{kind="a"} 3.0' in text
+    assert 'demo_seconds_sum{kind="a"} 5.55' in text
+
+
+def test_samples_are_summed_across_processes(tmp_path):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_work, args=(str(tmp_path), 500)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+
+    registry, counter, _ = _registry(str(tmp_path))
+    counter.inc("a")
+    totals = registry.collect()
+    assert totals[("demo_total", (("kind", "a"),))] == 1501
+    assert totals[("demo_seconds_bucket", (("kind", "a"), ("le", "1.0")))] == 1500
+    assert len(list(tmp_path.iterdir())) == 4
+
+    clear_directory(str(tmp_path))
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_file_grows_past_initial_size(tmp_path):
+    registry = Registry(str(tmp_path))
+    counter = registry.counter("wide_total", "Many label values.", ("value",))
+    for value in range(3000):
+        counter.inc(value)
+    totals = registry.collect()
+    assert len(totals) == 3000
+    assert totals[("wide_total", (("value", "2999"),))] == 1
@@ -1,6 +1,6 @@
 import pytest
 
-from gentacalc.parser import ValidationError, parse_patient
+from gentacalc.parser import ValidationError, parse_patient, parse_patients
 
 
 def test_parse_patient_success():
@@ -86,3 +86,63 @@ def test_parse_patient_validation_errors(payload, error):
     with pytest.raises(ValidationError) as exc:
         parse_patient(payload)
     assert error in str(exc.value)
+
+
+def test_parse_patient_accepts_typed_json_numbers():
+    payload = {
+        "sex": "Male ",
+        "age": 60,
+        "weight": 70.5,
+        "height": None,
+        "creatinine": 90,
+        "mg_per_kg": 6,
+        "first_dose_hour": 12.0,
+    }
+    patient = parse_patient(payload)
+    assert patient.sex == "male"
+    assert patient.age_years == 60.0 and isinstance(patient.age_years, float)
+    assert patient.height_cm is None
+    assert patient.first_dose_hour == 12
+
+
+def test_validation_errors_name_the_field():
+    with pytest.raises(ValidationError) as exc:
+        parse_patient({"sex": "female", "age": "abc"})
+    assert str(exc.value) == "Alder må være et tall"
+    assert exc.value.field == "age"
+
+
+def test_parse_patients_collects_errors_per_row():
+    valid = {
+        "sex": "female",
+        "age": 60,
+        "weight": 70,
+        "creatinine": 90,
+        "mg_per_kg": 6,
+        "first_dose_hour": 12,
+    }
+    results = parse_patients([valid, dict(valid, weight=""), "row", dict(valid, age=9)])
+    assert results[0] == parse_patient(valid)
+    assert [str(result) for result in results[1:]] == [
+        "Vekt må fylles ut",
+        "Ugyldig pasientdata",
+        "Alder må være minst 16",
+    ]
+    assert [result.field for result in results[1:]] == ["weight", None, "age"]
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf"), 10**400, "nan", "1e999"])
+def test_parse_patient_rejects_non_finite_and_overflowing_numbers(value):
+    payload = {
+        "sex": "female",
+        "age": 60,
+        "weight": 70,
+        "creatinine": 90,
+        "mg_per_kg": 6,
+        "first_dose_hour": 12,
+    }
+    for key in ("age", "weight", "height", "creatinine", "mg_per_kg", "first_dose_hour"):
+        with pytest.raises(ValidationError) as exc:
+            parse_patient(dict(payload, **{key: value}))
+        assert str(exc.value).endswith("må være et tall")
+        assert exc.value.field == key
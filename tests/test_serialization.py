@@ -0,0 +1,48 @@
+import json
+import random
+from datetime import datetime
+
+from app import _serialize_plan
+from gentacalc.batch import calculate_plans_for, plans_from_array
+from gentacalc.engine import calculate_plan
+from gentacalc.models import PatientInput
+from gentacalc.serialization import dumps_plan, plan_array_members, plan_members
+
+
+NOW = datetime(2025, 8, 24, 9, 0)
+
+
+def _patients(count: int) -> list[PatientInput]:
+    rng = random.Random(11)
+    return [
+        PatientInput(
+            sex=rng.choice(["female", "male"]),
+            age_years=float(rng.randint(16, 110)),
+            weight_kg=float(rng.randint(35, 250)),
+            height_cm=rng.choice([None, float(rng.randint(130, 210))]),
+            creatinine_umol_l=float(rng.randint(30, 1000)),
+            mg_per_kg=float(rng.randint(3, 7)),
+            first_dose_hour=rng.randint(1, 24),
+        )
+        for _ in range(count)
+    ]
+
+
+def test_dumps_plan_matches_generic_json_encoding():
+    for patient in _patients(2000):
+        plan = calculate_plan(patient, now=NOW)
+        expected = json.dumps(_serialize_plan(plan), sort_keys=True, separators=(",", ":"))
+        assert dumps_plan(plan) == expected
+
+
+def test_plan_array_members_match_row_objects():
+    patients = _patients(2000)
+    plans = calculate_plans_for(patients, now=NOW)
+    encoded = plan_array_members(plans)
+    assert encoded == [plan_members(plan) for plan in plans_from_array(plans)]
+
+
+def test_plan_array_members_match_scalar_encoding():
+    patients = _patients(2000)
+    encoded = plan_array_members(calculate_plans_for(patients, now=NOW))
+    assert encoded == [plan_members(calculate_plan(patient, now=NOW)) for patient in patients]